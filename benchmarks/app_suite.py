@@ -0,0 +1,214 @@
+"""Benchmark suite for the journal's data paths at growing diary sizes.
+
+For each storage backend and diary size, synthetic users are written to a temp data
+directory and the script's own functions are timed inside a Streamlit run: the driver
+sets a page that matches nothing, runs the script so it only defines its functions,
+then calls them directly.
+
+Cases: load_diary (new store and empty shared cache / warm), save_diary, save_diary_entry, the
+DiaryStats build, calculate_streak, calculate_achievements,
+analyze_recent_mood_for_advice, the insights page's table prep and the calendar
+page's month grid build.
+
+Results go to a JSON file; pass an earlier file with --compare to flag regressions:
+
+    python -m benchmarks.app_suite --sizes 1000 10000 100000 --output bench_new.json
+    python -m benchmarks.app_suite --sizes 1000 10000 --compare bench_old.json --threshold 1.2
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.synthetic import history_entries, synthetic_document
+from diary_storage import STORAGE_ENV_VAR, get_diary_store
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_APP = os.path.join(REPO_DIR, "newmood_calendar_journal.py")
+BENCH_USER = "Bench User 0"
+
+# Runs as the Streamlit script; parameters come in and timings go out through session state
+DRIVER = r'''
+import datetime, runpy, time
+import streamlit as st
+
+params = st.session_state["bench_params"]
+st.session_state.user_name = params["user"]
+st.session_state.page = "__benchmark__" # no page matches: the script defines its functions and stops
+app = runpy.run_path(params["app_path"])
+ss = st.session_state
+repeat = params["repeat"]
+timings = {}
+
+def timed(case, func, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    timings[case] = times
+
+def drop_stats():
+    ss.pop("diary_stats", None)
+
+def new_store():
+    from diary_cache import shared_diaries
+    app["get_store"].clear()
+    shared_diaries.clear()
+
+def insights_prep():
+    import pandas as pd
+    columns = app["get_diary_stats"]().columns
+    columns.score_trend(30)
+    tag_stats = app["compute_tag_stats"](columns, None, None)
+    pd.DataFrame(app["tag_table"](tag_stats), columns=["Activity Tag", "Frequency", "Avg Mood Score", "Lift vs Your Average"])
+    pd.DataFrame(app["tag_pair_table"](tag_stats), columns=["Activity Pair", "Times Together", "Avg Mood Score", "Lift vs Your Average"])
+
+def calendar_grid():
+    from calendar_view import build_month_html, month_grid_range
+    today = datetime.date.today()
+    grid_start, grid_end = month_grid_range(today.year, today.month)
+    days = app["get_diary_stats"]().columns.days_between(grid_start, grid_end)
+    build_month_html(today.year, today.month, days, today, app["FIXED_ACCENT_COLOR"])
+
+user = params["user"]
+new_store()
+timed("load_diary", lambda: app["load_diary"](user), setup=new_store)
+timed("load_diary_cached", lambda: app["load_diary"](user))
+diary = ss.diary
+newest = max(diary)
+timed("save_diary", app["save_diary"])
+timed("save_diary_entry", lambda: app["save_diary_entry"](newest, dict(diary[newest])))
+timed("diary_stats_build", lambda: app["get_diary_stats"](diary), setup=drop_stats)
+timed("calculate_streak", lambda: app["calculate_streak"](diary)) # on the stats kept in session
+streak = app["calculate_streak"](diary)
+timed("calculate_achievements", lambda: app["calculate_achievements"](diary, streak))
+timed("analyze_recent_mood_for_advice", lambda: app["analyze_recent_mood_for_advice"](diary))
+app["get_diary_stats"](diary)
+timed("insights_prep", insights_prep)
+timed("calendar_grid", calendar_grid)
+ss["bench_results"] = timings
+'''
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_users(storage, data_dir, users, entries, args):
+    store = get_diary_store(storage, data_dir)
+    for i in range(users):
+        document = synthetic_document(entries, args.fill, args.tags_per_entry, args.text_words, seed=i)
+        store.save(f"Bench User {i}", document)
+
+
+def run_case(app_path, storage, data_dir, repeat):
+    """Timings {case: [seconds, ...]} for one prepared data directory."""
+    cwd = os.getcwd()
+    previous_storage = os.environ.get(STORAGE_ENV_VAR)
+    os.environ[STORAGE_ENV_VAR] = storage
+    os.chdir(data_dir)
+    try:
+        at = AppTest.from_string(DRIVER, default_timeout=3600)
+        at.session_state["bench_params"] = {"user": BENCH_USER, "app_path": app_path, "repeat": repeat}
+        at.run()
+        if at.exception:
+            raise RuntimeError([e.value for e in at.exception])
+        return at.session_state["bench_results"]
+    finally:
+        os.chdir(cwd)
+        if previous_storage is None:
+            os.environ.pop(STORAGE_ENV_VAR, None)
+        else:
+            os.environ[STORAGE_ENV_VAR] = previous_storage
+
+
+def compare(results, baseline_path, threshold):
+    """Prints median ratios against a baseline file; returns the number of regressions."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["case"], r["storage"], r["entries"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\ncompared with {baseline_path} (regression = median more than {threshold:.2f}x slower)")
+    for result in results:
+        old = baseline.get((result["case"], result["storage"], result["entries"]))
+        if not old:
+            continue
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        flag = "REGRESSION" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"{result['case']:<32} {result['storage']:<7} {result['entries']:>7} {old['median_ms']:>10.3f} -> {result['median_ms']:>10.3f} ms  {ratio:5.2f}x {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="entries per diary")
+    parser.add_argument("--years", type=float, nargs="+", help="sizes given as years of history instead (see --fill)")
+    parser.add_argument("--fill", type=float, default=0.9, help="share of days with an entry")
+    parser.add_argument("--tags-per-entry", type=float, default=1.5)
+    parser.add_argument("--text-words", type=int, default=40)
+    parser.add_argument("--users", type=int, default=1, help="users written to the store (the first one is timed)")
+    parser.add_argument("--storage", nargs="+", choices=("json", "log", "sqlite", "snapshot", "mapped"), default=["json"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--app", default=DEFAULT_APP)
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/app_suite_<rev>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare medians against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio counted as a regression")
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING) # Streamlit's bare-mode warnings
+
+    sizes = [history_entries(years, args.fill) for years in args.years] if args.years else args.sizes
+    app_path = os.path.abspath(args.app)
+    revision = git_revision()
+    results = []
+    print(f"{'case':<32} {'storage':<7} {'entries':>7} {'median ms':>10} {'min ms':>10}")
+    for storage in args.storage:
+        for entries in sizes:
+            with tempfile.TemporaryDirectory() as data_dir:
+                write_users(storage, data_dir, args.users, entries, args)
+                timings = run_case(app_path, storage, data_dir, args.repeat)
+            for case, times in timings.items():
+                result = {
+                    "case": case, "storage": storage, "entries": entries, "repeat": len(times),
+                    "median_ms": statistics.median(times) * 1e3, "min_ms": min(times) * 1e3,
+                }
+                results.append(result)
+                print(f"{case:<32} {storage:<7} {entries:>7} {result['median_ms']:>10.3f} {result['min_ms']:>10.3f}")
+
+    output = args.output or os.path.join(REPO_DIR, "benchmarks", "results", f"app_suite_{revision or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "revision": revision, "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "app": os.path.relpath(app_path, REPO_DIR),
+            "params": {
+                "fill": args.fill, "tags_per_entry": args.tags_per_entry, "text_words": args.text_words,
+                "users": args.users, "repeat": args.repeat,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nwrote {output}")
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
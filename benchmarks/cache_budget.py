@@ -0,0 +1,76 @@
+"""Resident memory of the shared diary cache once more users have loaded than its budget holds.
+
+Writes --users synthetic users, sets the cache budget to about --budget-users of their
+diaries, then logs each user in the way load_diary() and get_diary_stats() do (a
+DiaryView plus the shared DiaryStats) and lets the session go. Allocations still alive
+afterwards (traced with tracemalloc) are what the cache and the store keep for the
+process: they should stay under the budget whatever the number of users.
+
+Exits 1 if a backend keeps more than its budget.
+
+    python -m benchmarks.cache_budget --users 40 --budget-users 5 --entries 2000
+"""
+import argparse
+import gc
+import logging
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.synthetic import synthetic_document
+from diary_cache import estimate_entries_bytes, shared_diaries
+from diary_storage import get_diary_store
+
+
+def resident_bytes(store, users):
+    """Bytes still allocated after every user has logged in once."""
+    shared_diaries.clear()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for user in users:
+        data = shared_diaries.load(store, user)
+        data["diary"].stats()
+        del data
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--budget-users", type=float, default=5, help="diaries the budget is sized for")
+    parser.add_argument("--entries", type=int, default=2000, help="entries per diary")
+    parser.add_argument("--storage", choices=("json", "log", "sqlite", "snapshot", "mapped"), nargs="+",
+                        default=["json", "log", "sqlite", "snapshot", "mapped"])
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    users = [f"Budget User {i}" for i in range(args.users)]
+    document = synthetic_document(args.entries)
+    budget = int(args.budget_users * estimate_entries_bytes(document["diary"]))
+    shared_diaries.max_bytes = budget
+    failed = False
+    print(f"{args.users} users x {args.entries} entries, budget {budget / 2**20:.1f} MB")
+    print(f"{'storage':>9} {'resident MB':>12} {'cached users':>13} {'evictions':>10}")
+    for kind in args.storage:
+        with tempfile.TemporaryDirectory() as data_dir:
+            store = get_diary_store(kind, data_dir)
+            for user in users:
+                store.save(user, document)
+            if hasattr(store, "_docs"):
+                store._docs.clear() # as after a restart: only logins fill it
+            evictions = shared_diaries.stats()["evictions"]
+            resident = resident_bytes(store, users)
+            stats = shared_diaries.stats()
+            shared_diaries.clear()
+        over = resident > budget
+        failed |= over
+        print(f"{kind:>9} {resident / 2**20:>12.1f} {stats['users']:>13} {stats['evictions'] - evictions:>10}" + ("  OVER BUDGET" if over else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Cold-start benchmark for the Streamlit script, one fresh process per page.
+
+Each page is rendered once with Streamlit's AppTest in a new interpreter started with
+`python -X importtime`, the way the first request of a new worker process runs. The
+report lists the first-run time, which heavy libraries the page pulled in, and the
+slowest top-level imports made while the script ran.
+
+    python -m benchmarks.cold_start --pages onboarding fortune_draw date insight --top 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, "newmood_calendar_journal.py")
+PAGES = ("onboarding", "fortune_draw", "date", "action_page", "calendar", "insight", "mood_sprout", "healing_pet_partner")
+HEAVY_MODULES = ("pandas", "plotly", "PIL", "numpy", "pyarrow")
+MARKER = "--- script run ---"
+
+# Runs inside the child process; prints a marker before the script so imports made by
+# AppTest/Streamlit themselves can be told apart from the ones the page triggers
+DRIVER = r"""
+import datetime, json, sys, time
+from streamlit.testing.v1 import AppTest
+page, app_path = sys.argv[1], sys.argv[2]
+at = AppTest.from_file(app_path, default_timeout=120)
+if page != "onboarding":
+    today = datetime.date.today()
+    at.session_state["user_name"] = "Cold Start"
+    at.session_state["page"] = page
+    at.session_state["diary"] = {
+        (today - datetime.timedelta(days=i)).isoformat(): {"mood": "😀", "text": "a good day", "score": 5, "tags": []}
+        for i in range(30)
+    }
+    at.session_state["last_response"] = "ok"
+    at.session_state["reward_points"] = 0
+    at.session_state["potion_is_granted"] = False
+before = set(sys.modules)
+sys.stderr.write("%s\n" % MARKER)
+sys.stderr.flush()
+start = time.perf_counter()
+at.run()
+elapsed = time.perf_counter() - start
+loaded = sorted({name.split(".")[0] for name in set(sys.modules) - before})
+print(json.dumps({"seconds": elapsed, "exceptions": [e.value for e in at.exception], "loaded": loaded}))
+""".replace("MARKER", repr(MARKER))
+
+
+def parse_importtime(stderr):
+    """{top-level module: cumulative microseconds} for imports after the marker line."""
+    _, _, after = stderr.partition(MARKER)
+    cumulative = {}
+    for line in after.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line[len("import time:"):].split("|", 2)
+        if name.startswith("   "): # nested import, already counted in its parent
+            continue
+        name = name.strip()
+        if cum.strip().isdigit():
+            cumulative[name] = cumulative.get(name, 0) + int(cum)
+    return cumulative
+
+
+def measure_page(page, workdir):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", DRIVER, page, APP_PATH],
+        cwd=workdir, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=REPO_DIR),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{page}: {result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["imports"] = parse_importtime(result.stderr)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=list(PAGES))
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list per page")
+    parser.add_argument("--json", action="store_true", help="print one JSON report instead of a table")
+    args = parser.parse_args(argv)
+
+    # Fresh data directory (no saved diaries), with the artwork the pages load
+    with tempfile.TemporaryDirectory() as workdir:
+        for folder in ("image", "assets"):
+            if os.path.isdir(os.path.join(REPO_DIR, folder)):
+                os.symlink(os.path.join(REPO_DIR, folder), os.path.join(workdir, folder))
+        reports = {page: measure_page(page, workdir) for page in args.pages}
+
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+        return 0
+    for page, report in reports.items():
+        heavy = [name for name in HEAVY_MODULES if name in report["loaded"]]
+        slowest = sorted(report["imports"].items(), key=lambda item: -item[1])[: args.top]
+        print(f"{page:<20} first run {report['seconds'] * 1e3:8.1f} ms   heavy: {', '.join(heavy) or '-'}")
+        for name, micros in slowest:
+            print(f"{'':<22}{micros / 1e3:8.1f} ms  {name}")
+        if report["exceptions"]:
+            print(f"{'':<22}EXCEPTIONS: {report['exceptions']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
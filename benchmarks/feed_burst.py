@@ -0,0 +1,94 @@
+"""Click latency and state writes for a burst of sprout feeds, with and without the save queue.
+
+Runs the app with AppTest on the Mood Sprout page of a user with --entries stored diary
+entries (a JSON save rewrites all of them) and clicks the feed
+buttons --clicks times in a row (each click is one script run). With --delay 0 every
+click writes the user state before the page comes back (the previous behaviour); with a
+delay the click only queues the save and the background writer coalesces the burst.
+
+After the burst the queue is flushed and the stored sprout is checked against the clicks.
+
+    python -m benchmarks.feed_burst --clicks 10 --delays 0 0.5
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.synthetic import synthetic_document
+from diary_storage import STORAGE_ENV_VAR, get_diary_store
+from save_queue import save_queue
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(REPO_DIR, "newmood_calendar_journal.py")
+USER = "Feed Bench"
+
+
+def feed_burst(clicks, gap):
+    """Click latencies (seconds) for `clicks` feeds, cycling through the potions in stock."""
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.session_state["user_name"] = USER
+    at.session_state["page"] = "mood_sprout"
+    at.run()
+    latencies = []
+    for i in range(clicks):
+        buttons = [b for b in at.button if b.key and b.key.startswith("feed_btn_") and not b.disabled]
+        button = buttons[i % len(buttons)]
+        start = time.perf_counter()
+        button.click()
+        at.run()
+        latencies.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError([e.value for e in at.exception])
+        time.sleep(gap)
+    return latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=10)
+    parser.add_argument("--delays", type=float, nargs="+", default=[0, 0.5], help="MOOD_JOURNAL_SAVE_DELAY values")
+    parser.add_argument("--gap", type=float, default=0.0, help="seconds between clicks")
+    parser.add_argument("--storage", choices=("json", "log", "sqlite", "snapshot", "mapped"), default="json")
+    parser.add_argument("--entries", type=int, default=5000)
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    cwd = os.getcwd()
+    os.environ[STORAGE_ENV_VAR] = args.storage
+    print(f"{'delay s':>8} {'median ms':>10} {'max ms':>8} {'writes':>7} {'coalesced':>10}")
+    try:
+        for delay in args.delays:
+            with tempfile.TemporaryDirectory() as data_dir:
+                os.chdir(data_dir)
+                st.cache_resource.clear() # the app's store was opened in the previous directory
+                store = get_diary_store(args.storage)
+                document = synthetic_document(args.entries)
+                document.pop("elf_state", None) # the app starts a fresh sprout
+                store.save(USER, document)
+                save_queue.delay = delay
+                before = save_queue.stats()
+                latencies = feed_burst(args.clicks, args.gap)
+                save_queue.flush()
+                after = save_queue.stats()
+                stored = store.load(USER)
+                feeds = stored["elf_state"]["total_feeds"]
+                if feeds != args.clicks:
+                    raise RuntimeError(f"stored {feeds} feeds after {args.clicks} clicks")
+                os.chdir(cwd)
+            writes = after["writes"] - before["writes"] if delay > 0 else args.clicks
+            coalesced = after["coalesced"] - before["coalesced"]
+            print(f"{delay:>8g} {statistics.median(latencies) * 1e3:>10.1f} {max(latencies) * 1e3:>8.1f} {writes:>7} {coalesced:>10}")
+    finally:
+        os.chdir(cwd)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Script runs and wall time per interaction on the fragment-based pages.
+
+Replays clicks on the sprout, pet and calendar pages and reports, per interaction, how
+many times the script (or a fragment) ran and how long it took.
+
+AppTest always reruns the whole script, so this harness patches its script runner to
+do what the browser does: a click on a widget inside an @st.fragment queues a rerun of
+just that fragment. Pass --full-reruns to measure every interaction as a full script
+run instead, or --app to replay the same clicks against another version of the script:
+
+    git show <rev>:newmood_calendar_journal.py > old_app.py
+    python -m benchmarks.interactions --app old_app.py newmood_calendar_journal.py
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import time
+from urllib import parse
+
+from streamlit.runtime.scriptrunner import RerunData, ScriptRunnerEvent
+from streamlit.runtime.scriptrunner_utils.script_requests import ScriptRequests
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+from benchmarks.rerun_cpu import DEFAULT_APP, REPO_DIR, seeded_session
+
+# (page, [(label, action, widget key or button label, value)])
+SCENARIOS = {
+    "mood_sprout": [
+        ("feed potion", "click", "feed_btn_happy", None),
+        ("feed potion", "click", "feed_btn_calm", None),
+        ("feed potion", "click", "feed_btn_sad", None),
+        ("reset sprout", "click", "reset_sprout", None),
+    ],
+    "healing_pet_partner": [
+        ("tap pet", "click", "pet_pet_tap_btn", None),
+        ("pet pet", "click", "pet_pet_pet_btn", None),
+        ("feed pet", "click", "pet_pet_feed_btn", None),
+        ("change mood", "radio", "pet_pet_mood_radio", "Calm and Relaxed 😌"),
+    ],
+    "calendar": [
+        ("next month", "click", "Next Month ➡", None),
+        ("next month", "click", "Next Month ➡", None),
+        ("previous month", "click", "⬅ Previous Month", None),
+        ("previous month", "click", "⬅ Previous Month", None),
+    ],
+}
+
+
+class FragmentRecorder:
+    """Records script starts per AppTest.run() and routes fragment widgets to fragment reruns."""
+
+    def __init__(self, fragment_reruns=True):
+        self.fragment_reruns = fragment_reruns
+        self.widget_fragments = {} # widget id -> id of the fragment that drew it ("" = main script)
+        self.target_fragment = None
+        self.starts = []           # one entry per script start: fragment ids run, or None for the full script
+
+    @contextlib.contextmanager
+    def installed(self):
+        original = LocalScriptRunner.run
+        recorder = self
+
+        def run(runner, widget_state=None, query_params=None, timeout=3, page_hash=""):
+            query_string = parse.urlencode(query_params, doseq=True) if query_params else ""
+            fragment_queue = [recorder.target_fragment] if recorder.target_fragment else []
+            if fragment_queue:
+                # the runner starts with a full-app rerun already queued, which would swallow ours
+                runner._requests = ScriptRequests()
+            runner.request_rerun(RerunData(
+                widget_states=widget_state, query_string=query_string,
+                page_script_hash=page_hash, fragment_id_queue=fragment_queue,
+            ))
+            try:
+                if not runner._script_thread:
+                    runner.start()
+                local_script_runner.require_widgets_deltas(runner, timeout)
+            finally:
+                runner.join()
+            recorder._record(runner)
+            return local_script_runner.parse_tree_from_messages(runner.forward_msgs())
+
+        LocalScriptRunner.run = run
+        try:
+            yield self
+        finally:
+            LocalScriptRunner.run = original
+
+    def _record(self, runner):
+        self.starts = [
+            data.get("fragment_ids_this_run") or None
+            for event, data in zip(runner.events, runner.event_data)
+            if event == ScriptRunnerEvent.SCRIPT_STARTED
+        ]
+        for msg in runner.forward_msgs():
+            if not msg.HasField("delta") or not msg.delta.HasField("new_element"):
+                continue
+            element = msg.delta.new_element
+            kind = element.WhichOneof("type")
+            widget_id = getattr(getattr(element, kind), "id", "") if kind else ""
+            if widget_id:
+                self.widget_fragments[widget_id] = msg.delta.fragment_id
+
+    def target(self, widget):
+        fragment_id = self.widget_fragments.get(widget.id, "")
+        self.target_fragment = fragment_id if (self.fragment_reruns and fragment_id) else None
+
+
+def find_widget(at, action, name):
+    if action == "radio":
+        return at.radio(key=name)
+    for button in at.button:
+        if button.key == name or button.label == name:
+            return button
+    raise LookupError(f"no button {name!r}")
+
+
+def replay(app_path, page, steps, fragment_reruns, entries):
+    at = AppTest.from_file(app_path, default_timeout=120)
+    seeded_session(at, page, entries)
+    recorder = FragmentRecorder(fragment_reruns)
+    rows = []
+    with recorder.installed():
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{page}: {[e.value for e in at.exception]}")
+        for label, action, name, value in steps:
+            widget = find_widget(at, action, name)
+            recorder.target(widget)
+            if action == "radio":
+                widget.set_value(value)
+            else:
+                widget.click()
+            start = time.perf_counter()
+            at.run()
+            elapsed = time.perf_counter() - start
+            if at.exception:
+                raise RuntimeError(f"{page} / {label}: {[e.value for e in at.exception]}")
+            full_runs = sum(1 for fragments in recorder.starts if fragments is None)
+            rows.append((label, full_runs, len(recorder.starts) - full_runs, elapsed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", nargs="+", default=[DEFAULT_APP], help="one or more script versions to compare")
+    parser.add_argument("--pages", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--full-reruns", action="store_true", help="rerun the whole script even for fragment widgets")
+    parser.add_argument("--entries", type=int, default=60, help="diary entries in the seeded session")
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING) # Streamlit's bare-mode warnings
+    apps = [os.path.abspath(path) for path in args.app]
+
+    print(f"{'page':<20} {'script':<28} {'interaction':<16} {'full runs':>9} {'fragment runs':>13} {'wall ms':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for folder in ("image", "assets"):
+            if os.path.isdir(os.path.join(REPO_DIR, folder)):
+                os.symlink(os.path.join(REPO_DIR, folder), os.path.join(workdir, folder))
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for page in args.pages:
+                for app_path in apps:
+                    rows = replay(app_path, page, SCENARIOS[page], not args.full_reruns, args.entries)
+                    for label, full_runs, fragment_runs, elapsed in rows:
+                        print(
+                            f"{page:<20} {os.path.basename(app_path):<28} {label:<16} "
+                            f"{full_runs:>9} {fragment_runs:>13} {elapsed * 1e3:>9.1f}"
+                        )
+        finally:
+            os.chdir(cwd)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Time from entering a name to the first page, by years of stored history.
+
+Runs the app with AppTest against a temp data directory holding one synthetic user and
+times the "Start Journaling" click (load_diary plus rendering the fortune page), with the
+login window on (MOOD_JOURNAL_LOGIN_WINDOW_MONTHS, default 2) and off (0). The shared
+diary cache is cleared before every login, so each one reads the store.
+
+Only backends with range reads (sqlite) load a window; json, log and snapshot parse the
+whole file, and mapped maps it without reading any entry text.
+
+    python -m benchmarks.login_window --years 1 5 20 50
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.synthetic import history_entries, synthetic_document
+from diary_cache import shared_diaries
+from diary_storage import STORAGE_ENV_VAR, get_diary_store
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(REPO_DIR, "newmood_calendar_journal.py")
+USER = "Login Bench"
+WINDOW_ENV_VAR = "MOOD_JOURNAL_LOGIN_WINDOW_MONTHS"
+
+
+def login_seconds(months):
+    os.environ[WINDOW_ENV_VAR] = str(months)
+    shared_diaries.clear()
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.run()
+    at.text_input(key="name_input").input(USER)
+    button = next(b for b in at.button if "Start Journaling" in b.label)
+    start = time.perf_counter()
+    button.click()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception or at.session_state.page != "fortune_draw":
+        raise RuntimeError([e.value for e in at.exception] or at.session_state.page)
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--fill", type=float, default=0.9)
+    parser.add_argument("--storage", choices=("json", "log", "sqlite", "snapshot", "mapped"), default="sqlite")
+    parser.add_argument("--window-months", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    cwd = os.getcwd()
+    os.environ[STORAGE_ENV_VAR] = args.storage
+    print(f"{'years':>6} {'entries':>8} {'window ms':>10} {'full ms':>10}")
+    try:
+        for years in args.years:
+            entries = history_entries(years, args.fill)
+            with tempfile.TemporaryDirectory() as data_dir:
+                os.chdir(data_dir)
+                st.cache_resource.clear() # the app's store was opened in the previous directory
+                get_diary_store(args.storage).save(USER, synthetic_document(entries, args.fill))
+                login_seconds(args.window_months) # warm-up: imports, Streamlit caches
+                window, full = [], []
+                for _ in range(args.repeat): # interleaved, so drift hits both modes alike
+                    window.append(login_seconds(args.window_months))
+                    full.append(login_seconds(0))
+                os.chdir(cwd)
+            print(f"{years:>6g} {entries:>8} {statistics.median(window) * 1e3:>10.1f} {statistics.median(full) * 1e3:>10.1f}")
+    finally:
+        os.chdir(cwd)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
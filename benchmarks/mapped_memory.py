@@ -0,0 +1,88 @@
+"""Resident memory per logged day and entry fetch time: parsed JSON vs memory-mapped entries.
+
+For each diary size one synthetic user is stored by the "json" and the "mapped" backend
+and opened through the shared diary cache, as a login does. Columns:
+
+  entries B/day - Python allocations held by the cached entries (tracemalloc; the mapped
+                  days file lives in the page cache, not in the process heap)
+  stats B/day   - the same with the diary's DiaryStats built (streak, calendar, insights)
+  open ms       - first load through an empty cache
+  entry ms      - reading one day's entry with its text (the journal page)
+  scan ms       - reading every entry with its text (a search index build)
+
+    python -m benchmarks.mapped_memory --sizes 1000 10000 100000
+"""
+import argparse
+import datetime
+import gc
+import logging
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import synthetic_document
+from diary_cache import shared_diaries
+from diary_storage import get_diary_store
+
+USER = "Mapped Bench"
+BACKENDS = ("json", "mapped")
+
+
+def traced_bytes(func):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def median_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3
+
+
+def measure(store, entries, repeat):
+    shared_diaries.clear()
+    open_ms = median_ms(lambda: (shared_diaries.clear(), shared_diaries.load(store, USER)), repeat)
+    shared_diaries.clear()
+    entry_bytes, data = traced_bytes(lambda: shared_diaries.load(store, USER))
+    stats_bytes, _ = traced_bytes(lambda: data["diary"].stats())
+    diary = data["diary"]
+    date_key = datetime.date.today().isoformat()
+    entry_ms = median_ms(lambda: diary.get(date_key), repeat * 20)
+    scan_ms = median_ms(lambda: sum(len(entry.get("text") or "") for entry in diary.values()), repeat)
+    return entry_bytes / entries, (entry_bytes + stats_bytes) / entries, open_ms, entry_ms, scan_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="entries per diary")
+    parser.add_argument("--text-words", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    print(f"{'entries':>8} {'backend':>8} {'entries B/day':>14} {'stats B/day':>12} {'open ms':>9} {'entry ms':>9} {'scan ms':>9}")
+    for entries in args.sizes:
+        document = synthetic_document(entries, text_words=args.text_words)
+        for backend in BACKENDS:
+            with tempfile.TemporaryDirectory() as data_dir:
+                store = get_diary_store(backend, data_dir)
+                store.save(USER, document)
+                row = measure(store, entries, args.repeat)
+                shared_diaries.clear()
+            print(f"{entries:>8} {backend:>8} {row[0]:>14.1f} {row[1]:>12.1f} {row[2]:>9.1f} {row[3]:>9.3f} {row[4]:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Throughput of the cross-user analytics job over synthetic users.
+
+Writes N synthetic users (JSON files, or rows of one SQLite database) into a temp
+directory, then runs the job once per worker count and reports users per second.
+Scaling is close to linear while there are free cores and the files are in the page
+cache; on one core extra workers only add process overhead.
+
+    python -m benchmarks.population_scan --users 20000 --workers 1 2 4 8
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import synthetic_document
+from diary_storage import get_diary_store
+from population_analytics import run_job
+
+
+def write_users(kind, data_dir, users, max_entries, seed=0):
+    rng = random.Random(seed)
+    documents = (
+        synthetic_document(rng.randint(0, max_entries), fill=0.85, text_words=5, seed=seed + i)
+        for i in range(users)
+    )
+    if kind == "sqlite":
+        store = get_diary_store("sqlite", data_dir)
+        for i, document in enumerate(documents):
+            store.save(f"user_{i:06d}", document)
+        return
+    for i, document in enumerate(documents):
+        with open(os.path.join(data_dir, f"diary_user_{i:06d}.json"), "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--max-entries", type=int, default=120, help="entries per user are uniform in [0, max]")
+    parser.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        write_users(args.storage, data_dir, args.users, args.max_entries)
+        print(f"wrote {args.users} users in {time.perf_counter() - start:.1f} s ({os.cpu_count()} cpus)")
+        print(f"{'workers':>8} {'seconds':>9} {'users/s':>9} {'entries':>10}")
+        for workers in args.workers:
+            start = time.perf_counter()
+            totals = run_job(args.storage, data_dir, workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>8} {elapsed:>9.2f} {totals.users / elapsed:>9.0f} {totals.entries:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Per-rerun CPU benchmark for the Streamlit script.
+
+Streamlit re-executes the whole script on every interaction. This renders a page once to
+warm up, then reruns it many times with AppTest and reports the process CPU time per rerun
+(median and p90) and the median wall time.
+
+To compare against an older version of the script, export it next to the current one
+and pass it with --app:
+
+    git show <rev>:newmood_calendar_journal.py > old_app.py
+    python -m benchmarks.rerun_cpu --app old_app.py newmood_calendar_journal.py --pages date action_page
+"""
+import argparse
+import datetime
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_APP = os.path.join(REPO_DIR, "newmood_calendar_journal.py")
+PAGES = ("onboarding", "fortune_draw", "date", "action_page", "calendar", "rewards")
+
+
+def seeded_session(at, page, entries):
+    today = datetime.date.today()
+    if page == "onboarding":
+        return
+    at.session_state["user_name"] = "Rerun Bench"
+    at.session_state["page"] = page
+    at.session_state["diary"] = {
+        (today - datetime.timedelta(days=i)).isoformat(): {"mood": "😀", "text": "a good day", "score": 5, "tags": []}
+        for i in range(entries)
+    }
+    at.session_state["last_response"] = "ok"
+    at.session_state["reward_points"] = 0
+    at.session_state["potion_is_granted"] = True
+    at.session_state["potion_reward_name"] = "Happy"
+
+
+def bench_page(app_path, page, reruns, entries):
+    at = AppTest.from_file(app_path, default_timeout=120)
+    seeded_session(at, page, entries)
+    at.run() # first run: imports, caches, asset warm-up
+    if at.exception:
+        raise RuntimeError(f"{page}: {[e.value for e in at.exception]}")
+    process_times, wall_times = [], []
+    for _ in range(reruns):
+        wall, cpu = time.perf_counter(), time.process_time()
+        at.run()
+        process_times.append(time.process_time() - cpu)
+        wall_times.append(time.perf_counter() - wall)
+    return process_times, wall_times
+
+
+def summarize(times):
+    ordered = sorted(times)
+    return statistics.median(ordered) * 1e3, ordered[int(len(ordered) * 0.9) - 1] * 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", nargs="+", default=[DEFAULT_APP], help="one or more script versions to compare")
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=list(PAGES))
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--entries", type=int, default=60, help="diary entries in the seeded session")
+    args = parser.parse_args(argv)
+    # AppTest runs the script without a browser session; silence Streamlit's bare-mode warnings
+    logging.disable(logging.WARNING)
+
+    apps = [os.path.abspath(path) for path in args.app]
+    print(f"{'page':<14} {'script':<32} {'cpu median ms':>14} {'cpu p90 ms':>11} {'wall median ms':>15}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for folder in ("image", "assets"):
+            if os.path.isdir(os.path.join(REPO_DIR, folder)):
+                os.symlink(os.path.join(REPO_DIR, folder), os.path.join(workdir, folder))
+        cwd = os.getcwd()
+        os.chdir(workdir) # diaries written by the pages land in the temp dir
+        try:
+            for page in args.pages:
+                for app_path in apps:
+                    process_times, wall_times = bench_page(app_path, page, args.reruns, args.entries)
+                    cpu_median, cpu_p90 = summarize(process_times)
+                    wall_median, _ = summarize(wall_times)
+                    print(f"{page:<14} {os.path.basename(app_path):<32} {cpu_median:>14.2f} {cpu_p90:>11.2f} {wall_median:>15.2f}")
+        finally:
+            os.chdir(cwd)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Benchmark for the diary response engine.
+
+Compares the old per-keyword substring scan with the compiled word automaton, for
+growing lexicons (the real one padded with synthetic phrases) and entry lengths.
+
+    python -m benchmarks.response_engine --lexicon-sizes 150 1000 5000 --words 50 500 5000
+"""
+import argparse
+import random
+import string
+import sys
+import time
+
+from response_engine import EMOTION_LEXICON, ResponseEngine, words
+
+
+def synthetic_lexicon(size, seed=0):
+    """The real lexicon plus made-up one- and two-word phrases, `size` phrases in total."""
+    rng = random.Random(seed)
+    lexicon = {emotion: dict(terms) for emotion, terms in EMOTION_LEXICON.items()}
+    emotions = list(lexicon)
+    total = sum(len(terms) for terms in lexicon.values())
+    while total < size:
+        phrase = " ".join(
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+            for _ in range(rng.choice((1, 1, 2)))
+        )
+        terms = lexicon[rng.choice(emotions)]
+        if phrase not in terms:
+            terms[phrase] = round(rng.uniform(0.4, 1.5), 1)
+            total += 1
+    return lexicon
+
+
+def synthetic_entry(lexicon, word_count, seed=0):
+    """Filler text with roughly one lexicon phrase every 20 words."""
+    rng = random.Random(seed)
+    filler = ["today", "i", "went", "to", "the", "park", "and", "then", "work", "was", "long", "we", "ate"]
+    phrases = [phrase for terms in lexicon.values() for phrase in terms]
+    out = []
+    while len(out) < word_count:
+        out.extend(rng.choices(filler, k=19))
+        out.append(rng.choice(phrases))
+    return " ".join(out[:word_count])
+
+
+def substring_scan(lexicon, text):
+    """The original approach: lowercase, then one `in` test per keyword, first hit wins."""
+    text_lower = text.lower()
+    for terms in lexicon.values():
+        for phrase in terms:
+            if phrase in text_lower:
+                return phrase
+    return None
+
+
+def substring_scores(lexicon, text):
+    """Like the engine, scores every emotion, but with one `count` per keyword."""
+    text_lower = text.lower()
+    return {
+        emotion: sum(text_lower.count(phrase) * weight for phrase, weight in terms.items())
+        for emotion, terms in lexicon.items()
+    }
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lexicon-sizes", type=int, nargs="+", default=[150, 1000, 5000])
+    parser.add_argument("--words", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'lexicon':>8} {'words':>7} {'build ms':>9} {'engine ms':>10} {'first-hit ms':>13} {'all-scores ms':>14}")
+    for size in args.lexicon_sizes:
+        lexicon = synthetic_lexicon(size)
+        start = time.perf_counter()
+        engine = ResponseEngine(lexicon)
+        build = time.perf_counter() - start
+        for word_count in args.words:
+            text = synthetic_entry(lexicon, word_count)
+            engine_time = best_of(lambda: engine.scores(text), args.repeat)
+            first_hit = best_of(lambda: substring_scan(lexicon, text), args.repeat)
+            all_scores = best_of(lambda: substring_scores(lexicon, text), args.repeat)
+            print(
+                f"{size:>8} {len(words(text)):>7} {build * 1e3:>9.1f} {engine_time * 1e3:>10.3f} "
+                f"{first_hit * 1e3:>13.3f} {all_scores * 1e3:>14.3f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
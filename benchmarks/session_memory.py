@@ -0,0 +1,88 @@
+"""Memory each logged-in session adds, per diary size, with and without the shared cache.
+
+A "session" here holds what load_diary() and get_diary_stats() leave in session state:
+
+  private  - the previous behaviour: store.load() (a private parsed copy) + DiaryStats
+  shared   - shared_diaries.load(): a DiaryView over the cached entries + shared stats
+  edited   - shared, after the session saved one entry (its stats are copied on write)
+
+Allocations are traced with tracemalloc while --sessions sessions for the same user are
+alive; the first session (which fills the cache) is not counted.
+
+    python -m benchmarks.session_memory --sizes 1000 10000 50000 --sessions 20
+"""
+import argparse
+import datetime
+import gc
+import logging
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.synthetic import synthetic_document
+from diary_cache import shared_diaries
+from diary_storage import get_diary_store
+from mood_analytics import DiaryStats
+
+USER = "Memory Bench"
+
+
+def private_session(store):
+    data = store.load(USER)
+    diary = data["diary"]
+    return data, DiaryStats(diary)
+
+
+def shared_session(store):
+    data = shared_diaries.load(store, USER)
+    diary = data["diary"]
+    return data, diary.stats()
+
+
+def edited_session(store):
+    data, stats = shared_session(store)
+    date_key = datetime.date.today().isoformat()
+    entry = {"mood": "😄", "text": "edited in this session", "score": 5, "tags": []}
+    data["diary"][date_key] = entry
+    stats.record_entry(date_key, entry)
+    return data, stats
+
+
+MODES = {"private": private_session, "shared": shared_session, "edited": edited_session}
+
+
+def per_session_bytes(open_session, store, sessions):
+    shared_diaries.clear()
+    gc.collect()
+    first = open_session(store) # fills the shared cache
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    alive = [open_session(store) for _ in range(sessions)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del alive, first
+    return (after - before) / sessions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="entries per diary")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--storage", choices=("json", "log", "sqlite", "snapshot", "mapped"), default="json")
+    parser.add_argument("--text-words", type=int, default=40)
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    print(f"{'entries':>8} " + " ".join(f"{mode + ' KB/session':>20}" for mode in MODES))
+    for entries in args.sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            store = get_diary_store(args.storage, data_dir)
+            store.save(USER, synthetic_document(entries, text_words=args.text_words))
+            row = [per_session_bytes(open_session, store, args.sessions) for open_session in MODES.values()]
+        print(f"{entries:>8} " + " ".join(f"{size / 1024:>20.1f}" for size in row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
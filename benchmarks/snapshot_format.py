@@ -0,0 +1,70 @@
+"""Load/save time and file size of binary snapshots against the original JSON files.
+
+For each diary size one synthetic user is saved by the "json" backend and by the
+"snapshot" backend with every available codec; the timings are the stores' own file
+read + parse (load, read cache bypassed) and encode + atomic write (save). "streak" is
+the current streak: from the snapshot header alone, or from the parsed JSON document.
+
+    python -m benchmarks.snapshot_format --sizes 1000 10000 100000
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import synthetic_document
+from diary_snapshot import CODEC_ENV_VAR, snapshot_streak, zstandard
+from diary_storage import JsonDiaryStore, SnapshotDiaryStore
+from mood_analytics import DiaryStats
+
+USER = "Snapshot Bench"
+
+
+def median_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3
+
+
+def measure(store, document, repeat):
+    path = store.path_for(USER)
+    store.save(USER, document)
+    save_ms = median_ms(lambda: store._write(path, document), repeat)
+    load_ms = median_ms(lambda: store._read_file(path), repeat)
+    if isinstance(store, SnapshotDiaryStore):
+        streak_ms = median_ms(lambda: snapshot_streak(store.read_counters(USER)), repeat)
+    else:
+        streak_ms = median_ms(lambda: DiaryStats(store._read_file(path)["diary"]).streak(), repeat)
+    return os.path.getsize(path), load_ms, save_ms, streak_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="entries per diary")
+    parser.add_argument("--text-words", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+
+    codecs = ["none", "zlib"] + (["zstd"] if zstandard is not None else [])
+    print(f"{'entries':>8} {'format':>14} {'KB':>9} {'load ms':>9} {'save ms':>9} {'streak ms':>10}")
+    for entries in args.sizes:
+        document = synthetic_document(entries, text_words=args.text_words)
+        formats = [("json", JsonDiaryStore)] + [(f"snapshot/{codec}", SnapshotDiaryStore) for codec in codecs]
+        for label, store_class in formats:
+            os.environ[CODEC_ENV_VAR] = label.partition("/")[2]
+            with tempfile.TemporaryDirectory() as data_dir:
+                size, load_ms, save_ms, streak_ms = measure(store_class(data_dir), document, args.repeat)
+            print(f"{entries:>8} {label:>14} {size / 1024:>9.0f} {load_ms:>9.1f} {save_ms:>9.1f} {streak_ms:>10.2f}")
+    os.environ.pop(CODEC_ENV_VAR, None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Stress test for concurrent diary saves.
+
+Hammers one user's diary from many threads in several processes, the way phone and
+laptop sessions of the same user do, then checks that no entry and no point was lost.
+
+    python -m benchmarks.stress_saves --backend all --processes 4 --threads 8 --saves 50
+"""
+import argparse
+import copy
+import datetime
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from diary_storage import JsonDiaryStore, LogDiaryStore, MappedDiaryStore, SnapshotDiaryStore, SqliteDiaryStore
+
+USER = "Stress Tester"
+BACKENDS = ("json", "log", "sqlite", "snapshot", "mapped")
+
+
+def make_store(backend, data_dir):
+    if backend == "json":
+        return JsonDiaryStore(data_dir)
+    if backend == "log":
+        return LogDiaryStore(data_dir, compact_bytes=64 * 1024)
+    if backend == "snapshot":
+        return SnapshotDiaryStore(data_dir)
+    if backend == "mapped":
+        return MappedDiaryStore(data_dir)
+    return SqliteDiaryStore(os.path.join(data_dir, "stress.db"), legacy_dir=data_dir)
+
+
+def session_worker(backend, data_dir, worker_id, saves):
+    """One 'session': saves its own entries and feeds one potion per save."""
+    store = make_store(backend, data_dir)
+    data = store.load(USER) or {}
+    base = {k: v for k, v in data.items() if k != "diary"} or None
+    state = copy.deepcopy(base) if base else {"total_points": 0, "elf_state": {"total_feeds": 0}}
+    first_day = datetime.date(2000, 1, 1).toordinal() + worker_id * saves
+    for i in range(saves):
+        date_key = datetime.date.fromordinal(first_day + i).strftime("%Y-%m-%d")
+        entry = {"mood": "😀", "text": f"worker {worker_id} save {i}", "score": 5, "tags": []}
+        state["total_points"] += 10
+        if i % 2:
+            base = store.save_state(USER, state, base=base)
+            base = store.upsert_entry(USER, date_key, entry, state=None, base=base) or base
+        else:
+            state["elf_state"]["total_feeds"] += 1
+            base = store.upsert_entry(USER, date_key, entry, state=state, base=base)
+        state = copy.deepcopy(base)
+    return saves
+
+
+def process_worker(backend, data_dir, process_id, threads, saves):
+    workers = [
+        threading.Thread(target=session_worker, args=(backend, data_dir, process_id * threads + t, saves))
+        for t in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def run(backend, processes, threads, saves):
+    data_dir = tempfile.mkdtemp(prefix=f"stress_{backend}_")
+    try:
+        make_store(backend, data_dir).save_state(USER, {"total_points": 0, "elf_state": {"total_feeds": 0}})
+        start = time.perf_counter()
+        jobs = [
+            multiprocessing.Process(target=process_worker, args=(backend, data_dir, p, threads, saves))
+            for p in range(processes)
+        ]
+        for job in jobs:
+            job.start()
+        for job in jobs:
+            job.join()
+        elapsed = time.perf_counter() - start
+
+        data = make_store(backend, data_dir).load(USER)
+        sessions = processes * threads
+        expected_entries = sessions * saves
+        expected_points = expected_entries * 10
+        expected_feeds = sessions * ((saves + 1) // 2)
+        lost_entries = expected_entries - len(data["diary"])
+        lost_points = expected_points - data["total_points"]
+        lost_feeds = expected_feeds - data["elf_state"]["total_feeds"]
+        ok = lost_entries == lost_points == lost_feeds == 0 and all(j.exitcode == 0 for j in jobs)
+        print(
+            f"{backend:<7} {sessions:>3} sessions  {expected_entries:>6} saves  {elapsed:7.2f}s  "
+            f"{expected_entries * 2 / elapsed:8.0f} writes/s  "
+            f"lost entries={lost_entries} points={lost_points} feeds={lost_feeds}  {'OK' if ok else 'FAIL'}"
+        )
+        return ok
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=BACKENDS + ("all",), default="all")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--saves", type=int, default=50, help="saves per session")
+    args = parser.parse_args(argv)
+    backends = BACKENDS if args.backend == "all" else (args.backend,)
+    results = [run(backend, args.processes, args.threads, args.saves) for backend in backends]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Synthetic diaries for the benchmarks.
+
+Entries end today and run back through history; `fill` is the share of days that get an
+entry (gaps break streaks), `tags_per_entry` the mean number of activity tags and
+`text_words` the mean length of the entry text. Everything is drawn from one seeded
+random.Random, so the same arguments always give the same documents.
+"""
+import datetime
+import random
+
+from journal_content import ACTIVITY_TAGS, MOOD_SCORES, POTION_MAPPING
+
+WORDS = (
+    "today", "work", "was", "long", "but", "dinner", "with", "friends", "made", "me", "happy",
+    "tired", "after", "the", "gym", "felt", "calm", "walk", "in", "park", "anxious", "about",
+    "exam", "slept", "well", "rainy", "coffee", "read", "book", "called", "mom", "stressed",
+)
+
+
+def history_entries(years, fill=1.0):
+    """Number of entries `years` of history holds at a given fill rate."""
+    return round(years * 365.25 * fill)
+
+
+def synthetic_diary(entries, fill=1.0, tags_per_entry=1.5, text_words=40, seed=0, today=None):
+    """{date_key: entry} with `entries` entries ending at `today`."""
+    rng = random.Random(seed)
+    moods = list(MOOD_SCORES)
+    day = today or datetime.date.today()
+    diary = {}
+    while len(diary) < entries:
+        if rng.random() < fill or not diary:
+            mood = rng.choice(moods)
+            tag_count = min(len(ACTIVITY_TAGS), int(rng.expovariate(1 / tags_per_entry))) if tags_per_entry else 0
+            word_count = max(1, int(rng.gauss(text_words, text_words / 3))) if text_words else 0
+            diary[day.isoformat()] = {
+                "mood": mood,
+                "text": " ".join(rng.choices(WORDS, k=word_count)),
+                "score": MOOD_SCORES[mood],
+                "tags": rng.sample(ACTIVITY_TAGS, tag_count),
+            }
+        day -= datetime.timedelta(days=1)
+    return diary
+
+
+def synthetic_document(entries, fill=1.0, tags_per_entry=1.5, text_words=40, seed=0, today=None):
+    """A whole saved document: the diary plus points, fortune and sprout state."""
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    diary = synthetic_diary(entries, fill, tags_per_entry, text_words, seed, today)
+    return {
+        "diary": diary,
+        "total_points": 10 * len(diary),
+        "user_name": f"Synthetic {seed}",
+        "elf_state": {
+            "available_potions": {e: rng.randint(0, 8) for e in POTION_MAPPING},
+            "emotion_counts": {e: rng.randint(0, 6) for e in POTION_MAPPING},
+            "total_feeds": rng.randint(0, 40), "evolution_threshold": 30, "evolved": rng.random() < 0.1,
+            "daily_potion_count": rng.randint(0, 5), "last_potion_date": today.isoformat(),
+        },
+    }
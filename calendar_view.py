@@ -0,0 +1,158 @@
+import calendar
+import datetime
+import functools
+import html
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from journal_content import MOOD_EMOJIS
+from mood_analytics import year_cell
+
+# -------------------- Month View Builder
+# --------------------
+#
+# The month grid is built as one HTML/CSS block (one Streamlit element instead of ~50)
+# and cached per (user, month, versions of the months it shows, today). Saving an entry
+# only bumps the version of its own month, so other months stay cached.
+
+MONTH_VIEW_CACHE_SIZE = 256
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+_month_views = OrderedDict()
+_month_views_lock = threading.Lock()
+
+
+def month_grid_range(year, month):
+    """First and last date of the Monday-first grid, like Calendar().monthdatescalendar."""
+    first = datetime.date(year, month, 1)
+    last = datetime.date(year, month, calendar.monthrange(year, month)[1])
+    return first - datetime.timedelta(days=first.weekday()), last + datetime.timedelta(days=6 - last.weekday())
+
+
+def _neighbor_months(year, month):
+    prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return prev_month, (year, month), next_month
+
+
+def build_month_html(year, month, days, today, accent_color):
+    """Full month grid as one HTML block; `days` maps date -> (mood emoji, tag list)."""
+    grid_start, grid_end = month_grid_range(year, month)
+    parts = [
+        "<style>",
+        ".mood-cal {display: grid; grid-template-columns: repeat(7, 1fr); gap: 6px; text-align: center;}",
+        f".mood-cal-head {{font-weight: bold; color: {accent_color};}}",
+        f".mood-cal-day {{color: {accent_color}; padding: 5px; border-radius: 5px; border: 1px solid #ddd;}}",
+        ".mood-cal-day.other {color: #aaa; border-color: transparent;}",
+        ".mood-cal-day.today {color: green; font-weight: bold;}",
+        ".mood-cal-mood {font-size: 20px; min-height: 28px;}",
+        "</style>",
+        "<div class='mood-cal'>",
+    ]
+    parts.extend(f"<div class='mood-cal-head'>{name}</div>" for name in DAY_NAMES)
+    for offset in range((grid_end - grid_start).days + 1):
+        date = grid_start + datetime.timedelta(days=offset)
+        date_key = date.isoformat()
+        day = days.get(date)
+        mood_emoji = (day[0] or "📝") if day else ""
+        mood_tip = f"Entry: {date_key}\nMood: {mood_emoji}\nTags: {', '.join(day[1])}" if day else f"No entry for {date_key}"
+        classes = "mood-cal-day"
+        if date.month != month:
+            classes += " other"
+        if date == today:
+            classes += " today"
+        parts.append(
+            f"<div class='{classes}'><span title='{html.escape(mood_tip, quote=True)}'>{date.day}</span>"
+            f"<div class='mood-cal-mood'>{mood_emoji}</div></div>"
+        )
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def get_month_view(user_name, year, month, stats, today, accent_color):
+    """Cached month grid HTML for a user's DiaryStats."""
+    versions = tuple(stats.month_version(y, m) for y, m in _neighbor_months(year, month))
+    key = (user_name, year, month, versions, today, accent_color)
+    with _month_views_lock:
+        view = _month_views.get(key)
+        if view is not None:
+            _month_views.move_to_end(key)
+            return view
+    grid_start, grid_end = month_grid_range(year, month)
+    view = build_month_html(year, month, stats.columns.days_between(grid_start, grid_end), today, accent_color)
+    with _month_views_lock:
+        _month_views[key] = view
+        while len(_month_views) > MONTH_VIEW_CACHE_SIZE:
+            _month_views.popitem(last=False)
+    return view
+
+
+# -------------------- Year in Pixels
+# --------------------
+
+# Score 0 (no entry) is grey; 1..5 run from red to green
+YEAR_PIXEL_COLORSCALE = [
+    [0.0, "#ebe5dc"], [0.1, "#ebe5dc"],
+    [0.2, "#d9534f"], [0.4, "#f0ad4e"], [0.6, "#f7e07b"], [0.8, "#9ccc65"], [1.0, "#43a047"],
+]
+MOOD_LABELS = np.array(MOOD_EMOJIS + [""], dtype=object) # code -1 (no entry) -> ""
+
+
+@functools.lru_cache(maxsize=64)
+def _year_date_labels(year):
+    """7 x 54 grid of 'YYYY-MM-DD' hover labels for a year ('' outside it)."""
+    labels = np.full((7, 54), "", dtype=object)
+    first = datetime.date(year, 1, 1).toordinal()
+    last = datetime.date(year, 12, 31).toordinal()
+    ordinals = np.arange(first, last + 1)
+    labels[year_cell(ordinals, year)] = [datetime.date.fromordinal(int(o)).isoformat() for o in ordinals]
+    labels.setflags(write=False)
+    return labels
+
+
+def year_pixels_figure(stats, years):
+    """One Plotly heatmap with a GitHub-style 7 x 54 block per year, newest year last."""
+    import plotly.graph_objects as go # Only this page needs Plotly graph objects
+
+    # Each block is a blank row carrying that year's month labels, then its 7 weekday rows:
+    # the week column a month starts in depends on the year (Jan 1's weekday, leap days)
+    blank_row = np.full((1, 54), np.nan)
+    z_blocks, label_blocks, mood_blocks, tickvals, month_labels = [], [], [], [], []
+    for i, year in enumerate(years):
+        scores, moods = stats.year_grid(year)
+        z_blocks.extend((blank_row, scores))
+        label_blocks.extend((np.full((1, 54), "", dtype=object), _year_date_labels(year)))
+        mood_blocks.extend((np.full((1, 54), -1, dtype=np.int8), moods))
+        tickvals.append(i * 8 + 4)
+        month_starts = year_cell([datetime.date(year, m, 1).toordinal() for m in range(1, 13)], year)[1]
+        month_labels.extend(
+            dict(x=int(col), y=i * 8, text=name, showarrow=False, xanchor="left", font=dict(size=10))
+            for col, name in zip(month_starts, calendar.month_abbr[1:])
+        )
+
+    customdata = np.dstack((np.vstack(label_blocks), MOOD_LABELS[np.vstack(mood_blocks)]))
+    fig = go.Figure(go.Heatmap(
+        z=np.vstack(z_blocks),
+        customdata=customdata,
+        colorscale=YEAR_PIXEL_COLORSCALE,
+        zmin=0, zmax=5,
+        xgap=2, ygap=2,
+        showscale=False,
+        hoverongaps=False,
+        hovertemplate="%{customdata[0]} %{customdata[1]}<extra></extra>",
+    ))
+    fig.update_xaxes(showticklabels=False, showgrid=False, zeroline=False)
+    fig.update_yaxes(
+        tickvals=tickvals, ticktext=[str(year) for year in years], autorange="reversed",
+        showgrid=False, zeroline=False, scaleanchor="x",
+    )
+    fig.update_layout(
+        height=80 + 120 * len(years),
+        margin=dict(l=50, r=10, t=10, b=10),
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        annotations=month_labels,
+    )
+    return fig
@@ -0,0 +1,214 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from diary_storage import safe_user_key
+from instrumentation import profiler
+from mood_analytics import DiaryStats
+
+# -------------------- Shared Diary Cache
+# --------------------
+#
+# Every session used to hold its own parsed copy of the whole diary, so memory grew with
+# concurrent sessions x history, and each new tab parsed the file again. Now the process
+# keeps one parsed, read-only copy per user (a CachedDiary, checked against the store's
+# signature() before reuse) and each session gets a DiaryView over it: reads fall
+# through to the shared entries, writes go to the session's own small overlay.
+#
+# The DiaryStats of an untouched view is shared too (DiaryStats.share), and copied for a
+# session only when it records its first entry. Shared entry dicts are never modified;
+# the app replaces whole entries (diary[date_key] = {...}), which lands in the overlay.
+#
+# The cache is an LRU bounded by an estimate of the bytes its diaries take up. Evicting
+# a user drops the cache's reference (sessions already viewing it keep theirs) and calls
+# store.evict() for stores that keep a parsed copy of their own (keeps_documents, e.g.
+# the log store's materialized documents); that copy is counted against the budget too.
+
+DIARY_CACHE_BYTES = int(os.environ.get("MOOD_JOURNAL_DIARY_CACHE_BYTES", 256 * 1024 * 1024))
+
+# Rough resident cost of one parsed entry (dict, keys, mood/score/tag objects) and of
+# its share of the DiaryStats, on top of the entry's text
+ENTRY_OVERHEAD_BYTES = 700
+
+
+def estimate_entries_bytes(entries):
+    """Approximate memory held by a parsed {date_key: entry} dict."""
+    resident_bytes = getattr(entries, "resident_bytes", None)
+    if resident_bytes is not None: # mapped entries: the days file is mapped, text stays on disk
+        return resident_bytes
+    return sum(
+        ENTRY_OVERHEAD_BYTES + len(entry.get("text") or "") + len(entry.get("response") or "")
+        for entry in entries.values()
+    )
+
+
+class CachedDiary:
+    """One user's entries and state as loaded from the store; never modified."""
+
+    def __init__(self, signature, entries, state, store=None):
+        self.signature = signature
+        self.entries = entries
+        self.state = state
+        self.store = store # to evict the store's own copy along with this one
+        self.nbytes = estimate_entries_bytes(entries)
+        if store is not None and store.keeps_documents:
+            self.nbytes *= 2
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """DiaryStats of the shared entries, built on first use."""
+        with self._lock:
+            if self._stats is None:
+                self._stats = DiaryStats(self.entries)
+            return self._stats
+
+
+class DiaryView(MutableMapping):
+    """A session's diary: the shared entries of a CachedDiary plus this session's edits."""
+
+    def __init__(self, cached):
+        self._cached = cached
+        self._base = cached.entries
+        self._edits = {}
+        self._removed = set()
+        self._added = 0 # edited keys that are not in the shared entries
+
+    def __getitem__(self, date_key):
+        if date_key in self._edits:
+            return self._edits[date_key]
+        if date_key in self._removed:
+            raise KeyError(date_key)
+        return self._base[date_key]
+
+    def __contains__(self, date_key):
+        return date_key in self._edits or (date_key in self._base and date_key not in self._removed)
+
+    def __setitem__(self, date_key, entry):
+        if date_key not in self._edits and date_key not in self._base:
+            self._added += 1
+        self._removed.discard(date_key)
+        self._edits[date_key] = entry
+
+    def __delitem__(self, date_key):
+        if date_key not in self:
+            raise KeyError(date_key)
+        if date_key in self._base:
+            self._removed.add(date_key)
+        elif date_key in self._edits:
+            self._added -= 1
+        self._edits.pop(date_key, None)
+
+    def __iter__(self):
+        edits, removed = self._edits, self._removed
+        for date_key in self._base:
+            if date_key not in edits and date_key not in removed:
+                yield date_key
+        yield from edits
+
+    def __len__(self):
+        return len(self._base) - len(self._removed) + self._added
+
+    def __repr__(self):
+        return f"DiaryView({len(self)} entries, {len(self._edits)} edited)"
+
+    @property
+    def edited(self):
+        return bool(self._edits or self._removed)
+
+    def stats(self):
+        """DiaryStats for this view: the shared ones, copied and updated with this session's edits."""
+        if self._removed:
+            return DiaryStats(self)
+        stats = self._cached.stats().share(self)
+        for date_key, entry in self._edits.items(): # the first record_entry copies the shared aggregates
+            stats.record_entry(date_key, entry)
+        return stats
+
+
+class SharedDiaryCache:
+    """Process-wide LRU of CachedDiary per (backend, user), bounded by a byte budget."""
+
+    def __init__(self, max_bytes=DIARY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._diaries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self, store, user_name):
+        """The user's document with "diary" as a new DiaryView, or None if nothing is stored.
+
+        The state is a private copy; the entries are shared until the session edits them.
+        Backends without a signature() are loaded as before (a private plain dict).
+        """
+        key = (store.name, safe_user_key(user_name))
+        signature = store.signature(user_name)
+        if signature is None:
+            return store.load(user_name)
+        with self._lock:
+            cached = self._diaries.get(key)
+            if cached is not None and cached.signature == signature:
+                self._diaries.move_to_end(key)
+                self.hits += 1
+            else:
+                cached = None
+                self.misses += 1
+        profiler.note(cache_hit=cached is not None)
+        if cached is None:
+            opened = store.open_entries(user_name)
+            if opened is None:
+                return None
+            entries, state = opened
+            cached = CachedDiary(signature, entries, state, store)
+            self._store(key, cached)
+        return dict(copy.deepcopy(cached.state), diary=DiaryView(cached))
+
+    def _store(self, key, cached):
+        evicted = []
+        with self._lock:
+            previous = self._diaries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            if cached.nbytes > self.max_bytes:
+                evicted.append((key, cached))
+            else:
+                self._diaries[key] = cached
+                self._bytes += cached.nbytes
+            while self._bytes > self.max_bytes:
+                evicted.append(self._diaries.popitem(last=False))
+                self._bytes -= evicted[-1][1].nbytes
+                self.evictions += 1
+        self._evict_from_stores(evicted)
+
+    @staticmethod
+    def _evict_from_stores(evicted):
+        """Drops the stores' own copies of evicted users (outside the cache lock: stores take theirs)."""
+        for (_, user_key), cached in evicted:
+            if cached.store is not None and cached.store.keeps_documents:
+                cached.store.evict(user_key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "users": len(self._diaries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            evicted = list(self._diaries.items())
+            self._diaries.clear()
+            self._bytes = 0
+        self._evict_from_stores(evicted)
+
+
+shared_diaries = SharedDiaryCache()
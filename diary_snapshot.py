@@ -0,0 +1,504 @@
+import argparse
+import datetime
+import gc
+import itertools
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+try:
+    import zstandard
+except ImportError: # optional: snapshots fall back to zlib
+    zstandard = None
+
+# -------------------- Binary Diary Snapshots
+# --------------------
+#
+# A compact, versioned alternative to the pretty-printed JSON user files (storage
+# backend "snapshot", diary_<name>.mjsnap). A file is:
+#
+#   MAGIC | u16 schema version | u8 codec | u8 reserved | u32 header length
+#   header: MessagePack map {"state": {...}, "counters": {...}}
+#   body:   MessagePack map of entry columns, compressed with the codec
+#
+# The header stays uncompressed and small, so the user state and the precomputed
+# counters (entries, first/last day, the run of logged days ending on the last one, mood
+# counts) are read without touching the entries: see read_header() and snapshot_streak().
+#
+# Entries are stored as date-sorted columns: dates as day ordinals, moods and tags as
+# indexes into per-file tables, scores as int8, text and responses as one string each
+# plus per-entry lengths. Fields outside that schema (or scores that are not small ints)
+# go to a per-entry "extras" map, so nothing in a JSON file is lost.
+#
+# Files written before a schema change are upgraded on read by MIGRATIONS; the JSON
+# files (schema 0) go through the same pipeline. Migrate a data directory with:
+#
+#   python -m diary_snapshot migrate --data-dir .
+
+SNAPSHOT_MAGIC = b"MJSNAP"
+SNAPSHOT_SCHEMA_VERSION = 1
+SNAPSHOT_SUFFIX = ".mjsnap"
+CODEC_ENV_VAR = "MOOD_JOURNAL_SNAPSHOT_CODEC"
+CODECS = {"none": 0, "zlib": 1, "zstd": 2}
+
+_PREAMBLE = struct.Struct("<6sHBBI")
+_NO_SCORE = -128
+_NO_RESPONSE = 0xFFFFFFFF
+ENTRY_FIELDS = ("mood", "text", "score", "tags", "response")
+
+
+class SnapshotError(ValueError):
+    """Raised for files that are not snapshots, are truncated or use an unknown codec/schema."""
+
+
+def default_codec():
+    """MOOD_JOURNAL_SNAPSHOT_CODEC, else zstd when the zstandard package is installed, else zlib."""
+    codec = os.environ.get(CODEC_ENV_VAR, "").strip().lower()
+    if codec:
+        if codec not in CODECS:
+            raise ValueError(f"Unknown snapshot codec: {codec!r} (expected one of {', '.join(CODECS)})")
+        return codec
+    return "zstd" if zstandard is not None else "zlib"
+
+
+# -------------------- MessagePack subset
+# --------------------
+# nil, bool, int, float, str, bin, array and map: enough for JSON-like state plus the
+# binary entry columns, and readable by any MessagePack library.
+
+def _pack(obj, out):
+    if obj is None:
+        out += b"\xc0"
+    elif obj is True:
+        out += b"\xc3"
+    elif obj is False:
+        out += b"\xc2"
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xFF)
+        elif -(1 << 63) <= obj < (1 << 63):
+            out += b"\xd3" + struct.pack(">q", obj)
+        else:
+            out += b"\xcf" + struct.pack(">Q", obj)
+    elif isinstance(obj, float):
+        out += b"\xcb" + struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        n = len(data)
+        if n < 32:
+            out.append(0xA0 | n)
+        elif n < 0x100:
+            out += b"\xd9" + struct.pack(">B", n)
+        elif n < 0x10000:
+            out += b"\xda" + struct.pack(">H", n)
+        else:
+            out += b"\xdb" + struct.pack(">I", n)
+        out += data
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        n = len(obj)
+        if n < 0x100:
+            out += b"\xc4" + struct.pack(">B", n)
+        elif n < 0x10000:
+            out += b"\xc5" + struct.pack(">H", n)
+        else:
+            out += b"\xc6" + struct.pack(">I", n)
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n < 0x10000:
+            out += b"\xdc" + struct.pack(">H", n)
+        else:
+            out += b"\xdd" + struct.pack(">I", n)
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n < 0x10000:
+            out += b"\xde" + struct.pack(">H", n)
+        else:
+            out += b"\xdf" + struct.pack(">I", n)
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise TypeError(f"Cannot store {type(obj).__name__} in a snapshot")
+
+
+def packb(obj):
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+_SIZED = {
+    0xd9: (">B", "str"), 0xda: (">H", "str"), 0xdb: (">I", "str"),
+    0xc4: (">B", "bin"), 0xc5: (">H", "bin"), 0xc6: (">I", "bin"),
+    0xdc: (">H", "array"), 0xdd: (">I", "array"),
+    0xde: (">H", "map"), 0xdf: (">I", "map"),
+}
+_FIXED = {0xcb: ">d", 0xd3: ">q", 0xcf: ">Q"}
+
+
+def _unpack(data, pos):
+    byte = data[pos]
+    pos += 1
+    if byte < 0x80:
+        return byte, pos
+    if byte >= 0xE0:
+        return byte - 0x100, pos
+    if 0xA0 <= byte < 0xC0:
+        kind, n = "str", byte & 0x1F
+    elif 0x90 <= byte < 0xA0:
+        kind, n = "array", byte & 0x0F
+    elif 0x80 <= byte < 0x90:
+        kind, n = "map", byte & 0x0F
+    elif byte == 0xC0:
+        return None, pos
+    elif byte == 0xC2:
+        return False, pos
+    elif byte == 0xC3:
+        return True, pos
+    elif byte in _FIXED:
+        fmt = _FIXED[byte]
+        return struct.unpack_from(fmt, data, pos)[0], pos + struct.calcsize(fmt)
+    elif byte in _SIZED:
+        fmt, kind = _SIZED[byte]
+        n = struct.unpack_from(fmt, data, pos)[0]
+        pos += struct.calcsize(fmt)
+    else:
+        raise SnapshotError(f"Unsupported MessagePack type 0x{byte:02x} at byte {pos - 1}")
+    if kind == "str":
+        return str(data[pos:pos + n], "utf-8"), pos + n
+    if kind == "bin":
+        return bytes(data[pos:pos + n]), pos + n
+    if kind == "array":
+        items = []
+        for _ in range(n):
+            item, pos = _unpack(data, pos)
+            items.append(item)
+        return items, pos
+    result = {}
+    for _ in range(n):
+        key, pos = _unpack(data, pos)
+        result[key], pos = _unpack(data, pos)
+    return result, pos
+
+
+def unpackb(data):
+    try:
+        obj, pos = _unpack(memoryview(data), 0)
+    except (IndexError, struct.error) as e:
+        raise SnapshotError("Truncated snapshot data") from e
+    if pos != len(data):
+        raise SnapshotError(f"{len(data) - pos} unexpected bytes after snapshot data")
+    return obj
+
+
+# -------------------- Entry columns
+# --------------------
+
+def _column(typecode, values):
+    """A typed array as bytes: one typecode byte + little-endian items."""
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return typecode.encode("ascii") + column.tobytes()
+
+
+def _read_column(data):
+    column = array(chr(data[0]))
+    column.frombytes(data[1:])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _index_of(table, index, value):
+    position = index.get(value)
+    if position is None:
+        position = index[value] = len(table)
+        table.append(value)
+    return position
+
+
+def encode_entries(entries):
+    """{date_key: entry} -> the snapshot body map (date-sorted columns)."""
+    mood_table, mood_index = [], {}
+    tag_table, tag_index = [], {}
+    ordinals, moods, scores, tag_counts, tag_ids = [], [], [], [], []
+    texts, text_lengths, responses, response_lengths = [], [], [], []
+    extras = {}
+    for position, date_key in enumerate(sorted(entries)):
+        entry = entries[date_key]
+        ordinals.append(datetime.date.fromisoformat(date_key).toordinal())
+        moods.append(_index_of(mood_table, mood_index, entry.get("mood")))
+        extra = {key: value for key, value in entry.items() if key not in ENTRY_FIELDS}
+        score = entry.get("score")
+        if score is None or (isinstance(score, int) and not isinstance(score, bool) and _NO_SCORE < score < 128):
+            scores.append(_NO_SCORE if score is None else score)
+        else:
+            scores.append(_NO_SCORE)
+            extra["score"] = score
+        tags = entry.get("tags") or []
+        tag_counts.append(len(tags))
+        tag_ids.extend(_index_of(tag_table, tag_index, tag) for tag in tags)
+        text = entry.get("text") or ""
+        texts.append(text)
+        text_lengths.append(len(text))
+        response = entry.get("response")
+        if response is None:
+            response_lengths.append(_NO_RESPONSE)
+        else:
+            responses.append(response)
+            response_lengths.append(len(response))
+        if extra:
+            extras[position] = extra
+    return {
+        "ordinals": _column("i", ordinals),
+        "mood_table": mood_table,
+        "moods": _column("B" if len(mood_table) <= 0x100 else "I", moods),
+        "scores": _column("b", scores),
+        "tag_table": tag_table,
+        "tag_counts": _column("B" if max(tag_counts, default=0) < 0x100 else "I", tag_counts),
+        "tags": _column("H" if len(tag_table) <= 0x10000 else "I", tag_ids),
+        "text": "".join(texts),
+        "text_lengths": _column("I", text_lengths),
+        "response": "".join(responses),
+        "response_lengths": _column("I", response_lengths),
+        "extras": extras,
+    }
+
+
+def decode_entries(body):
+    """The snapshot body map -> {date_key: entry}, in date order."""
+    # Nothing built here can form a cycle; the collections its allocations would trigger
+    # took about a third of the decode time
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _decode_columns(body)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _decode_columns(body):
+    from_ordinal = datetime.date.fromordinal
+    mood_table, tag_table = body["mood_table"], body["tag_table"]
+    tag_ids = _read_column(body["tags"])
+    text, response = body["text"], body["response"]
+    extras = body["extras"]
+    score_values = [None if score == _NO_SCORE else score for score in range(_NO_SCORE, 128)]
+    columns = zip(
+        _read_column(body["ordinals"]), _read_column(body["moods"]), _read_column(body["scores"]),
+        itertools.accumulate(_read_column(body["text_lengths"])),
+        itertools.accumulate(_read_column(body["tag_counts"])),
+        _read_column(body["response_lengths"]),
+    )
+    entries = {}
+    text_at = response_at = tag_at = 0
+    for position, (ordinal, mood, score, text_end, tag_end, response_length) in enumerate(columns):
+        entry = {
+            "mood": mood_table[mood],
+            "text": text[text_at:text_end],
+            "score": score_values[score - _NO_SCORE],
+            "tags": [tag_table[tag_id] for tag_id in tag_ids[tag_at:tag_end]] if tag_end > tag_at else [],
+        }
+        text_at, tag_at = text_end, tag_end
+        if response_length != _NO_RESPONSE:
+            entry["response"] = response[response_at:response_at + response_length]
+            response_at += response_length
+        if extras and position in extras:
+            entry.update(extras[position])
+        entries[from_ordinal(ordinal).isoformat()] = entry
+    return entries
+
+
+def entry_counters(entries):
+    """Header counters: totals and the last run of logged days, without the entries."""
+    if not entries:
+        return {"entries": 0, "first": None, "last": None, "run_start": None, "mood_counts": {}}
+    ordinals = sorted(datetime.date.fromisoformat(date_key).toordinal() for date_key in entries)
+    run_start = ordinals[-1]
+    for ordinal in reversed(ordinals[:-1]):
+        if ordinal != run_start - 1:
+            break
+        run_start = ordinal
+    mood_counts = {}
+    for entry in entries.values():
+        mood_counts[entry.get("mood")] = mood_counts.get(entry.get("mood"), 0) + 1
+    return {
+        "entries": len(entries), "first": ordinals[0], "last": ordinals[-1],
+        "run_start": run_start, "mood_counts": mood_counts,
+    }
+
+
+def snapshot_streak(counters, today=None):
+    """Current streak from header counters, as DiaryStats.streak() counts it.
+
+    Returns None when it cannot be told from the counters (entries dated after today).
+    """
+    today_ordinal = (today or datetime.date.today()).toordinal()
+    last = counters.get("last")
+    if last is None or last < today_ordinal - 1:
+        return 0
+    if last > today_ordinal:
+        return None
+    return last - counters["run_start"] + 1
+
+
+# -------------------- Schema migrations
+# --------------------
+# MIGRATIONS[v] upgrades a decoded document from schema v to v + 1. Schema 0 is the
+# original JSON file, which load_diary() used to patch up on every load.
+
+def _migrate_json_document(data):
+    if data.get("fortune_drawn_on") is None and data.get("fortune_result"):
+        # Files saved before the fortune schedule kept fortune_date + fortune_result
+        data["fortune_drawn_on"] = data.get("fortune_date")
+    data.pop("fortune_result", None)
+    data.pop("fortune_date", None)
+    elf_state = data.get("elf_state")
+    if isinstance(elf_state, dict):
+        elf_state.setdefault("daily_potion_count", 0)
+        elf_state.setdefault("last_potion_date", "1900-01-01")
+    for entry in data.get("diary", {}).values():
+        entry.setdefault("tags", [])
+        entry.setdefault("text", "")
+    return data
+
+
+MIGRATIONS = {0: _migrate_json_document}
+
+
+def migrate_document(data, schema):
+    """Upgrades a decoded document from `schema` to SNAPSHOT_SCHEMA_VERSION."""
+    if schema > SNAPSHOT_SCHEMA_VERSION:
+        raise SnapshotError(f"Snapshot schema {schema} is newer than this app ({SNAPSHOT_SCHEMA_VERSION})")
+    while schema < SNAPSHOT_SCHEMA_VERSION:
+        data = MIGRATIONS[schema](data)
+        schema += 1
+    return data
+
+
+# -------------------- Files
+# --------------------
+
+def _compress(payload, codec):
+    if codec == "zlib":
+        return zlib.compress(payload, 1)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd snapshots need the zstandard package (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=3).compress(payload)
+    return payload
+
+
+def _decompress(payload, codec):
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd snapshots need the zstandard package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return payload
+
+
+def encode_snapshot(data, codec=None):
+    """A full document ({"diary": ..., state...}) -> snapshot bytes."""
+    codec = codec or default_codec()
+    entries = data.get("diary", {})
+    state = {key: value for key, value in data.items() if key != "diary"}
+    header = packb({"state": state, "counters": entry_counters(entries)})
+    body = _compress(packb(encode_entries(entries)), codec)
+    preamble = _PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_SCHEMA_VERSION, CODECS[codec], 0, len(header))
+    return preamble + header + body
+
+
+def _split(payload):
+    if len(payload) < _PREAMBLE.size:
+        raise SnapshotError("Not a diary snapshot (too short)")
+    magic, schema, codec_id, _, header_length = _PREAMBLE.unpack_from(payload)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a diary snapshot (bad magic)")
+    codec = next((name for name, value in CODECS.items() if value == codec_id), None)
+    if codec is None:
+        raise SnapshotError(f"Unknown snapshot codec id {codec_id}")
+    header_end = _PREAMBLE.size + header_length
+    return schema, codec, payload[_PREAMBLE.size:header_end], payload[header_end:]
+
+
+def decode_snapshot(payload):
+    """Snapshot bytes -> the full document, migrated to the current schema.
+
+    Raises SnapshotError for anything that is not an intact snapshot.
+    """
+    schema, codec, header, body = _split(payload)
+    try:
+        data = dict(unpackb(header)["state"])
+        data["diary"] = decode_entries(unpackb(_decompress(body, codec)))
+    except (SnapshotError, ImportError):
+        raise
+    except Exception as e: # codec errors, damaged columns or tables
+        raise SnapshotError(f"Corrupt snapshot: {e!r}") from e
+    return migrate_document(data, schema)
+
+
+def read_header(path):
+    """(schema, {"state": ..., "counters": ...}) of a snapshot file, reading only its header."""
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        schema, _, _, _ = _split(preamble)
+        header_length = _PREAMBLE.unpack(preamble)[4]
+        header = f.read(header_length)
+    if len(header) != header_length:
+        raise SnapshotError("Truncated snapshot header")
+    try:
+        header = unpackb(header)
+        header["state"], header["counters"]
+    except SnapshotError:
+        raise
+    except Exception as e:
+        raise SnapshotError(f"Corrupt snapshot header: {e!r}") from e
+    return schema, header
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate diary JSON files to binary snapshots, or show a snapshot's header.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="write diary_<name>.mjsnap for every diary_<name>.json")
+    migrate.add_argument("--data-dir", default=".")
+    migrate.add_argument("--remove-json", action="store_true", help="delete each JSON file once its snapshot is written")
+    inspect = commands.add_parser("inspect", help="print a snapshot's schema, state and counters")
+    inspect.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "inspect":
+        schema, header = read_header(args.path)
+        print(f"schema {schema}")
+        for key, value in header["counters"].items():
+            if key in ("first", "last", "run_start") and value is not None:
+                value = datetime.date.fromordinal(value).isoformat()
+            print(f"{key}: {value}")
+        print(f"streak: {snapshot_streak(header['counters'])}")
+        for key, value in header["state"].items():
+            print(f"state.{key}: {value}")
+        return 0
+
+    from diary_storage import SnapshotDiaryStore # diary_storage imports this module
+    store = SnapshotDiaryStore(args.data_dir)
+    for user, json_size, snapshot_size in store.migrate_legacy_files(remove_json=args.remove_json):
+        print(f"{user}: {json_size} -> {snapshot_size} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
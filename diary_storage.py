@@ -0,0 +1,1280 @@
+import copy
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+from diary_snapshot import SNAPSHOT_SUFFIX, decode_snapshot, encode_snapshot, migrate_document, read_header
+from instrumentation import profiler
+from mapped_diary import (
+    MappedEntries, empty_columns, encode_days, heap_generation, heap_path, merge_columns, new_columns, packed_offsets,
+)
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+# -------------------- Diary Storage Backends
+# --------------------
+#
+# A user's data is one document in the shape the app has always saved:
+#   {"diary": {"YYYY-MM-DD": entry, ...}, "total_points": ..., "fortune_drawn_on": ...,
+#    "elf_state": {...}, "user_name": ...}
+# Everything except "diary" is the (small) per-user *state*.
+#
+# Backends:
+#   "json"   -> one pretty-printed diary_<name>.json file per user (original format)
+#   "log"    -> diary_<name>.json snapshot + append-only diary_<name>.log of small records
+#   "sqlite" -> one row per entry keyed by (user, date) + one state row per user
+#   "snapshot" -> one compact, versioned binary diary_<name>.mjsnap per user (diary_snapshot.py)
+#   "mapped" -> memory-mapped per-day metadata + a text heap read on demand (mapped_diary.py)
+
+# Every save bumps a "version" counter in the state. Saves pass the state they started
+# from as `base`; if another session saved in between, the two edits are merged:
+# the counters below add up both sessions' deltas, every other field keeps whichever
+# side changed it (the saving session's value if both did).
+
+STORAGE_ENV_VAR = "MOOD_JOURNAL_STORAGE"
+SQLITE_PATH_ENV_VAR = "MOOD_JOURNAL_DB"
+DEFAULT_SQLITE_PATH = "mood_journal.db"
+MAX_SAVE_RETRIES = 20
+
+
+class DiaryConflictError(RuntimeError):
+    """Raised when a save keeps losing optimistic version checks to other sessions."""
+
+
+class DiaryFormatError(ValueError):
+    """Raised when a stored document is valid JSON but not shaped like a diary document."""
+
+
+def read_json_document(path):
+    """Parses a diary_<name>.json document, checking it is {..., "diary": {date_key: entry}}."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    diary = data.get("diary", {}) if isinstance(data, dict) else None
+    if not isinstance(diary, dict) or not all(isinstance(entry, dict) for entry in diary.values()):
+        raise DiaryFormatError(f"{path} is not a diary document")
+    return data
+
+
+def safe_user_key(user_name):
+    """Normalizes a user name the same way the diary file names always have."""
+    if not user_name:
+        return None
+    return user_name.strip().lower().replace(" ", "_")
+
+
+def user_data_file(user_name, data_dir="."):
+    """Generates the legacy JSON file name for a user."""
+    safe_name = safe_user_key(user_name)
+    if not safe_name:
+        return None
+    return os.path.join(data_dir, f"diary_{safe_name}.json")
+
+
+# Search indexes used to be saved as diary_<name>.search.json; list_users skips any
+# still lying around until search_index.adopt_legacy_index() moves them
+LEGACY_SEARCH_INDEX_SUFFIX = ".search.json"
+
+
+def scan_user_files(data_dir, suffixes):
+    """Safe keys of the users with a diary_<key><suffix> file in data_dir."""
+    users = set()
+    for file_name in os.listdir(data_dir):
+        if not file_name.startswith("diary_") or file_name.endswith(LEGACY_SEARCH_INDEX_SUFFIX):
+            continue
+        for suffix in suffixes:
+            if file_name.endswith(suffix):
+                users.add(file_name[len("diary_"):-len(suffix)])
+    return sorted(users)
+
+
+def split_document(data):
+    """Splits a saved document into (entries, state)."""
+    state = {k: v for k, v in data.items() if k != "diary"}
+    return data.get("diary", {}), state
+
+
+# State paths ("*" matches any key) whose concurrent changes add up. Tallies only ever
+# grow, so a decrease is a reset (sprout reset, new potion day) and wins over the other
+# side's increments; stocks go both ways and just add their deltas.
+COUNTER_TALLIES = {
+    ("total_points",),
+    ("elf_state", "emotion_counts", "*"),
+    ("elf_state", "total_feeds"),
+    ("elf_state", "daily_potion_count"),
+}
+COUNTER_STOCKS = {
+    ("elf_state", "available_potions", "*"),
+}
+
+
+def _matches(path, patterns):
+    return any(
+        len(pattern) == len(path) and all(p in ("*", key) for p, key in zip(pattern, path))
+        for pattern in patterns
+    )
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def merge_state(base, mine, theirs, path=()):
+    """Three-way merge of two sessions' edits to the same starting state."""
+    if isinstance(mine, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        return {
+            key: merge_state(base.get(key), mine.get(key), theirs.get(key), path + (key,))
+            for key in {**theirs, **mine}
+        }
+    if all(_is_number(v) for v in (base, mine, theirs)):
+        if _matches(path, COUNTER_TALLIES):
+            if mine < base or theirs < base: # a reset: keep the lower (reset) side
+                return min(mine, theirs)
+            return theirs + (mine - base)
+        if _matches(path, COUNTER_STOCKS):
+            return max(0, theirs + (mine - base))
+    return mine if mine != base else theirs
+
+
+def resolve_state(stored, state, base):
+    """Returns the state to write next: `state`, merged with any save made since `base`."""
+    stored_version = (stored or {}).get("version", 0)
+    if stored is not None and base is not None and base.get("version", 0) != stored_version:
+        state = merge_state(base, state, stored)
+    state = dict(state)
+    state["version"] = stored_version + 1
+    return state
+
+
+# -------------------- Atomic writes and per-user locks
+# --------------------
+
+def _lock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue # LK_LOCK gives up after ~10s; keep waiting
+
+
+def _unlock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class UserLock:
+    """Re-entrant lock for one user's files: a thread lock plus an advisory file lock."""
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.lock_path, "a+b")
+                _lock_file(self._file)
+            except BaseException:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            _unlock_file(self._file)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+
+_USER_LOCKS = {}
+_USER_LOCKS_GUARD = threading.Lock()
+
+
+def user_lock(path):
+    """Returns the process-wide lock guarding a user's data file."""
+    key = os.path.abspath(path)
+    with _USER_LOCKS_GUARD:
+        lock = _USER_LOCKS.get(key)
+        if lock is None:
+            lock = _USER_LOCKS[key] = UserLock(key + ".lock")
+        return lock
+
+
+def _temp_path(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def file_signature(stat):
+    """(mtime, size, inode) of a stat result: every write renames a new file into place, so
+    the inode changes even when two same-size writes land within one mtime tick."""
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def atomic_write_bytes(path, payload):
+    """Writes a file via temp file + fsync + rename, so readers never see a partial write."""
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    profiler.note(bytes_written=len(payload))
+
+
+def atomic_write_json(path, data):
+    """Atomically writes a document in the app's original pretty-printed JSON format."""
+    atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, indent=4).encode("utf-8"))
+
+
+def summarize_history(entries, before):
+    """Counters for the entries dated before `before` ('YYYY-MM-DD'), for a partly loaded diary.
+
+    {"before": before, "entries": count, "mood_counts": {mood: count}, "run_start": date}
+    where run_start is the first day of the run of consecutive logged days ending the day
+    before `before` (None if that day has no entry).
+    """
+    mood_counts = {}
+    count = 0
+    for date_key, entry in entries.items():
+        if date_key < before:
+            count += 1
+            mood_counts[entry.get("mood")] = mood_counts.get(entry.get("mood"), 0) + 1
+    run_start = None
+    day = datetime.date.fromisoformat(before) - datetime.timedelta(days=1)
+    while day.isoformat() in entries:
+        run_start = day.isoformat()
+        day -= datetime.timedelta(days=1)
+    return {"before": before, "entries": count, "mood_counts": mood_counts, "run_start": run_start}
+
+
+class DiaryStore:
+    """Interface shared by all diary backends."""
+
+    name = "base"
+    range_reads = False # True when load_entries() reads only the requested dates
+    migrated = False # True when documents come back upgraded by diary_snapshot.MIGRATIONS
+    keeps_documents = False # True when the store holds its own parsed copy of a loaded user (until evict())
+
+    def load(self, user_name):
+        """Returns the full document for a user, or None if nothing is stored."""
+        raise NotImplementedError
+
+    def load_entries(self, user_name, start=None, end=None):
+        """Returns {date_key: entry} for dates in [start, end] (inclusive, 'YYYY-MM-DD')."""
+        raise NotImplementedError
+
+    def upsert_entry(self, user_name, date_key, entry, state=None, base=None):
+        """Inserts or replaces a single entry, optionally saving the state with it.
+
+        Returns the state actually written (see `save_state`), or None without a state.
+        """
+        raise NotImplementedError
+
+    def upsert_entries(self, user_name, batches):
+        """Bulk upsert: writes each {date_key: entry} dict of `batches` as one unit.
+
+        `batches` may be a generator, so an import never holds more than one batch of
+        rows. Returns the number of entries written.
+        """
+        raise NotImplementedError
+
+    def iter_entries(self, user_name, start=None, end=None):
+        """Yields (date_key, entry) in date order for dates in [start, end].
+
+        Document backends hold the whole diary anyway; SQLite streams rows from a cursor.
+        """
+        yield from sorted(self.load_entries(user_name, start, end).items())
+
+    def load_window(self, user_name, start):
+        """(document with only the entries dated `start` or later, history_summary of the rest).
+
+        Returns None if nothing is stored. Cheap only on backends with `range_reads`.
+        """
+        data = self.load(user_name)
+        if data is None:
+            return None
+        entries = data.get("diary", {})
+        data["diary"] = {date_key: entry for date_key, entry in entries.items() if date_key >= start}
+        return data, summarize_history(entries, start)
+
+    def history_summary(self, user_name, before):
+        """Counters for the entries dated before `before` (see summarize_history)."""
+        return summarize_history(self.load_entries(user_name, end=before), before)
+
+    def open_entries(self, user_name):
+        """(entries mapping, state) for a process-wide cache, or None if nothing is stored.
+
+        Document backends return a parsed dict; "mapped" returns lazy MappedEntries.
+        """
+        data = self.load(user_name)
+        return split_document(data) if data is not None else None
+
+    def save_state(self, user_name, state, base=None):
+        """Saves the per-user state (everything except the entries).
+
+        `base` is the state this session last loaded or saved; concurrent saves made
+        since then are merged in. Returns the written state, including its new version.
+        """
+        raise NotImplementedError
+
+    def save(self, user_name, data):
+        """Replaces everything stored for a user with a full document."""
+        raise NotImplementedError
+
+    def list_users(self):
+        """Returns the safe keys of all users with stored data."""
+        raise NotImplementedError
+
+    def evict(self, user_name):
+        """Drops any cached copy of a user's document (for scans over many users)."""
+
+    def signature(self, user_name):
+        """Cheap token that changes whenever the user's stored data changes (None: unknown).
+
+        Lets a cache of parsed documents check it is current without reading them.
+        """
+        return None
+
+
+def _in_range(date_key, start, end):
+    return (start is None or date_key >= start) and (end is None or date_key <= end)
+
+
+# -------------------- JSON files (original format)
+# --------------------
+
+class JsonDiaryStore(DiaryStore):
+    """Original format: the whole document rewritten to diary_<name>.json on every save."""
+
+    name = "json"
+
+    def __init__(self, data_dir="."):
+        self.data_dir = data_dir
+
+    def path_for(self, user_name):
+        return user_data_file(user_name, self.data_dir)
+
+    def _read(self, path):
+        """A freshly parsed document (None if there is none); parsed copies are kept by SharedDiaryCache."""
+        try:
+            return self._read_file(path)
+        except FileNotFoundError:
+            return None
+
+    def _read_file(self, path):
+        return read_json_document(path)
+
+    def _write(self, path, data):
+        self._write_file(path, data)
+
+    def _write_file(self, path, data):
+        atomic_write_json(path, data)
+
+    def load(self, user_name):
+        path = self.path_for(user_name)
+        if not path:
+            return None
+        return self._read(path)
+
+    def load_entries(self, user_name, start=None, end=None):
+        path = self.path_for(user_name)
+        data = self._read(path) if path else None
+        if not data:
+            return {}
+        return {
+            date_key: entry
+            for date_key, entry in data.get("diary", {}).items()
+            if _in_range(date_key, start, end)
+        }
+
+    def _update(self, user_name, date_key=None, entry=None, state=None, base=None):
+        """Read-modify-write of the whole file, holding the user's lock throughout."""
+        path = self.path_for(user_name)
+        if not path:
+            return None
+        with user_lock(path):
+            data = self.load(user_name) or {"diary": {}}
+            if date_key is not None:
+                data.setdefault("diary", {})[date_key] = entry
+            written = None
+            if state is not None:
+                written = resolve_state(split_document(data)[1], state, base)
+                data.update(written)
+            self._write(path, data)
+            return written
+
+    def upsert_entry(self, user_name, date_key, entry, state=None, base=None):
+        return self._update(user_name, date_key, entry, state, base)
+
+    def upsert_entries(self, user_name, batches):
+        # One read-modify-write for all batches: rewriting the file per batch would be quadratic
+        path = self.path_for(user_name)
+        if not path:
+            return 0
+        written = 0
+        with user_lock(path):
+            data = self.load(user_name) or {"diary": {}}
+            diary = data.setdefault("diary", {})
+            for batch in batches:
+                diary.update(batch)
+                written += len(batch)
+            if written:
+                self._write(path, data)
+        return written
+
+    def save_state(self, user_name, state, base=None):
+        return self._update(user_name, state=state, base=base)
+
+    def save(self, user_name, data):
+        path = self.path_for(user_name)
+        if path:
+            with user_lock(path):
+                stored = self.load(user_name) or {}
+                data = dict(data, version=stored.get("version", 0) + 1)
+                self._write(path, data)
+
+    def signature(self, user_name):
+        path = self.path_for(user_name)
+        try:
+            stat = os.stat(path) if path else None
+        except FileNotFoundError:
+            return None
+        return (path,) + file_signature(stat) if stat else None
+
+    def list_users(self):
+        return scan_user_files(self.data_dir, (".json",))
+
+
+# -------------------- Binary snapshots
+# --------------------
+
+class SnapshotDiaryStore(JsonDiaryStore):
+    """Whole document per user like "json", in the binary snapshot format (diary_<name>.mjsnap).
+
+    A user's diary_<name>.json is migrated the first time it is read; the JSON file is
+    left in place (python -m diary_snapshot migrate --remove-json converts and deletes).
+    """
+
+    name = "snapshot"
+    migrated = True
+
+    def path_for(self, user_name):
+        path = user_data_file(user_name, self.data_dir)
+        return path[:-len(".json")] + SNAPSHOT_SUFFIX if path else None
+
+    @staticmethod
+    def legacy_path(path):
+        return path[:-len(SNAPSHOT_SUFFIX)] + ".json"
+
+    def _read_file(self, path):
+        with open(path, "rb") as f:
+            return decode_snapshot(f.read())
+
+    def _write_file(self, path, data):
+        atomic_write_bytes(path, encode_snapshot(data))
+
+    def _read(self, path):
+        data = super()._read(path)
+        if data is None:
+            data = self._migrate_legacy_file(path)
+        return data
+
+    def _migrate_legacy_file(self, path):
+        """Writes the snapshot for a legacy JSON file; returns the migrated document (None: no file)."""
+        legacy_path = self.legacy_path(path)
+        if not os.path.exists(legacy_path):
+            return None
+        with user_lock(path):
+            if not os.path.exists(path): # else another session migrated it meanwhile
+                self._write(path, migrate_document(read_json_document(legacy_path), 0))
+            return super()._read(path)
+
+    def migrate_legacy_files(self, remove_json=False):
+        """Migrates every legacy JSON file; yields (user, JSON bytes, snapshot bytes)."""
+        for user in super().list_users():
+            path = self.path_for(user)
+            legacy_path = self.legacy_path(path)
+            self._read(path)
+            yield user, os.path.getsize(legacy_path), os.path.getsize(path)
+            self.evict(user)
+            if remove_json:
+                os.remove(legacy_path)
+
+    def read_counters(self, user_name):
+        """The header counters (see diary_snapshot.entry_counters) without decoding the entries."""
+        path = self.path_for(user_name)
+        if not path or (not os.path.exists(path) and self._migrate_legacy_file(path) is None):
+            return None
+        return read_header(path)[1]["counters"]
+
+    def list_users(self):
+        return scan_user_files(self.data_dir, (".json", SNAPSHOT_SUFFIX)) # legacy JSON files not migrated yet
+
+
+# -------------------- Memory-mapped days + text heap
+# --------------------
+
+HEAP_COMPACT_BYTES = 1024 * 1024 # Rewrite a heap once it is this big and mostly superseded blobs
+
+
+class MappedDiaryStore(DiaryStore):
+    """Per-day metadata in a memory-mapped diary_<name>.days, entry text in a heap (mapped_diary.py).
+
+    The state lives in diary_<name>.state (JSON). Legacy diary_<name>.json files are
+    imported the first time a user is loaded.
+    """
+
+    name = "mapped"
+
+    def __init__(self, data_dir="."):
+        self.data_dir = data_dir
+
+    def _base(self, user_name):
+        path = user_data_file(user_name, self.data_dir)
+        return path[:-len(".json")] if path else None
+
+    @staticmethod
+    def _read_state(base):
+        try:
+            with open(base + ".state", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _import_legacy_file(self, user_name):
+        """Imports diary_<name>.json if the user has no state yet; returns whether the user exists now."""
+        base = self._base(user_name)
+        if self._read_state(base) is not None:
+            return True
+        legacy_path = base + ".json"
+        if not os.path.exists(legacy_path):
+            return False
+        self.save(user_name, read_json_document(legacy_path))
+        return True
+
+    def open_entries(self, user_name):
+        base = self._base(user_name)
+        if not base or not self._import_legacy_file(user_name):
+            return None
+        return MappedEntries(base + ".days"), self._read_state(base)
+
+    def load(self, user_name):
+        opened = self.open_entries(user_name)
+        if opened is None:
+            return None
+        entries, state = opened
+        return dict(state, diary=dict(entries.iter_rows()))
+
+    def load_entries(self, user_name, start=None, end=None):
+        return dict(self.iter_entries(user_name, start, end))
+
+    def iter_entries(self, user_name, start=None, end=None):
+        opened = self.open_entries(user_name)
+        if opened is not None:
+            yield from opened[0].iter_rows(start, end)
+
+    def _write_entries(self, base, entries, replace=False):
+        """Appends the entries' blobs to the heap and replaces the days file; call holding the user lock."""
+        days_path = base + ".days"
+        current = MappedEntries(days_path)
+        if replace:
+            generation, heap_offset, old_columns = current.generation + 1, 0, empty_columns()
+        else:
+            generation, old_columns = current.generation, current.column_arrays()
+            heap_offset = os.path.getsize(current.heap_path) if os.path.exists(current.heap_path) else 0
+        columns, blobs = new_columns(entries, heap_offset)
+        payload = b"".join(blobs)
+        if replace:
+            atomic_write_bytes(heap_path(days_path, generation), payload)
+        elif payload:
+            with open(heap_path(days_path, generation), "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            profiler.note(bytes_written=len(payload))
+        columns = merge_columns(old_columns, columns)
+        atomic_write_bytes(days_path, encode_days(generation, columns))
+        current.close()
+        heap_size = heap_offset + len(payload)
+        if replace:
+            self._remove_old_heaps(days_path, generation)
+        elif heap_size > HEAP_COMPACT_BYTES and heap_size > 2 * int(columns["lengths"].sum()):
+            self._compact(days_path)
+
+    @staticmethod
+    def _remove_old_heaps(days_path, generation):
+        """Deletes the heaps of generations before `generation` (readers keep theirs open)."""
+        directory = os.path.dirname(days_path) or "."
+        for file_name in os.listdir(directory):
+            old = heap_generation(days_path, file_name)
+            if old is not None and old < generation:
+                try:
+                    os.remove(os.path.join(directory, file_name))
+                except OSError: # still open on Windows: retried after the next new generation
+                    pass
+
+    def _compact(self, days_path):
+        """Rewrites the heap with only the live blobs, as the next generation."""
+        current = MappedEntries(days_path)
+        columns = current.column_arrays()
+        blobs = [current.read_blob(row) for row in range(len(current))]
+        columns["offsets"] = packed_offsets(columns["lengths"])
+        generation = current.generation + 1
+        atomic_write_bytes(heap_path(days_path, generation), b"".join(blobs))
+        atomic_write_bytes(days_path, encode_days(generation, columns))
+        current.close()
+        self._remove_old_heaps(days_path, generation)
+
+    def _write_state(self, base, state, base_state=None, overwrite=False):
+        stored = self._read_state(base)
+        if overwrite:
+            written = dict(state, version=(stored or {}).get("version", 0) + 1)
+        else:
+            written = resolve_state(stored, state, base_state)
+        atomic_write_json(base + ".state", written)
+        return written
+
+    def _ensure_state(self, base, user_name):
+        if self._read_state(base) is None:
+            self._write_state(base, {"user_name": user_name})
+
+    def upsert_entry(self, user_name, date_key, entry, state=None, base=None):
+        user_base = self._base(user_name)
+        if not user_base:
+            return None
+        self._import_legacy_file(user_name)
+        with user_lock(user_base + ".days"):
+            self._write_entries(user_base, {date_key: entry})
+            if state is not None:
+                return self._write_state(user_base, state, base)
+            self._ensure_state(user_base, user_name)
+            return None
+
+    def upsert_entries(self, user_name, batches):
+        user_base = self._base(user_name)
+        if not user_base:
+            return 0
+        self._import_legacy_file(user_name)
+        written = 0
+        for batch in batches: # one days file rewrite per batch
+            if batch:
+                with user_lock(user_base + ".days"):
+                    self._write_entries(user_base, batch)
+                    self._ensure_state(user_base, user_name)
+                written += len(batch)
+        return written
+
+    def save_state(self, user_name, state, base=None):
+        user_base = self._base(user_name)
+        if not user_base:
+            return None
+        self._import_legacy_file(user_name)
+        with user_lock(user_base + ".days"):
+            return self._write_state(user_base, state, base)
+
+    def save(self, user_name, data):
+        user_base = self._base(user_name)
+        if not user_base:
+            return
+        entries, state = split_document(data)
+        with user_lock(user_base + ".days"):
+            self._write_entries(user_base, entries, replace=True)
+            self._write_state(user_base, state, overwrite=True)
+
+    def signature(self, user_name):
+        user_base = self._base(user_name)
+        try:
+            state = os.stat(user_base + ".state") if user_base else None
+        except FileNotFoundError:
+            return None
+        if state is None:
+            return None
+        try:
+            days = os.stat(user_base + ".days")
+            days_sig = file_signature(days)
+        except FileNotFoundError:
+            days_sig = None
+        return (user_base, days_sig, file_signature(state))
+
+    def list_users(self):
+        return scan_user_files(self.data_dir, (".state", ".json")) # legacy JSON files are imported on first load
+
+
+# -------------------- JSON snapshot + append-only log
+# --------------------
+
+LOG_COMPACT_BYTES = 256 * 1024 # Fold the log into a fresh snapshot once it grows past this
+
+
+def _state_patch(old, new):
+    """Returns only the (nested) keys of `new` whose values differ from `old`."""
+    patch = {}
+    for key, value in new.items():
+        old_value = old.get(key)
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            nested = _state_patch(old_value, value)
+            if nested:
+                patch[key] = nested
+        elif value != old_value or key not in old:
+            patch[key] = value
+    return patch
+
+
+def _apply_patch(target, patch):
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _apply_patch(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+def apply_log_record(data, record):
+    """Replays one log record onto a document (records are idempotent 'set' operations)."""
+    op = record.get("op")
+    if op == "entry":
+        data.setdefault("diary", {})[record["date"]] = record["entry"]
+    elif op == "entries":
+        data.setdefault("diary", {}).update(record["entries"])
+    elif op == "replace":
+        data.clear()
+        data.update(copy.deepcopy(record["data"]))
+    if "set" in record:
+        _apply_patch(data, record["set"])
+
+
+class LogDiaryStore(JsonDiaryStore):
+    """Snapshot in diary_<name>.json plus small appended records in diary_<name>.log.
+
+    Each save appends one line (an entry upsert and/or the changed state keys), so
+    write cost does not depend on history size. Loading replays the log over the
+    snapshot; once the log passes `compact_bytes` a background thread folds it into
+    a new snapshot that replaces the old one by rename.
+    """
+
+    name = "log"
+    keeps_documents = True
+
+    def __init__(self, data_dir=".", compact_bytes=LOG_COMPACT_BYTES):
+        super().__init__(data_dir)
+        self.compact_bytes = compact_bytes
+        # Materialized documents: user -> (snapshot signature, log bytes replayed, document)
+        self._docs = {}
+        self._compacting = set()
+        self._compact_lock = threading.Lock()
+
+    def log_path_for(self, user_name):
+        path = self.path_for(user_name)
+        return path[:-len(".json")] + ".log" if path else None
+
+    def signature(self, user_name):
+        path = self.path_for(user_name)
+        if not path:
+            return None
+        snapshot_sig = self._signature(path)
+        log_sig = self._signature(self.log_path_for(user_name))
+        if snapshot_sig is None and log_sig is None:
+            return None
+        return (path, snapshot_sig, log_sig)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return file_signature(stat) # (mtime, size, inode): _document reads the size at [1]
+
+    @staticmethod
+    def _replay(data, log_path, offset):
+        """Applies log records from `offset`; returns the offset just past the last complete line."""
+        try:
+            f = open(log_path, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # Torn final write from a crash: ignore it
+                offset += len(line)
+                try:
+                    apply_log_record(data, json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+        return offset
+
+    def _document(self, path):
+        """Returns the up-to-date materialized document for a snapshot path (not a copy)."""
+        log_path = path[:-len(".json")] + ".log"
+        with user_lock(path):
+            snapshot_sig = self._signature(path)
+            log_sig = self._signature(log_path)
+            log_size = log_sig[1] if log_sig else 0
+            cached = self._docs.get(path)
+            if cached and cached[0] == snapshot_sig and cached[1] <= log_size:
+                profiler.note(cache_hit=True)
+                _, offset, data = cached
+                if offset < log_size:
+                    offset = self._replay(data, log_path, offset)
+                    self._docs[path] = (snapshot_sig, offset, data)
+                return data
+            if snapshot_sig is None and log_sig is None:
+                return None
+            profiler.note(cache_hit=False)
+            data = {"diary": {}}
+            if snapshot_sig:
+                data = read_json_document(path)
+            offset = self._replay(data, log_path, 0)
+            self._docs[path] = (snapshot_sig, offset, data)
+            return data
+
+    def _append(self, user_name, record):
+        path = self.path_for(user_name)
+        log_path = self.log_path_for(user_name)
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with user_lock(path):
+            data = self._document(path)
+            with open(log_path, "ab") as f:
+                if f.tell() > 0:
+                    with open(log_path, "rb") as tail:
+                        tail.seek(-1, os.SEEK_END)
+                        if tail.read(1) != b"\n":
+                            f.write(b"\n") # Terminate a torn line so this record stays readable
+                f.write(line)
+                f.flush()
+                log_size = f.tell()
+            profiler.note(bytes_written=len(line))
+            if data is None:
+                data = {"diary": {}}
+            apply_log_record(data, record)
+            self._docs[path] = (self._signature(path), log_size, data)
+        if log_size >= self.compact_bytes:
+            self._schedule_compaction(user_name)
+
+    def _schedule_compaction(self, user_name):
+        path = self.path_for(user_name)
+        with self._compact_lock:
+            if path in self._compacting:
+                return
+            self._compacting.add(path)
+        threading.Thread(target=self.compact, args=(user_name,), daemon=True).start()
+
+    def compact(self, user_name):
+        """Folds the log into a fresh snapshot without blocking appends for the whole rewrite."""
+        path = self.path_for(user_name)
+        log_path = self.log_path_for(user_name)
+        try:
+            with user_lock(path):
+                data = self._document(path)
+                cached = self._docs.get(path) # evict() may have dropped it meanwhile
+                if data is None or cached is None:
+                    return
+                snapshot_sig, folded_offset, _ = cached
+                snapshot = copy.deepcopy(data)
+            tmp_path = _temp_path(path)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            with user_lock(path):
+                if self._signature(path) != snapshot_sig:
+                    os.remove(tmp_path) # Another process compacted first
+                    return
+                # Keep records appended while the snapshot was being written
+                with open(log_path, "rb") as f:
+                    f.seek(folded_offset)
+                    tail = f.read()
+                os.replace(tmp_path, path)
+                with open(tmp_path, "wb") as f:
+                    f.write(tail)
+                os.replace(tmp_path, log_path)
+                self._docs.pop(path, None)
+        finally:
+            with self._compact_lock:
+                self._compacting.discard(path)
+
+    def load(self, user_name):
+        path = self.path_for(user_name)
+        if not path:
+            return None
+        with user_lock(path):
+            data = self._document(path)
+            return copy.deepcopy(data) if data is not None else None
+
+    def load_entries(self, user_name, start=None, end=None):
+        path = self.path_for(user_name)
+        if not path:
+            return {}
+        with user_lock(path):
+            data = self._document(path)
+            if not data:
+                return {}
+            return {
+                date_key: dict(entry)
+                for date_key, entry in data.get("diary", {}).items()
+                if _in_range(date_key, start, end)
+            }
+
+    def _stored_state(self, user_name):
+        data = self._document(self.path_for(user_name))
+        return split_document(data)[1] if data is not None else None
+
+    def upsert_entry(self, user_name, date_key, entry, state=None, base=None):
+        path = self.path_for(user_name)
+        if not path:
+            return None
+        record = {"op": "entry", "date": date_key, "entry": entry}
+        with user_lock(path):
+            written = None
+            if state is not None:
+                stored = self._stored_state(user_name)
+                written = resolve_state(stored, state, base)
+                record["set"] = _state_patch(stored or {}, written)
+            self._append(user_name, record)
+            return written
+
+    def upsert_entries(self, user_name, batches):
+        # One appended record per batch; compaction folds them in as the log grows
+        if not self.path_for(user_name):
+            return 0
+        written = 0
+        for batch in batches:
+            if batch:
+                self._append(user_name, {"op": "entries", "entries": batch})
+                written += len(batch)
+        return written
+
+    def save_state(self, user_name, state, base=None):
+        path = self.path_for(user_name)
+        if not path:
+            return None
+        with user_lock(path):
+            stored = self._stored_state(user_name)
+            written = resolve_state(stored, state, base)
+            self._append(user_name, {"op": "state", "set": _state_patch(stored or {}, written)})
+            return written
+
+    def save(self, user_name, data):
+        path = self.path_for(user_name)
+        if path:
+            with user_lock(path):
+                stored = self._stored_state(user_name) or {}
+                data = dict(data, version=stored.get("version", 0) + 1)
+                self._append(user_name, {"op": "replace", "data": data})
+            self.compact(user_name)
+
+    def evict(self, user_name):
+        self._docs.pop(self.path_for(user_name), None) # dict.pop is atomic; no file lock needed
+
+    def list_users(self):
+        return scan_user_files(self.data_dir, (".json", ".log"))
+
+
+# -------------------- SQLite (one row per entry)
+# --------------------
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    mood TEXT,
+    score INTEGER,
+    tags TEXT NOT NULL DEFAULT '[]',
+    text TEXT NOT NULL DEFAULT '',
+    response TEXT,
+    PRIMARY KEY (user, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_entries_user_mood ON entries (user, mood);
+CREATE INDEX IF NOT EXISTS idx_entries_date ON entries (date);
+CREATE TABLE IF NOT EXISTS user_state (
+    user TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class _StaleVersion(Exception):
+    """Internal: the state row changed under an optimistic save; roll back and retry."""
+
+
+class SqliteDiaryStore(DiaryStore):
+    """Indexed store: saving an entry is a single-row upsert, ranges read only their rows."""
+
+    name = "sqlite"
+    range_reads = True
+
+    def __init__(self, db_path=DEFAULT_SQLITE_PATH, legacy_dir="."):
+        self.db_path = db_path
+        # Legacy diary_<name>.json files are imported the first time a user is loaded
+        self.legacy_dir = legacy_dir
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(user_state)")]
+            if "version" not in columns: # Databases created before version checks
+                conn.execute("ALTER TABLE user_state ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        # Streamlit serves sessions from several threads; sqlite connections stay per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_entry(row):
+        mood, score, tags, text, response = row
+        entry = {"mood": mood, "text": text, "score": score, "tags": json.loads(tags)}
+        if response is not None:
+            entry["response"] = response
+        return entry
+
+    @staticmethod
+    def _entry_params(user, date_key, entry):
+        return (
+            user, date_key, entry.get("mood"), entry.get("score"),
+            json.dumps(entry.get("tags", []), ensure_ascii=False),
+            entry.get("text", ""), entry.get("response"),
+        )
+
+    @staticmethod
+    def _params_bytes(params):
+        # Approximate row payload for the profiler: UTF-8 text plus 8 bytes per number
+        return sum(len(p.encode("utf-8")) if isinstance(p, str) else 8 for p in params if p is not None)
+
+    def _upsert_rows(self, conn, user, entries):
+        rows = (self._entry_params(user, date_key, entry) for date_key, entry in entries.items())
+        if profiler.recording():
+            rows = list(rows)
+            profiler.note(bytes_written=sum(self._params_bytes(row) for row in rows))
+        conn.executemany(
+            "INSERT INTO entries (user, date, mood, score, tags, text, response) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (user, date) DO UPDATE SET mood = excluded.mood, score = excluded.score, "
+            "tags = excluded.tags, text = excluded.text, response = excluded.response",
+            rows,
+        )
+
+    def _write_state(self, conn, user, state, base=None, overwrite=False):
+        """Compare-and-swap on the version column; raises _StaleVersion if another save won."""
+        row = conn.execute("SELECT state, version FROM user_state WHERE user = ?", (user,)).fetchone()
+        stored = json.loads(row[0]) if row else None
+        written = resolve_state(stored, state, None if overwrite else base)
+        payload = json.dumps(written, ensure_ascii=False)
+        if row is None:
+            cursor = conn.execute(
+                "INSERT INTO user_state (user, state, version) VALUES (?, ?, ?) ON CONFLICT (user) DO NOTHING",
+                (user, payload, written["version"]),
+            )
+        else:
+            cursor = conn.execute(
+                "UPDATE user_state SET state = ?, version = ? WHERE user = ? AND version = ?",
+                (payload, written["version"], user, row[1]),
+            )
+        if cursor.rowcount != 1:
+            raise _StaleVersion()
+        profiler.note(bytes_written=len(payload.encode("utf-8")))
+        return written
+
+    def _transaction(self, write):
+        """Runs `write(conn)` in a transaction, retrying when an optimistic check fails."""
+        conn = self._connect()
+        for _ in range(MAX_SAVE_RETRIES):
+            try:
+                with conn:
+                    return write(conn)
+            except _StaleVersion:
+                continue
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    raise
+        raise DiaryConflictError("Could not save diary state after repeated concurrent updates")
+
+    def _bump_version(self, conn, user):
+        """Rewrites the stored state with the next version, so signature() sees entry-only writes."""
+        row = conn.execute("SELECT state FROM user_state WHERE user = ?", (user,)).fetchone()
+        if row is not None:
+            self._write_state(conn, user, json.loads(row[0]))
+
+    def signature(self, user_name):
+        user = safe_user_key(user_name)
+        row = self._connect().execute("SELECT version FROM user_state WHERE user = ?", (user,)).fetchone() if user else None
+        return (self.db_path, row[0]) if row else None
+
+    def _import_legacy_file(self, user_name):
+        path = user_data_file(user_name, self.legacy_dir)
+        if not path or not os.path.exists(path):
+            return None
+        self.save(user_name, read_json_document(path))
+        return self.load(user_name)
+
+    def load(self, user_name):
+        user = safe_user_key(user_name)
+        if not user:
+            return None
+        row = self._connect().execute(
+            "SELECT state FROM user_state WHERE user = ?", (user,)
+        ).fetchone()
+        if row is None:
+            return self._import_legacy_file(user_name)
+        data = json.loads(row[0])
+        data["diary"] = self.load_entries(user_name)
+        return data
+
+    def _entry_rows(self, user, start=None, end=None):
+        return self._connect().execute(
+            "SELECT date, mood, score, tags, text, response FROM entries "
+            "WHERE user = ? AND date >= ? AND date <= ? ORDER BY date",
+            (user, start or "0000-00-00", end or "9999-99-99"),
+        )
+
+    def load_entries(self, user_name, start=None, end=None):
+        user = safe_user_key(user_name)
+        if not user:
+            return {}
+        return {row[0]: self._row_to_entry(row[1:]) for row in self._entry_rows(user, start, end)}
+
+    def iter_entries(self, user_name, start=None, end=None):
+        user = safe_user_key(user_name)
+        if not user:
+            return
+        for row in self._entry_rows(user, start, end): # the cursor fetches rows as it goes
+            yield row[0], self._row_to_entry(row[1:])
+
+    def load_window(self, user_name, start):
+        user = safe_user_key(user_name)
+        if not user:
+            return None
+        row = self._connect().execute("SELECT state FROM user_state WHERE user = ?", (user,)).fetchone()
+        if row is None:
+            return super().load_window(user_name, start) # load() imports a legacy JSON file
+        data = json.loads(row[0])
+        data["diary"] = self.load_entries(user_name, start)
+        return data, self.history_summary(user_name, start)
+
+    def history_summary(self, user_name, before):
+        user = safe_user_key(user_name)
+        conn = self._connect()
+        # (user, mood) index entries carry the date too, so the counts never touch entry text
+        mood_counts = dict(conn.execute(
+            "SELECT mood, COUNT(*) FROM entries WHERE user = ? AND date < ? GROUP BY mood", (user, before)
+        ))
+        run_start = None
+        expected = datetime.date.fromisoformat(before)
+        for (date_key,) in conn.execute(
+            "SELECT date FROM entries WHERE user = ? AND date < ? ORDER BY date DESC", (user, before)
+        ):
+            expected -= datetime.timedelta(days=1)
+            if date_key != expected.isoformat():
+                break
+            run_start = date_key
+        return {"before": before, "entries": sum(mood_counts.values()), "mood_counts": mood_counts, "run_start": run_start}
+
+    def upsert_entry(self, user_name, date_key, entry, state=None, base=None):
+        user = safe_user_key(user_name)
+        if not user:
+            return None
+
+        def write(conn):
+            self._upsert_rows(conn, user, {date_key: entry})
+            if state is not None:
+                return self._write_state(conn, user, state, base)
+            self._bump_version(conn, user)
+            return None
+
+        return self._transaction(write)
+
+    def upsert_entries(self, user_name, batches):
+        user = safe_user_key(user_name)
+        if not user:
+            return 0
+        # Entries only show up in load() once the user has a state row
+        if self._connect().execute("SELECT 1 FROM user_state WHERE user = ?", (user,)).fetchone() is None:
+            if self._import_legacy_file(user_name) is None:
+                self._transaction(lambda conn: self._write_state(conn, user, {"user_name": user_name}))
+
+        def write(conn, batch):
+            self._upsert_rows(conn, user, batch)
+            self._bump_version(conn, user)
+
+        written = 0
+        for batch in batches: # one transaction per batch
+            if batch:
+                self._transaction(lambda conn: write(conn, batch))
+                written += len(batch)
+        return written
+
+    def save_state(self, user_name, state, base=None):
+        user = safe_user_key(user_name)
+        if not user:
+            return None
+        return self._transaction(lambda conn: self._write_state(conn, user, state, base))
+
+    def save(self, user_name, data):
+        user = safe_user_key(user_name)
+        if not user:
+            return
+        entries, state = split_document(data)
+
+        def write(conn):
+            conn.execute("DELETE FROM entries WHERE user = ?", (user,))
+            self._upsert_rows(conn, user, entries)
+            self._write_state(conn, user, state, overwrite=True)
+
+        self._transaction(write)
+
+    def list_users(self):
+        rows = self._connect().execute("SELECT user FROM user_state ORDER BY user")
+        return [row[0] for row in rows]
+
+
+# -------------------- Backend selection
+# --------------------
+
+def get_diary_store(kind=None, data_dir="."):
+    """Creates the configured backend ('json' unless MOOD_JOURNAL_STORAGE says 'log', 'sqlite', 'snapshot' or 'mapped')."""
+    kind = (kind or os.environ.get(STORAGE_ENV_VAR, "json")).strip().lower()
+    if kind == "json":
+        return JsonDiaryStore(data_dir)
+    if kind == "log":
+        return LogDiaryStore(data_dir)
+    if kind == "snapshot":
+        return SnapshotDiaryStore(data_dir)
+    if kind == "mapped":
+        return MappedDiaryStore(data_dir)
+    if kind == "sqlite":
+        db_path = os.environ.get(SQLITE_PATH_ENV_VAR, os.path.join(data_dir, DEFAULT_SQLITE_PATH))
+        return SqliteDiaryStore(db_path, legacy_dir=data_dir)
+    raise ValueError(f"Unknown diary storage backend: {kind!r} (expected 'json', 'log', 'sqlite', 'snapshot' or 'mapped')")
@@ -0,0 +1,312 @@
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+
+from diary_storage import get_diary_store
+from journal_content import ACTIVITY_TAGS, MOOD_MAPPING, MOOD_SCORES
+
+# -------------------- Diary Export / Import
+# --------------------
+#
+# Streams a user's entries in and out as NDJSON (one JSON object per line), CSV or
+# Parquet, one row per entry with the columns below. Exports read entries one at a
+# time from the store and write them in chunks; imports parse one row at a time, check
+# it against the app's moods, scores and tags, and upsert the valid ones in batches.
+# The app derives an entry's score from its mood, so an imported score may be left out
+# but must otherwise be the mood's own (MOOD_SCORES).
+#
+#   python -m diary_transfer export "Mia" mia.ndjson
+#   python -m diary_transfer import "Mia" old_diary.csv --batch-size 5000
+#
+# Parquet needs pyarrow, which is imported only when a Parquet file is read or written.
+
+TRANSFER_FORMATS = ("ndjson", "csv", "parquet")
+FORMAT_EXTENSIONS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv", ".parquet": "parquet"}
+TRANSFER_MIME_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+TRANSFER_COLUMNS = ("date", "mood", "score", "tags", "text", "response")
+CSV_TAG_SEPARATOR = ";" # tags are one CSV cell: "Work 💻;Food 🍕"
+EXPORT_CHUNK_ROWS = 1000
+IMPORT_BATCH_SIZE = 1000
+
+VALID_TAGS = frozenset(ACTIVITY_TAGS)
+
+
+class DiaryImportError(ValueError):
+    """Raised for a row that cannot be imported (the message names the row)."""
+
+
+class ImportReport:
+    """Outcome of an import: entries written, rows skipped and the first few problems."""
+
+    MAX_ERRORS = 20
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+
+    def skip(self, message):
+        self.skipped += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(message)
+
+
+def detect_format(file_name):
+    """Transfer format from a file name's extension, or None."""
+    return FORMAT_EXTENSIONS.get(os.path.splitext(file_name or "")[1].lower())
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export/import needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("date", pa.string()), ("mood", pa.string()), ("score", pa.int64()),
+        ("tags", pa.list_(pa.string())), ("text", pa.string()), ("response", pa.string()),
+    ])
+
+
+# --- Export ---
+
+def entry_row(date_key, entry):
+    """The export row for one diary entry."""
+    return {
+        "date": date_key, "mood": entry.get("mood"), "score": entry.get("score"),
+        "tags": list(entry.get("tags") or []), "text": entry.get("text", ""), "response": entry.get("response"),
+    }
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_entries(entries, out, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Writes (date_key, entry) pairs to a binary file object, `chunk_rows` rows per write.
+
+    Returns the number of rows written.
+    """
+    rows = (entry_row(date_key, entry) for date_key, entry in entries)
+    written = 0
+    if fmt == "ndjson":
+        for chunk in _chunks(rows, chunk_rows):
+            out.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk).encode("utf-8"))
+            written += len(chunk)
+    elif fmt == "csv":
+        text_out = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        try:
+            writer = csv.writer(text_out)
+            writer.writerow(TRANSFER_COLUMNS)
+            for chunk in _chunks(rows, chunk_rows):
+                writer.writerows(
+                    [row["date"], row["mood"], row["score"], CSV_TAG_SEPARATOR.join(row["tags"]),
+                     row["text"], row["response"] or ""]
+                    for row in chunk
+                )
+                text_out.flush()
+                written += len(chunk)
+        finally:
+            text_out.detach() # leave the caller's file open
+    elif fmt == "parquet":
+        pa = _import_pyarrow()
+        schema = _parquet_schema(pa)
+        # One row group per chunk; the writer never holds more than one chunk
+        with pa.parquet.ParquetWriter(out, schema) as writer:
+            for chunk in _chunks(rows, chunk_rows):
+                writer.write_batch(pa.RecordBatch.from_pylist(chunk, schema=schema))
+                written += len(chunk)
+    else:
+        raise ValueError(f"Unknown transfer format: {fmt!r} (expected one of {', '.join(TRANSFER_FORMATS)})")
+    return written
+
+
+def export_diary(store, user_name, out, fmt, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Streams a user's entries (optionally only [start, end]) to `out`; returns the row count."""
+    return write_entries(store.iter_entries(user_name, start, end), out, fmt, chunk_rows)
+
+
+# --- Import ---
+
+def read_rows(source, fmt, batch_rows=IMPORT_BATCH_SIZE):
+    """Yields (row number, row dict) from a binary file object, one row at a time.
+
+    A row that cannot be parsed at all is yielded as None so it is reported, not fatal.
+    """
+    if fmt == "ndjson":
+        for row_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield row_number, row
+    elif fmt == "csv":
+        text_in = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+        try:
+            for row_number, row in enumerate(csv.DictReader(text_in), 2): # row 1 is the header
+                yield row_number, row
+        finally:
+            text_in.detach()
+    elif fmt == "parquet":
+        pa = _import_pyarrow()
+        row_number = 0
+        for batch in pa.parquet.ParquetFile(source).iter_batches(batch_size=batch_rows):
+            for row in batch.to_pylist():
+                row_number += 1
+                yield row_number, row
+    else:
+        raise ValueError(f"Unknown transfer format: {fmt!r} (expected one of {', '.join(TRANSFER_FORMATS)})")
+
+
+def validate_row(row, row_number):
+    """Checks one row against MOOD_MAPPING, MOOD_SCORES and ACTIVITY_TAGS; returns (date_key, entry)."""
+    if not isinstance(row, dict):
+        raise DiaryImportError(f"row {row_number}: not a valid JSON object")
+
+    try:
+        date_key = datetime.date.fromisoformat(str(row.get("date") or "").strip()[:10]).isoformat()
+    except ValueError:
+        raise DiaryImportError(f"row {row_number}: invalid date {row.get('date')!r} (expected YYYY-MM-DD)") from None
+
+    mood = str(row.get("mood") or "").strip()
+    mood = MOOD_MAPPING.get(mood, mood) # mood names ("Happy") are accepted as well as emojis
+    if mood not in MOOD_SCORES:
+        raise DiaryImportError(f"row {row_number}: unknown mood {row.get('mood')!r}")
+
+    score = row.get("score")
+    if score is not None and score != "":
+        try:
+            number = float(score)
+        except (TypeError, ValueError):
+            number = None
+        if isinstance(score, bool) or number != MOOD_SCORES[mood]:
+            raise DiaryImportError(f"row {row_number}: score {score!r} does not match mood {mood} (expected {MOOD_SCORES[mood]})")
+    score = MOOD_SCORES[mood]
+
+    tags = row.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(CSV_TAG_SEPARATOR)
+    if not isinstance(tags, (list, tuple)):
+        raise DiaryImportError(f"row {row_number}: tags must be a list")
+    tags = [str(tag).strip() for tag in tags if str(tag).strip()]
+    unknown = [tag for tag in tags if tag not in VALID_TAGS]
+    if unknown:
+        raise DiaryImportError(f"row {row_number}: unknown tags {unknown}")
+
+    text = row.get("text")
+    response = row.get("response")
+    if not isinstance(text, (str, type(None))) or not isinstance(response, (str, type(None))):
+        raise DiaryImportError(f"row {row_number}: text and response must be strings")
+
+    entry = {"mood": mood, "text": text or "", "score": score, "tags": list(dict.fromkeys(tags))}
+    if response:
+        entry["response"] = response
+    return date_key, entry
+
+
+def _valid_batches(rows, report, batch_size, strict):
+    batch = {}
+    for row_number, row in rows:
+        try:
+            date_key, entry = validate_row(row, row_number)
+        except DiaryImportError as e:
+            if strict:
+                raise
+            report.skip(str(e))
+            continue
+        batch[date_key] = entry # a later row for the same date wins, as it would in the diary
+        if len(batch) >= batch_size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+
+def import_diary(store, user_name, source, fmt, batch_size=IMPORT_BATCH_SIZE, strict=False):
+    """Validates rows from a binary file object and upserts them in batches of `batch_size`.
+
+    Invalid rows are skipped and reported, or with `strict` abort the import (batches
+    already written stay written). Returns an ImportReport.
+    """
+    report = ImportReport()
+    batches = _valid_batches(read_rows(source, fmt, batch_size), report, batch_size, strict)
+    report.imported = store.upsert_entries(user_name, batches)
+    return report
+
+
+# --- Command line ---
+
+def _resolve_format(fmt, path):
+    fmt = fmt or detect_format(path)
+    if fmt is None:
+        raise SystemExit(f"Cannot tell the format of {path!r}; pass --format {'/'.join(TRANSFER_FORMATS)}")
+    return fmt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import a user's diary entries.")
+    parser.add_argument("--storage", choices=("json", "log", "sqlite", "snapshot", "mapped"), help="backend (default: $MOOD_JOURNAL_STORAGE or json)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="write entries to a file ('-' for stdout)")
+    export_parser.add_argument("user")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=TRANSFER_FORMATS)
+    export_parser.add_argument("--start", help="first date to export (YYYY-MM-DD)")
+    export_parser.add_argument("--end", help="last date to export (YYYY-MM-DD)")
+    export_parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+
+    import_parser = commands.add_parser("import", help="upsert entries from a file ('-' for stdin)")
+    import_parser.add_argument("user")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=TRANSFER_FORMATS)
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    import_parser.add_argument("--strict", action="store_true", help="stop at the first invalid row")
+
+    args = parser.parse_args(argv)
+    store = get_diary_store(args.storage)
+    fmt = _resolve_format(args.format, args.path if args.path != "-" else "")
+
+    if args.command == "export":
+        if args.path == "-":
+            count = export_diary(store, args.user, sys.stdout.buffer, fmt, args.start, args.end, args.chunk_rows)
+        else:
+            with open(args.path, "wb") as out:
+                count = export_diary(store, args.user, out, fmt, args.start, args.end, args.chunk_rows)
+        print(f"Exported {count} entries", file=sys.stderr)
+        return 0
+
+    try:
+        if args.path == "-":
+            report = import_diary(store, args.user, sys.stdin.buffer, fmt, args.batch_size, args.strict)
+        else:
+            with open(args.path, "rb") as source:
+                report = import_diary(store, args.user, source, fmt, args.batch_size, args.strict)
+    except DiaryImportError as e:
+        print(f"Import stopped: {e}", file=sys.stderr)
+        return 1
+    print(f"Imported {report.imported} entries, skipped {report.skipped} invalid rows", file=sys.stderr)
+    for message in report.errors:
+        print(f"  {message}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
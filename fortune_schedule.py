@@ -0,0 +1,37 @@
+import calendar
+import functools
+import hashlib
+import random
+
+from diary_storage import safe_user_key
+from journal_content import FORTUNE_SLIPS
+
+# -------------------- Daily Fortune Schedule
+# --------------------
+#
+# Every user has a fixed schedule of slips for each year, dealt from shuffled decks of
+# FORTUNE_SLIPS (so the luck levels keep the odds their duplicate slips give them). The
+# shuffle is seeded from the user key and the year, so any process recomputes the same
+# fortune for the same day: drawing is a lookup, and only the date of the draw is saved.
+
+FORTUNE_SCHEDULE_VERSION = 1 # bump to deal everyone a new schedule
+
+
+@functools.lru_cache(maxsize=256)
+def fortune_schedule(user_key, year):
+    """Slip indices for every day of `year` (position = day of the year - 1)."""
+    seed = hashlib.sha256(f"{FORTUNE_SCHEDULE_VERSION}:{user_key}:{year}".encode("utf-8")).digest()
+    rng = random.Random(int.from_bytes(seed[:8], "big"))
+    days = 366 if calendar.isleap(year) else 365
+    schedule = []
+    while len(schedule) < days:
+        deck = list(range(len(FORTUNE_SLIPS)))
+        rng.shuffle(deck)
+        schedule.extend(deck)
+    return tuple(schedule[:days])
+
+
+def daily_fortune(user_name, day):
+    """The (level, emoji, description) slip a user draws on `day`."""
+    schedule = fortune_schedule(safe_user_key(user_name) or "", day.year)
+    return FORTUNE_SLIPS[schedule[day.timetuple().tm_yday - 1]]
@@ -0,0 +1,194 @@
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from instrumentation import profiler
+
+# -------------------- Downscaled Image Variants
+# --------------------
+#
+# The artwork in image/ and assets/ is 0.5-1.2 MB per PNG, far larger than it is ever
+# shown. Each source is downscaled once into size-appropriate variants that are cached
+# on disk, keyed by the source's content hash (so identical files share variants and
+# edited files get new ones automatically).
+
+ASSET_CACHE_DIR = os.environ.get("MOOD_JOURNAL_ASSET_CACHE", ".asset_cache")
+
+# Longest side in pixels (about 2x the on-screen size, for high-DPI screens)
+ASSET_VARIANTS = {
+    "thumb": 96,   # potion buttons
+    "medium": 400, # plant and pet artwork
+}
+
+# Byte budget for the in-memory cache of encoded variant bytes
+IMAGE_CACHE_BYTES = int(os.environ.get("MOOD_JOURNAL_IMAGE_CACHE_BYTES", 8 * 1024 * 1024))
+# Cached bytes are served without touching the disk; set this to re-stat the source on
+# every lookup and pick up edited artwork without restarting (development only)
+IMAGE_REVALIDATE = os.environ.get("MOOD_JOURNAL_IMAGE_REVALIDATE", "") not in ("", "0")
+
+
+@functools.lru_cache(maxsize=None)
+def variant_format():
+    """"WEBP" when Pillow can write it, else "PNG" (Pillow is only imported on first use)."""
+    from PIL import features
+    return "WEBP" if features.check("webp") else "PNG"
+
+_hash_cache = {} # path -> ((mtime_ns, size), sha256 hex)
+_hash_lock = threading.Lock()
+
+
+def content_hash(image_path):
+    """SHA-256 of a file, recomputed only when its mtime or size changes."""
+    stat = os.stat(image_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _hash_lock:
+        cached = _hash_cache.get(image_path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    with _hash_lock:
+        _hash_cache[image_path] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def build_variant(image_path, max_side, output_path):
+    """Downscales one image and writes it (via temp file + rename) in variant_format()."""
+    from PIL import Image
+    with Image.open(image_path) as img:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA")
+        tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if variant_format() == "WEBP":
+            img.save(tmp_path, format="WEBP", quality=85, method=6)
+        else:
+            img.save(tmp_path, format="PNG", optimize=True)
+    os.replace(tmp_path, output_path)
+
+
+def asset_variant_path(image_path, variant="medium"):
+    """Returns the path of a cached variant, generating it on first use (None if the source is missing)."""
+    if not image_path or not os.path.exists(image_path):
+        return None
+    max_side = ASSET_VARIANTS[variant]
+    key = content_hash(image_path)[:20]
+    output_path = os.path.join(ASSET_CACHE_DIR, f"{key}_{variant}.{variant_format().lower()}")
+    if not os.path.exists(output_path):
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        build_variant(image_path, max_side, output_path)
+    return output_path
+
+
+def warm_asset_cache(paths_by_variant):
+    """Pre-generates variants, e.g. {"thumb": [potion paths], "medium": [plant paths]}."""
+    generated = {}
+    for variant, paths in paths_by_variant.items():
+        for image_path in paths:
+            try:
+                generated[(image_path, variant)] = asset_variant_path(image_path, variant)
+            except OSError:
+                generated[(image_path, variant)] = None
+    return generated
+
+
+# -------------------- Encoded Bytes Cache
+# --------------------
+
+class ImageByteCache:
+    """Process-wide LRU of encoded image bytes, bounded by a total byte budget."""
+
+    def __init__(self, max_bytes=IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, loader):
+        """Returns cached bytes for `key`, calling `loader(key)` on a miss."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                profiler.note(cache_hit=True)
+                return data
+            self.misses += 1
+        profiler.note(cache_hit=False)
+        data = loader(key)
+        if data is None or len(data) > self.max_bytes:
+            return data
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = data
+                self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return data
+
+    def discard(self, key):
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is not None:
+                self._bytes -= len(data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+image_cache = ImageByteCache()
+_source_signatures = {} # (image_path, variant) -> source (mtime_ns, size) when its bytes were cached
+
+
+def _source_signature(image_path):
+    try:
+        stat = os.stat(image_path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _load_variant_bytes(key):
+    image_path, variant = key
+    signature = _source_signature(image_path)
+    variant_path = asset_variant_path(image_path, variant)
+    if variant_path is None:
+        return None
+    with open(variant_path, "rb") as f:
+        data = f.read()
+    _source_signatures[key] = signature
+    return data
+
+
+def load_image_bytes(image_path, variant="medium", revalidate=IMAGE_REVALIDATE):
+    """Returns the encoded bytes of an image variant, ready to hand to st.image (None if missing).
+
+    A hit is a dict lookup: the source is hashed and its variant resolved once per process,
+    unless `revalidate` re-stats it and drops bytes cached for an older version.
+    """
+    key = (image_path, variant)
+    if revalidate and _source_signatures.get(key) != _source_signature(image_path):
+        image_cache.discard(key)
+    return image_cache.get(key, _load_variant_bytes)
@@ -0,0 +1,188 @@
+import contextlib
+import csv
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# -------------------- Opt-in Hot-Path Instrumentation
+# --------------------
+#
+# Set MOOD_JOURNAL_PROFILE=1 to time the page dispatch and the helpers wrapped with
+# profiler.wrap() / profiler.span(). Each finished call becomes one event in a bounded
+# ring buffer (the newest PROFILE_RING_SIZE events) and is added to per-name totals.
+#
+# Code running inside a span can report what it did with profiler.note(): the storage
+# backends note the bytes they write and whether a read came from their cache, the image
+# cache notes hits and misses. Notes go to the innermost open span on the calling thread
+# and are rolled up into the enclosing spans when they finish, so a page's event also
+# counts the bytes written by the saves it made.
+#
+# Switched off (the default), wrapped functions are called straight through and notes
+# are ignored.
+
+PROFILE_ENV_VAR = "MOOD_JOURNAL_PROFILE"
+PROFILE_RING_SIZE = int(os.environ.get("MOOD_JOURNAL_PROFILE_RING", 2000))
+PROFILE_DUMP_DIR = os.environ.get("MOOD_JOURNAL_PROFILE_DIR", "profile_dumps")
+EVENT_FIELDS = ("at", "kind", "name", "ms", "bytes_written", "cache_hits", "cache_misses", "outcome")
+
+
+class _Span:
+    __slots__ = ("name", "kind", "start", "bytes_written", "cache_hits", "cache_misses")
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.bytes_written = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class Profiler:
+    """Ring buffer of timed calls plus running totals per (kind, name)."""
+
+    def __init__(self, enabled=False, ring_size=PROFILE_RING_SIZE):
+        self.enabled = enabled
+        self._events = deque(maxlen=ring_size)
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def recording(self):
+        """True while a span is open on this thread (so a note would be kept)."""
+        return self.enabled and bool(getattr(self._local, "stack", None))
+
+    @contextlib.contextmanager
+    def span(self, name, kind="call"):
+        """Times the enclosed block as one event."""
+        if not self.enabled:
+            yield
+            return
+        stack = self._stack()
+        current = _Span(name, kind)
+        stack.append(current)
+        outcome = "ok"
+        try:
+            yield
+        except Exception:
+            outcome = "error"
+            raise
+        except BaseException: # st.rerun() / st.stop() end a page early by raising
+            outcome = "interrupted"
+            raise
+        finally:
+            stack.pop()
+            if stack:
+                parent = stack[-1]
+                parent.bytes_written += current.bytes_written
+                parent.cache_hits += current.cache_hits
+                parent.cache_misses += current.cache_misses
+            self._record(current, (time.perf_counter() - current.start) * 1e3, outcome)
+
+    def wrap(self, name=None, kind="call"):
+        """Decorator form of span(), named after the function by default."""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(span_name, kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def note(self, bytes_written=0, cache_hit=None):
+        """Adds bytes written and/or one cache hit (True) or miss (False) to the open span."""
+        stack = getattr(self._local, "stack", None)
+        if not self.enabled or not stack:
+            return
+        current = stack[-1]
+        current.bytes_written += bytes_written
+        if cache_hit is True:
+            current.cache_hits += 1
+        elif cache_hit is False:
+            current.cache_misses += 1
+
+    def _record(self, current, ms, outcome):
+        event = {
+            "at": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "kind": current.kind, "name": current.name, "ms": round(ms, 3),
+            "bytes_written": current.bytes_written,
+            "cache_hits": current.cache_hits, "cache_misses": current.cache_misses,
+            "outcome": outcome,
+        }
+        with self._lock:
+            self._events.append(event)
+            totals = self._totals.get((current.kind, current.name))
+            if totals is None:
+                totals = self._totals[(current.kind, current.name)] = {
+                    "kind": current.kind, "name": current.name, "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "bytes_written": 0, "cache_hits": 0, "cache_misses": 0,
+                }
+            totals["calls"] += 1
+            totals["total_ms"] += ms
+            totals["max_ms"] = max(totals["max_ms"], ms)
+            totals["bytes_written"] += current.bytes_written
+            totals["cache_hits"] += current.cache_hits
+            totals["cache_misses"] += current.cache_misses
+
+    def events(self):
+        """The buffered events, oldest first."""
+        with self._lock:
+            return list(self._events)
+
+    def summary(self):
+        """Totals per (kind, name) since the last clear(), slowest total first."""
+        with self._lock:
+            rows = [dict(totals) for totals in self._totals.values()]
+        for row in rows:
+            row["mean_ms"] = row["total_ms"] / row["calls"]
+            row["total_ms"] = round(row["total_ms"], 3)
+            row["mean_ms"] = round(row["mean_ms"], 3)
+            row["max_ms"] = round(row["max_ms"], 3)
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._totals.clear()
+
+    def dump(self, out, fmt="json"):
+        """Writes the events to a text file object: JSON (with the totals) or CSV (events only)."""
+        if fmt == "json":
+            json.dump({
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "pid": os.getpid(),
+                "totals": self.summary(),
+                "events": self.events(),
+            }, out, ensure_ascii=False, indent=2)
+        elif fmt == "csv":
+            writer = csv.DictWriter(out, fieldnames=EVENT_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.events())
+        else:
+            raise ValueError(f"Unknown profile dump format: {fmt!r} (expected json or csv)")
+
+    def dump_to_file(self, path, fmt=None):
+        """Writes a dump to `path` (format from the extension unless given); returns the path."""
+        fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower() or "json"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            self.dump(f, fmt)
+        return path
+
+
+# One per process, shared by every session (Streamlit serves sessions from threads)
+profiler = Profiler(enabled=os.environ.get(PROFILE_ENV_VAR, "").lower() not in ("", "0", "false", "no"))
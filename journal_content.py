@@ -0,0 +1,369 @@
+# -------------------- Shared Journal Content
+# --------------------
+#
+# Constants that both the Streamlit script and the analytics/storage modules need, plus
+# the app's static texts (achievements, replies, prompts, fortune slips, companions) and
+# CSS. Kept free of Streamlit imports so every module (and offline jobs) can use them.
+# Module globals are built once per process and shared by every session, so sequences
+# are tuples and nothing here is mutated at runtime.
+
+import os
+
+# --- Global Lists (English) ---
+# ************ 修改 ACTIVITY_TAGS: 加入 Other ❓ ************
+ACTIVITY_TAGS = [
+    "Work 💻", "Exercise 🏋️", "Socializing 👥", "Food 🍕",
+    "Family ❤️", "Hobbies 🎨", "Rest 🛋️", "Study 📚", "Travel ✈️", "Nature 🏞️", "Money 💰",
+    "Other ❓"
+]
+ 
+MOOD_MAPPING = {
+    "Happy": "😀", "Sad": "😢", "Angry": "😡", "Calm": "😌", 
+    "Excited": "🤩", "Tired": "😴", "Anxious": "😥",
+}
+MOOD_SCORES = {
+    "😀": 5, "🤩": 4, "😌": 3, "😴": 2, "😢": 1, "😡": 1, "😥": 1
+}
+
+# --- Compact codes used by the columnar diary model ---
+MOOD_EMOJIS = list(MOOD_MAPPING.values()) # mood code = index in this list
+TAG_BITS = {tag: 1 << i for i, tag in enumerate(ACTIVITY_TAGS)} # tag -> bit in the tag mask
+
+
+# -------------------- Journal Texts and Sprout Assets
+# --------------------
+
+# --- ACHIEVEMENT CONSTANTS (NEWLY ADDED) ---
+ACHIEVEMENTS = (
+    {"name": "Journaling Beginner", "desc": "Achieve 5 total entries.", "threshold": 5, "type": "total_entries"},
+    {"name": "Consistent Companion", "desc": "Achieve a 7-day streak.", "threshold": 7, "type": "streak"},
+    {"name": "Emotion Explorer", "desc": "Log all 7 mood types at least once.", "threshold": 7, "type": "unique_moods"},
+    {"name": "Insight Master", "desc": "Log 30 total entries.", "threshold": 30, "type": "total_entries"},
+)
+
+# --- Mood Sprout Game Mappings (Updated Text and File Names) ---
+SPROUT_IMAGE_DIR = "image" # 藥水/植物圖片資料夾
+ 
+# Potion name to file path mapping (lowercase)
+POTION_MAPPING = {
+    "happy": os.path.join(SPROUT_IMAGE_DIR, "potion_happy.png"),
+    "sad": os.path.join(SPROUT_IMAGE_DIR, "potion_sad.png"),
+    "angry": os.path.join(SPROUT_IMAGE_DIR, "potion_angry.png"),
+    "calm": os.path.join(SPROUT_IMAGE_DIR, "potion_calm.png"),
+    "excited": os.path.join(SPROUT_IMAGE_DIR, "potion_excited.png"),
+    "tired": os.path.join(SPROUT_IMAGE_DIR, "potion_tired.png"),
+    "anxious": os.path.join(SPROUT_IMAGE_DIR, "potion_anxious.png"),
+}
+ 
+# Pet evolution image paths (Capitalized)
+PET_MAPPING = {
+    "Seed": os.path.join(SPROUT_IMAGE_DIR, "soil.png"), 
+    "Happy": os.path.join(SPROUT_IMAGE_DIR, "plant_happy.png"), 
+    "Sad": os.path.join(SPROUT_IMAGE_DIR, "plant_sad.png"), 
+    "Angry": os.path.join(SPROUT_IMAGE_DIR, "plant_angry.png"), 
+    "Calm": os.path.join(SPROUT_IMAGE_DIR, "plant_calm.png"), 
+    "Excited": os.path.join(SPROUT_IMAGE_DIR, "plant_excited.png"), 
+    "Tired": os.path.join(SPROUT_IMAGE_DIR, "plant_tired.png"), 
+    "Anxious": os.path.join(SPROUT_IMAGE_DIR, "plant_anxious.png"), 
+}
+ 
+# Helper: Emoji to internal sprout name (lowercase)
+EMOJI_TO_SPROUT_NAME = { 
+    "😀": "happy", "😢": "sad", "😡": "angry", "😌": "calm", 
+    "🤩": "excited", "😴": "tired", "😥": "anxious",
+}
+ 
+# --- Response Texts (Retained) ---
+EMOTION_RESPONSES = {
+    "tired": "You sound tired 😴. Rest is productive too — take time to recharge.",
+    "bored": "Boredom might mean your heart craves something new 🎨. Try doing something creative today!",
+    "calm": "That’s wonderful 🌿. Calmness is peace speaking softly to your soul.",
+    "guilty": "Guilt shows you care 🌱. Reflect gently and forgive yourself.", 
+    "anxious": "Anxiety can be heavy 😥. Breathe slowly — you’re safe and doing your best.",
+    "happy": "Yay! So happy for you! 😄🎈 Let your joy shine and share your smile today!",
+    "sad": "It’s okay to feel sad 💧. Emotions flow and fade — here’s a little cheer-up joke for you:\n\n**{joke}**",
+    "lonely": "Loneliness is heavy 🫶. You’re not alone — I’m here listening.",
+    "angry": "It’s alright to feel upset 😔. Let it out — expression is healing.",
+}
+ 
+# Picked per reply, so the "sad" response does not repeat the same joke all session
+CHEER_UP_JOKES = (
+    "Why did the scarecrow win an award? Because he was outstanding in his field 🌾",
+    "I told my computer I felt sad — it gave me a byte of comfort 💻",
+    "Did you hear about the depressed coffee? It got mugged ☕",
+)
+ 
+GENERAL_RESPONSES = (
+    "Thank up for sharing your entry ✍️. Remember, small steps lead to big changes.",
+    "Your feelings are valid. Take a moment to focus on your breath and find peace. 🌬️",
+    "It takes courage to write down your thoughts. We're here to listen to your journey! 🫂",
+    "Keep up the habit of reflection! Every day is a new story waiting to unfold. 🌿",
+    "Well done on making an entry today! You are prioritizing your well-being. 😊",
+)
+ 
+DAILY_PROMPTS = (
+    "What is one thing that made you feel proud or accomplished today?",
+    "If you could give yesterday's self one piece of advice, what would it be?",
+    "Describe three sounds, smells, or sights you encountered today.",
+    "Did you express gratitude to anyone today, or did someone make you feel grateful?",
+    "What is one small thing you can do tomorrow to make it better?",
+    "What is a new thing you learned today, no matter how small?",
+)
+ 
+SURPRISE_FACTS = (
+    "Did you know a group of flamingos is called a 'flamboyance'? Stay flamboyant! 💖",
+    "Fun Fact: Honey never spoils. Keep your good memories preserved like honey! 🍯",
+    "Quick Riddle: What has to be broken before you can use it? A seed! Break those barriers!🌱", 
+    "A moment of wonder: There are more trees on Earth than stars in the Milky Way. Keep growing! 🌳",
+    "Your lucky number today is 7! May your day be seven times brighter! ✨",
+)
+ 
+FORTUNE_SLIPS = tuple(
+    # Supreme Luck (大吉 - 5 slips)
+    [("Supreme Luck", "🌟", "A day of profound clarity and happiness awaits. Trust your highest vision; your energy is magnetic today.")] * 2 +
+    [("Supreme Luck", "🌟", "All relationships are blessed today. Reach out and share your good fortune; it will return tenfold.")] +
+    [("Supreme Luck", "🌟", "An obstacle you faced yesterday dissolves today. Unexpected success finds you when you stay open.")] +
+    [("Supreme Luck", "🌟", "Inner peace is your greatest asset. Use this calm to make powerful, confident decisions.")] +
+    [("Supreme Luck", "🌟", "The universe is aligning for you today. Expect a breakthrough in an area you thought was stuck.")] + 
+    
+    # Excellent Luck (吉 - 15 slips)
+    [("Excellent Luck", "✨", "Your mind is sharp and ideas flow. Write down new goals; you have the power to achieve them.")] * 3 +
+    [("Excellent Luck", "✨", "Take a risk today, especially in creative endeavors. Joy follows bold action.")] * 3 +
+    [("Excellent Luck", "✨", "Unexpected kindness comes from a stranger or colleague. Pay it forward and brighten someone else's day.")] * 3 +
+    [("Excellent Luck", "✨", "A lingering doubt is resolved easily. Feel lighter and move forward with purpose.")] * 3 +
+    [("Excellent Luck", "✨", "The path to self-improvement is wide open. Commit to a healthy habit today.")] * 3 +
+
+    # Good Prospect (中吉 - 15 slips)
+    [("Good Prospect", "🍀", "A feeling of balance settles in. Trust the rhythm of your day and avoid unnecessary rushing.")] * 3 +
+    [("Good Prospect", "🍀", "Someone needs your support. Offering a listening ear will deepen your connection.")] * 3 +
+    [("Good Prospect", "🍀", "Your emotional well-being requires gentle attention. Focus on rest and simple pleasures.")] * 3 +
+    [("Good Prospect", "🍀", "A small personal victory is on the horizon. Acknowledge and reward your efforts.")] * 3 +
+    [("Good Prospect", "🍀", "Change is coming, but it is manageable. Prepare your mind for gentle adjustments.")] * 3 +
+
+    # Moderate Fortune (小吉 - 10 slips)
+    [("Moderate Fortune", "🌤️", "It is a day for careful planning. Avoid spontaneity and stick to your schedule for best results.")] * 2 +
+    [("Moderate Fortune", "🌤️", "Energy levels are moderate. Conserve your efforts for what truly matters by saying 'no' when needed.")] * 2 +
+    [("Moderate Fortune", "🌤️", "A minor misunderstanding may occur. Approach conversations with patience and seek clarity.")] * 2 +
+    [("Moderate Fortune", "🌤️", "Don't dwell on perfection. Good enough is perfect for today; accept progress over flawless execution.")] * 2 +
+    [("Moderate Fortune", "🌤️", "Neutral energy surrounds you. Use this quiet day for thoughtful reflection in your journal.")] * 2 +
+
+    # Minor Challenge (凶 - 5 slips)
+    [("Minor Challenge", "⚠️", "Frustration is possible. Use this as a signal to step away and seek immediate stress relief.")] +
+    [("Minor Challenge", "⚠️", "A feeling of heaviness may arise. Be extra gentle with yourself and prioritize basic self-care.")] +
+    [("Minor Challenge", "⚠️", "Be mindful of unnecessary spending or overcommitment. Your boundaries need protection today.")] +
+    [("Minor Challenge", "⚠️", "Doubt may creep in. Remember your core strengths and seek external encouragement if needed.")] +
+    [("Minor Challenge", "⚠️", "Communication requires extra effort. Write down your thoughts before speaking to avoid conflict.")]
+)
+
+# -------------------- Pet Game Content
+# --------------------
+
+# **修正：寵物圖片（pet_*.png）位於根目錄**
+
+PET_IMAGE_PATHS = {
+    "happy_dog": "pet_happy.png",    
+    "sad_cat": "pet_sad.png",        
+    "tired_panda": "pet_tired.png",    
+    "angry_rabbit": "pet_anxious.png", 
+    "calm_owl": "pet_calm.png",        
+}
+
+ANIMAL_COMPANIONS = {
+    "happy_dog": {
+        "name": "Happy Dog 🐶",
+        "art": {"visual_path": PET_IMAGE_PATHS["happy_dog"],},
+        "initial_message": "Woof! You chose 'Super Happy'! That's great! Let's play together!",
+        "responses": {
+            "tap": ["Woof! You booped my nose!", "Bark! Full of energy!", "Huh? What is it?"],
+            "pet": ["🥰 Purrrrr... I love you!", "Feeling loved! 🐾", "Pet me more, my mood is flying high!"],
+            "feed": ["Delicious! This tastes like heaven! Thank you, human!", "I love tasty treats the most! Woof!", "Full of life now! 🦴"]
+        }
+    },
+    "sad_cat": {
+        "name": "Comfort Cat 🐱",
+        "art": {"visual_path": PET_IMAGE_PATHS["sad_cat"],},
+        "initial_message": "Meow... You chose 'A Bit Sad'? It's okay, I'll quietly stay here with you and offer a warm rub.",
+        "responses": {
+            "tap": ["Don't bother me. I'm napping.", "Shhh... Be quiet, listen to my purr.", "I'm here for you."],
+            "pet": ["💕 Hmph... It's comfortable, but don't think I'm clingy. Fine, just a little more...", "Grrrrrrr... (Reluctantly enjoying it)"],
+            "feed": ["Oh... Is this for me? (Eats slowly) Thanks...", "Mmm, you know my taste. 🐟"]
+        }
+    },
+    "tired_panda": {
+        "name": "Chill Panda 🐼", 
+        "art": {"visual_path": PET_IMAGE_PATHS["tired_panda"],},
+        "initial_message": "Hoo... Hoo... Chose 'Super Tired'? Come... let's slowly... eat bamboo... together...",
+        "responses": {
+            "tap": ["...Mmm... A little... ticklish...", "...Slow... down...", "...What is it..."],
+            "pet": ["...Wow... So... comfy... Pet... me... a little more...", "...This warm... feeling... is nice...", "...I... like... it..."],
+            "feed": ["...Ah... Bamboo... is... delicious...", "...Eating... slowly... enjoying... 🌿"]
+        }
+    },
+    "angry_rabbit": {
+        "name": "Fuffy Rabbit 🐰",
+        "art": {"visual_path": PET_IMAGE_PATHS["angry_rabbit"],},
+        "initial_message": "You chose 'Very Angry'? I understand that puffed-up feeling! Take a deep breath, puff up like me, and slowly relax.",
+        "responses": {
+            "tap": ["Don't touch me! I'm still angry!", "Touch me again and I'll run away!", "💢"],
+            "pet": ["(Huffs)... Fine... Just a little stroke... The anger is subsiding a bit...", "Mmm... Head rubs... That feels slightly better..."],
+            "feed": ["Mine! (Guards the food) ...It's quite tasty though.", "Are you bribing me? Hmph! 🥕"]
+        }
+    },
+    "calm_owl": {
+        "name": "Peaceful Owl 🦉", 
+        "art": {"visual_path": PET_IMAGE_PATHS["calm_owl"],},
+        "initial_message": "Good evening~ You chose 'Calm and Relaxed'? Wonderful! Let me gaze at you peacefully, helping you unwind.",
+        "responses": {
+            "tap": ["Hush... I'm meditating.", "No rush, take your time.", "I'm guarding you here."],
+            "pet": ["Hoo... So soft, feel my feathers.", "It's peaceful, isn't it?", "We support each other."],
+            "feed": ["Thank you! A night's banquet.", "Food is good.", "Chew slowly, absorb the wisdom."]
+        }
+    },
+}
+
+PET_MOOD_CHOICES = {
+    "Super Happy! 🥳": "happy_dog",
+    "A Bit Sad 😢": "sad_cat",
+    "Super Tired, Need Rest 😴": "tired_panda", 
+    "Very Angry! 💢": "angry_rabbit",
+    "Calm and Relaxed 😌": "calm_owl",      
+}
+
+
+# -------------------- Styles
+# --------------------
+
+# --- 背景顏色設定 ---
+BACKGROUND_COLOR = "#FAF0E6" # Linen 米白色
+FIXED_THEME_COLOR = "#c9b9a8"
+FIXED_ACCENT_COLOR = "#4b3f37"
+
+# Formatted once at import; the script sends this same string on every rerun
+APP_CSS = f"""
+    <style>
+        /* Journal Pro Styles */
+        /* **修正：將背景設定為米白色，並移除所有圖片背景相關的 CSS** */
+        .stApp {{
+            background-color: {BACKGROUND_COLOR}; /* Linen 米白色 */
+        }}
+        
+        .title {{
+            text-align: center;
+            font-size: 36px;
+            font-weight: bold;
+            color: {FIXED_ACCENT_COLOR}; 
+            margin-bottom: 10px;
+        }}
+        .subtitle {{
+            text-align: center;
+            font-size: 18px;
+            color: #6d5f56;
+            margin-bottom: 25px;
+        }}
+        .fortune-result-box {{
+            padding: 20px;
+            border-radius: 15px;
+            box-shadow: 0 4px 15px rgba(0,0,0,0.2);
+            text-align: center;
+            background-color: #fff8e1; /* Light yellow background */
+            margin-top: 20px;
+        }}
+        .fortune-level {{
+            font-size: 40px;
+            font-weight: bold;
+            color: {FIXED_ACCENT_COLOR};
+        }}
+        .fortune-emoji {{
+            font-size: 60px;
+            margin: 10px 0;
+        }}
+        .fortune-description {{
+            font-size: 18px;
+            font-style: italic;
+            color: #6d5f56;
+        }}
+        .shaking-container {{
+            text-align: center;
+            margin: 40px auto;
+            max-width: 300px;
+        }}
+        .shaking-icon {{
+            font-size: 100px;
+            display: inline-block;
+            transform-origin: 50% 90%;
+            animation: fortune-shake 1.2s infinite ease-in-out;
+        }}
+        /* The draw itself: shake hard, then fade out while the slip pops in */
+        @keyframes fortune-shake {{
+            0%, 60%, 100% {{ transform: rotate(0deg); }}
+            10%, 30%, 50% {{ transform: rotate(-12deg); }}
+            20%, 40% {{ transform: rotate(12deg); }}
+        }}
+        @keyframes fortune-stick-out {{
+            0% {{ opacity: 1; transform: rotate(0deg); }}
+            15%, 45% {{ transform: rotate(-18deg); }}
+            30%, 60% {{ transform: rotate(18deg); }}
+            100% {{ opacity: 0; transform: translateY(-30px) rotate(0deg); }}
+        }}
+        @keyframes fortune-reveal {{
+            0% {{ opacity: 0; transform: scale(0.6); }}
+            70% {{ opacity: 1; transform: scale(1.05); }}
+            100% {{ opacity: 1; transform: scale(1); }}
+        }}
+        .fortune-drawn {{
+            height: 0;
+            margin: 0 auto;
+        }}
+        .fortune-drawn .shaking-icon {{
+            animation: fortune-stick-out 0.8s ease-in forwards;
+        }}
+        .fortune-reveal {{
+            animation: fortune-reveal 0.6s ease-out 0.6s both;
+        }}
+        /* --- Mood Sprout Game Styles (Visual UI) --- */ 
+        @keyframes bounce {{
+            0%, 100% {{ transform: translateY(0); }}
+            50% {{ transform: translateY(-15px); }}
+        }}
+ 
+        .plant-image-animated {{ 
+            animation: bounce 2s infinite ease-in-out;
+        }}
+        /* Potion and Pet Display Styles */
+        .potion-item {{ 
+            display: flex; 
+            align-items: center; 
+            margin-bottom: 10px;
+            gap: 10px; 
+        }}
+        .potion-img {{
+            width: 30px; 
+            height: 30px;
+            object-fit: contain;
+        }}
+        .potion-item > div:last-child {{
+            flex-grow: 1; 
+        }}
+        /* NEW: Achievement styles */
+        .achievement-icon-gold {{
+            font-size: 2em;
+            color: gold; 
+            margin-right: 10px;
+        }}
+        .achievement-icon-grey {{
+            font-size: 2em;
+            color: #9e9e9e; 
+            margin-right: 10px;
+        }}
+        /* Custom styles for the new Pet Partner Button in action_page */
+        .stButton button[key*="pet_partner_btn_action"] {{
+            /* 修正 NameError: 確保所有 CSS 語法正確 */
+            border: 2px solid #ff69b4; /* Pink border */
+            color: #ff69b4;
+            font-weight: bold;
+        }}
+        .stButton button[key*="pet_partner_btn_action"]:hover {{
+            background-color: #ffe4e1; /* Light pink hover */
+        }}
+    </style>
+"""
@@ -0,0 +1,260 @@
+import bisect
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+
+from journal_content import MOOD_EMOJIS
+from mood_analytics import DEFAULT_SCORE, MOOD_CODES, UNKNOWN_MOOD, mask_to_tags, tag_mask
+
+# -------------------- Memory-Mapped Entries
+# --------------------
+#
+# Most pages never show entry text: the calendar needs moods and tags, insights scores
+# and tags, the streak only dates. The "mapped" backend therefore splits a diary into
+#
+#   diary_<name>.days            fixed-width per-day metadata, memory-mapped
+#   diary_<name>.<gen>.heap      entry text (and anything else) as one JSON blob per day
+#
+# The days file is a small header followed by one column per field, each 8-byte aligned:
+#
+#   ordinals int32 | heap offsets uint64 | blob lengths uint32 | tag masks uint32 |
+#   mood codes int8 | scores int8                                 (22 bytes per day)
+#
+# MappedEntries is a read-only {date_key: entry} mapping over it: lookups binary-search
+# the ordinals, and only an entry actually read (the journal page, a search index build)
+# touches the heap. columns() hands the metadata straight to ColumnarDiary / DiaryStats.
+#
+# Writers append new blobs to the heap and replace the whole days file atomically, so a
+# mapping opened earlier keeps seeing its own consistent snapshot. When most of the heap
+# is superseded blobs (or the whole diary is saved), it is rewritten as the next
+# generation and the days file pointed at it. MappedEntries opens its heap together with
+# the days file and keeps both open, so deleting an old generation does not affect it on
+# POSIX; where an open file cannot be deleted (Windows), the store retries on later writes.
+#
+# Values the columns cannot hold exactly (moods outside MOOD_EMOJIS, missing or
+# non-integer scores, tags outside ACTIVITY_TAGS or out of order) are kept in the blob,
+# which overrides the columns when the entry is read.
+
+DAYS_MAGIC = b"MJDAYS"
+DAYS_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<6sHII") # magic, format version, heap generation, day count
+DAY_COLUMNS = (
+    ("ordinals", "<i4"),
+    ("offsets", "<u8"),
+    ("lengths", "<u4"),
+    ("tags", "<u4"),
+    ("moods", "i1"),
+    ("scores", "i1"),
+)
+# memoryview formats of the columns on little-endian machines: indexing one of those is
+# much cheaper than a numpy scalar, and bisect can search it in place
+_ROW_FORMATS = {"ordinals": "i", "offsets": "Q", "lengths": "I", "tags": "I", "moods": "b", "scores": "b"}
+MAPPED_ENTRIES_BYTES = 4096 # resident size of a MappedEntries apart from its mapping
+OPEN_ATTEMPTS = 5 # a writer may replace the days file and delete its heap between our two opens
+
+
+def heap_path(days_path, generation):
+    return f"{days_path[:-len('.days')]}.{generation}.heap"
+
+
+def heap_generation(days_path, file_name):
+    """The generation of a heap file name next to `days_path` (None if it is not one of its heaps)."""
+    prefix = os.path.basename(days_path)[:-len(".days")] + "."
+    if not (file_name.startswith(prefix) and file_name.endswith(".heap")):
+        return None
+    generation = file_name[len(prefix):-len(".heap")]
+    return int(generation) if generation.isdigit() else None
+
+
+def split_entry(entry):
+    """entry -> (mood code, score, tag mask, heap blob bytes)."""
+    mood = entry.get("mood")
+    code = MOOD_CODES.get(mood, UNKNOWN_MOOD)
+    score = entry.get("score")
+    tags = list(entry.get("tags") or [])
+    mask = tag_mask(tags)
+    blob = {key: value for key, value in entry.items() if key not in ("mood", "score", "tags")}
+    blob.setdefault("text", "")
+    if mood is not None and code == UNKNOWN_MOOD:
+        blob["mood"] = mood
+    if not (isinstance(score, int) and not isinstance(score, bool) and -128 <= score < 128):
+        blob["score"] = score
+        score = DEFAULT_SCORE
+    if mask_to_tags(mask) != tags:
+        blob["tags"] = tags
+    return code, score, mask, json.dumps(blob, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def empty_columns():
+    return {name: np.zeros(0, dtype=dtype) for name, dtype in DAY_COLUMNS}
+
+
+def packed_offsets(lengths):
+    """Heap offsets for blobs of these lengths written back to back in row order."""
+    return np.cumsum(lengths, dtype=np.uint64) - lengths.astype(np.uint64)
+
+
+def new_columns(entries, heap_offset):
+    """(columns, blobs) for {date_key: entry}, with blobs laid out from `heap_offset`."""
+    keys = sorted(entries)
+    columns = {name: np.zeros(len(keys), dtype=dtype) for name, dtype in DAY_COLUMNS}
+    blobs = []
+    for row, date_key in enumerate(keys):
+        code, score, mask, blob = split_entry(entries[date_key])
+        columns["ordinals"][row] = datetime.date.fromisoformat(date_key).toordinal()
+        columns["moods"][row] = code
+        columns["scores"][row] = score
+        columns["tags"][row] = mask
+        columns["lengths"][row] = len(blob)
+        blobs.append(blob)
+    columns["offsets"][:] = heap_offset + packed_offsets(columns["lengths"])
+    return columns, blobs
+
+
+def merge_columns(old, new):
+    """Date-sorted union of two column sets; rows of `new` replace `old` rows of the same day."""
+    merged = {name: np.concatenate((old[name], new[name])).astype(dtype) for name, dtype in DAY_COLUMNS}
+    order = np.argsort(merged["ordinals"], kind="stable") # `new` rows sort after `old` ones
+    ordinals = merged["ordinals"][order]
+    keep = np.ones(len(ordinals), dtype=bool)
+    keep[:-1] = ordinals[:-1] != ordinals[1:]
+    rows = order[keep]
+    return {name: column[rows] for name, column in merged.items()}
+
+
+def encode_days(generation, columns):
+    """Days file bytes for a set of columns."""
+    out = bytearray(_HEADER.pack(DAYS_MAGIC, DAYS_FORMAT_VERSION, generation, len(columns["ordinals"])))
+    for name, dtype in DAY_COLUMNS:
+        out += bytes(-len(out) % 8)
+        out += np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+    return bytes(out)
+
+
+class MappedEntries(Mapping):
+    """Read-only {date_key: entry} over a days file; an entry's text is read when it is looked up."""
+
+    resident_bytes = MAPPED_ENTRIES_BYTES
+
+    def __init__(self, days_path):
+        self.days_path = days_path
+        self.generation = 0
+        self._columns = empty_columns()
+        self._rows = self._columns # per-row access: memoryviews where possible, else the arrays
+        self._heap = None
+        self._heap_lock = threading.Lock()
+        for _ in range(OPEN_ATTEMPTS):
+            try:
+                with open(days_path, "rb") as f:
+                    days = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                return
+            if len(days) < _HEADER.size:
+                days.close()
+                raise ValueError(f"{days_path} is not a days file this app can read")
+            magic, version, self.generation, count = _HEADER.unpack_from(days)
+            if magic != DAYS_MAGIC or version > DAYS_FORMAT_VERSION:
+                days.close()
+                raise ValueError(f"{days_path} is not a days file this app can read")
+            if not count:
+                days.close() # nothing to view: don't hold the map open
+                return
+            try:
+                self._heap = open(self.heap_path, "rb") # held, so a later delete cannot pull it away
+                break
+            except FileNotFoundError:
+                days.close() # replaced by a new generation meanwhile: read the new days file
+        else:
+            raise FileNotFoundError(f"{days_path}: heap generation {self.generation} keeps disappearing")
+        offset = _HEADER.size
+        self._rows = {}
+        for name, dtype in DAY_COLUMNS:
+            offset += -offset % 8
+            column = np.frombuffer(days, dtype=dtype, count=count, offset=offset) # a view of the map
+            self._columns[name] = column
+            if sys.byteorder == "little":
+                self._rows[name] = memoryview(days)[offset:offset + column.nbytes].cast(_ROW_FORMATS[name])
+            else:
+                self._rows[name] = column
+            offset += column.nbytes
+
+    @property
+    def heap_path(self):
+        return heap_path(self.days_path, self.generation)
+
+    def columns(self):
+        """(ordinals, mood codes, scores, tag masks) in date order, as ColumnarDiary takes them."""
+        c = self._columns
+        return c["ordinals"], c["moods"], c["scores"], c["tags"]
+
+    def column_arrays(self):
+        return dict(self._columns)
+
+    def __len__(self):
+        return len(self._columns["ordinals"])
+
+    def _row(self, date_key):
+        try:
+            ordinal = datetime.date.fromisoformat(date_key).toordinal()
+        except (TypeError, ValueError):
+            return None
+        ordinals = self._rows["ordinals"]
+        row = bisect.bisect_left(ordinals, ordinal)
+        return row if row < len(ordinals) and ordinals[row] == ordinal else None
+
+    def __contains__(self, date_key):
+        return self._row(date_key) is not None
+
+    def __getitem__(self, date_key):
+        row = self._row(date_key)
+        if row is None:
+            raise KeyError(date_key)
+        return self._entry(row)
+
+    def __iter__(self):
+        from_ordinal = datetime.date.fromordinal
+        for ordinal in self._columns["ordinals"].tolist():
+            yield from_ordinal(ordinal).isoformat()
+
+    def __repr__(self):
+        return f"MappedEntries({self.days_path!r}, {len(self)} days)"
+
+    def read_blob(self, row):
+        """The raw heap blob of one row."""
+        offset, length = int(self._rows["offsets"][row]), int(self._rows["lengths"][row])
+        with self._heap_lock:
+            self._heap.seek(offset)
+            return self._heap.read(length)
+
+    def close(self):
+        """Closes the heap early (writers do, so they can delete it); the mapping is unusable after."""
+        with self._heap_lock:
+            if self._heap is not None:
+                self._heap.close()
+
+    def _entry(self, row):
+        rows = self._rows
+        code = int(rows["moods"][row])
+        entry = {
+            "mood": MOOD_EMOJIS[code] if code >= 0 else None,
+            "text": "",
+            "score": int(rows["scores"][row]),
+            "tags": mask_to_tags(int(rows["tags"][row])),
+        }
+        entry.update(json.loads(self.read_blob(row).decode("utf-8")))
+        return entry
+
+    def iter_rows(self, start=None, end=None):
+        """Yields (date_key, entry) in date order for dates in [start, end] ('YYYY-MM-DD')."""
+        ordinals = self._rows["ordinals"]
+        first = 0 if start is None else bisect.bisect_left(ordinals, datetime.date.fromisoformat(start).toordinal())
+        last = len(ordinals) if end is None else bisect.bisect_right(ordinals, datetime.date.fromisoformat(end).toordinal())
+        for row in range(first, last):
+            yield datetime.date.fromordinal(int(ordinals[row])).isoformat(), self._entry(row)
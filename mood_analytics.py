@@ -0,0 +1,349 @@
+import copy
+import datetime
+import itertools
+from collections import Counter
+
+import numpy as np
+
+from journal_content import MOOD_EMOJIS, TAG_BITS
+
+# -------------------- Incremental Diary Analytics
+# --------------------
+#
+# Streak, unique moods, totals and the recent score window used to be recomputed from
+# every diary key (with strptime) on each rerun. DiaryStats keeps them as running
+# aggregates that are updated one saved entry at a time.
+
+# Process-wide counter, so a version number is never reused even when stats are rebuilt
+_versions = itertools.count(1)
+
+
+# numpy datetime64[D] counts days from 1970-01-01
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+MOOD_CODES = {emoji: code for code, emoji in enumerate(MOOD_EMOJIS)}
+UNKNOWN_MOOD = -1
+DEFAULT_SCORE = 3 # for entries saved without a score (or with "score": null)
+
+
+def date_ordinal(date_key):
+    """'YYYY-MM-DD' -> proleptic Gregorian ordinal."""
+    return datetime.date.fromisoformat(date_key).toordinal()
+
+
+def tag_mask(tags):
+    """Packs a list of activity tags into a bitmask (tags outside ACTIVITY_TAGS are ignored)."""
+    mask = 0
+    for tag in tags or ():
+        mask |= TAG_BITS.get(tag, 0)
+    return mask
+
+
+def mask_to_tags(mask):
+    return [tag for tag, bit in TAG_BITS.items() if mask & bit]
+
+
+def entry_score(entry):
+    score = entry.get("score")
+    return DEFAULT_SCORE if score is None else score
+
+
+def mood_emoji(code):
+    return MOOD_EMOJIS[code] if code >= 0 else None
+
+
+def year_cell(ordinals, year):
+    """(weekday row, week column) of dates in a GitHub-style 7 x 54 grid for `year` (vectorized)."""
+    jan1 = datetime.date(year, 1, 1)
+    offsets = np.asarray(ordinals, dtype=np.int64) - jan1.toordinal() + jan1.weekday()
+    return offsets % 7, offsets // 7
+
+
+def day_runs(ordinals):
+    """(first days, last days) of the runs of consecutive days in sorted, unique date ordinals."""
+    ordinals = np.asarray(ordinals, dtype=np.int32)
+    if not len(ordinals):
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    breaks = np.flatnonzero(np.diff(ordinals) != 1) + 1
+    return ordinals[np.concatenate(([0], breaks))], ordinals[np.concatenate((breaks - 1, [len(ordinals) - 1]))]
+
+
+def ordinals_to_dates(ordinals):
+    """Vectorized date ordinals -> numpy datetime64[D]."""
+    return (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+# -------------------- Columnar Diary Model
+# --------------------
+
+class ColumnarDiary:
+    """Diary entries as parallel, date-sorted NumPy columns (text stays in the dict diary).
+
+    ordinals  int32   date ordinal
+    moods     int8    index into MOOD_EMOJIS (-1 = unknown)
+    scores    int8    mood score
+    tags      uint32  ACTIVITY_TAGS bitmask
+    """
+
+    def __init__(self, diary=None):
+        columns = getattr(diary, "columns", None)
+        if columns is not None:
+            # Mapped entries (mapped_diary.py) are columnar already: no entry is read, and
+            # the read-only mapped columns are used as they are until the first upsert
+            self._ordinals, self._moods, self._scores, self._tags = columns()
+            self._size = len(self._ordinals)
+            return
+        items = sorted(((date_ordinal(k), e) for k, e in (diary or {}).items()), key=lambda item: item[0])
+        size = len(items)
+        capacity = max(64, size * 2)
+        self._size = size
+        self._ordinals = np.zeros(capacity, dtype=np.int32)
+        self._moods = np.full(capacity, UNKNOWN_MOOD, dtype=np.int8)
+        self._scores = np.zeros(capacity, dtype=np.int8)
+        self._tags = np.zeros(capacity, dtype=np.uint32)
+        if size:
+            self._ordinals[:size] = [ordinal for ordinal, _ in items]
+            self._moods[:size] = [MOOD_CODES.get(e.get("mood"), UNKNOWN_MOOD) for _, e in items]
+            self._scores[:size] = [entry_score(e) for _, e in items]
+            self._tags[:size] = [tag_mask(e.get("tags")) for _, e in items]
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def ordinals(self):
+        return self._ordinals[:self._size]
+
+    @property
+    def moods(self):
+        return self._moods[:self._size]
+
+    @property
+    def scores(self):
+        return self._scores[:self._size]
+
+    @property
+    def tags(self):
+        return self._tags[:self._size]
+
+    def copy(self):
+        clone = copy.copy(self)
+        for name in ("_ordinals", "_moods", "_scores", "_tags"):
+            setattr(clone, name, getattr(self, name).copy())
+        return clone
+
+    def _grow(self):
+        capacity = max(64, len(self._ordinals) * 2)
+        for name in ("_ordinals", "_moods", "_scores", "_tags"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def upsert(self, ordinal, entry):
+        """Inserts or replaces one day (appending today's entry is O(1) amortized)."""
+        i = int(np.searchsorted(self.ordinals, ordinal))
+        if not self._ordinals.flags.writeable: # still the mapped columns
+            self._grow()
+        if i == self._size or self._ordinals[i] != ordinal:
+            if self._size == len(self._ordinals):
+                self._grow()
+            for column in (self._ordinals, self._moods, self._scores, self._tags):
+                column[i + 1:self._size + 1] = column[i:self._size].copy()
+            self._ordinals[i] = ordinal
+            self._size += 1
+        self._moods[i] = MOOD_CODES.get(entry.get("mood"), UNKNOWN_MOOD)
+        self._scores[i] = entry_score(entry)
+        self._tags[i] = tag_mask(entry.get("tags"))
+
+    def span(self, start_ordinal, end_ordinal):
+        """Slice of rows with start_ordinal <= ordinal < end_ordinal."""
+        ordinals = self.ordinals
+        return slice(
+            int(np.searchsorted(ordinals, start_ordinal, side="left")),
+            int(np.searchsorted(ordinals, end_ordinal, side="left")),
+        )
+
+    def days_between(self, start_date, end_date):
+        """{date: (mood emoji, tag list)} for logged days in [start_date, end_date]."""
+        rows = self.span(start_date.toordinal(), end_date.toordinal() + 1)
+        return {
+            datetime.date.fromordinal(int(ordinal)): (mood_emoji(int(mood)), mask_to_tags(int(mask)))
+            for ordinal, mood, mask in zip(self.ordinals[rows], self.moods[rows], self.tags[rows])
+        }
+
+    def score_trend(self, days=30, today=None):
+        """(datetime64 dates, scores) for entries from `days` days ago up to the last entry."""
+        today_ordinal = (today or datetime.date.today()).toordinal()
+        rows = slice(int(np.searchsorted(self.ordinals, today_ordinal - days)), self._size)
+        return ordinals_to_dates(self.ordinals[rows]), self.scores[rows]
+
+
+# -------------------- Running Aggregates
+# --------------------
+
+class DiaryStats:
+    """Running aggregates plus the columnar model of one diary; every change bumps `version`.
+
+    For a partly loaded diary, `history` (DiaryStore.history_summary) adds the counts of
+    the older entries, and their run of days leading into the loaded ones, to the totals,
+    moods and streak. The columns only hold the loaded entries.
+    """
+
+    def __init__(self, diary=None, history=None):
+        self.source = diary
+        self.version = next(_versions)
+        self.version_at_build = self.version
+        self.columns = ColumnarDiary(diary)
+        self.mood_counts = Counter()
+        self.month_versions = {} # (year, month) -> version of the last change in that month
+        self._year_grids = {}    # year -> (scores, mood codes) 7 x 54 grids, built on first use
+        self._streak_cache = None
+        self._shared = False # True while the aggregates belong to another DiaryStats (see share)
+        self.history_entries = 0
+        # Runs of logged days as sorted first/last day arrays: 8 bytes per run, not per day
+        self._run_starts, self._run_ends = day_runs(self.columns.ordinals)
+        if history:
+            self._add_history(history)
+        codes, first_rows, counts = np.unique(self.columns.moods, return_index=True, return_counts=True)
+        for i in np.argsort(first_rows): # in order of first appearance, as entries are read
+            self.mood_counts[mood_emoji(int(codes[i]))] += int(counts[i])
+        self.total_entries = len(self.columns) + self.history_entries
+
+    def _add_history(self, history):
+        self.history_entries = history["entries"]
+        for mood, count in history["mood_counts"].items():
+            self.mood_counts[mood_emoji(MOOD_CODES.get(mood, UNKNOWN_MOOD))] += count
+        if history["run_start"]:
+            # The run leading up to the loaded entries; they continue it if they start at `before`
+            first = date_ordinal(history["run_start"])
+            last = date_ordinal(history["before"]) - 1
+            if len(self._run_starts) and self._run_starts[0] == last + 1:
+                self._run_starts[0] = first
+            else:
+                self._run_starts = np.insert(self._run_starts, 0, first)
+                self._run_ends = np.insert(self._run_ends, 0, last)
+
+    def _run_start(self, ordinal):
+        """First day of the run containing `ordinal`, or None if that day is not logged."""
+        i = int(np.searchsorted(self._run_ends, ordinal))
+        if i < len(self._run_ends) and self._run_starts[i] <= ordinal:
+            return int(self._run_starts[i])
+        return None
+
+    def _add_day(self, ordinal):
+        starts, ends = self._run_starts, self._run_ends
+        i = int(np.searchsorted(starts, ordinal))
+        joins_previous = i > 0 and ends[i - 1] == ordinal - 1
+        joins_next = i < len(starts) and starts[i] == ordinal + 1
+        if joins_previous and joins_next:
+            ends[i - 1] = ends[i]
+            self._run_starts, self._run_ends = np.delete(starts, i), np.delete(ends, i)
+        elif joins_previous:
+            ends[i - 1] = ordinal
+        elif joins_next:
+            starts[i] = ordinal
+        else:
+            self._run_starts, self._run_ends = np.insert(starts, i, ordinal), np.insert(ends, i, ordinal)
+
+    def share(self, source):
+        """Stats for another diary with the same entries, sharing these aggregates until its first change."""
+        clone = copy.copy(self)
+        clone.source = source
+        clone._shared = True
+        return clone
+
+    def _unshare(self):
+        self.columns = self.columns.copy()
+        self.mood_counts = Counter(self.mood_counts)
+        self.month_versions = dict(self.month_versions)
+        self._year_grids = {year: (scores.copy(), moods.copy()) for year, (scores, moods) in self._year_grids.items()}
+        self._run_starts = self._run_starts.copy()
+        self._run_ends = self._run_ends.copy()
+        self._shared = False
+
+    def record_entry(self, date_key, entry):
+        """Adds or replaces the entry for one date."""
+        if self._shared:
+            self._unshare()
+        ordinal = date_ordinal(date_key)
+        rows = self.columns.span(ordinal, ordinal + 1)
+        if rows.start == rows.stop:
+            self.total_entries += 1
+            self._add_day(ordinal)
+        else:
+            previous = mood_emoji(int(self.columns.moods[rows.start]))
+            self.mood_counts[previous] -= 1
+            if self.mood_counts[previous] <= 0:
+                del self.mood_counts[previous]
+        self.columns.upsert(ordinal, entry)
+        self.mood_counts[mood_emoji(MOOD_CODES.get(entry.get("mood"), UNKNOWN_MOOD))] += 1
+        self.version = next(_versions)
+        date = datetime.date.fromordinal(ordinal)
+        self.month_versions[(date.year, date.month)] = self.version
+        if date.year in self._year_grids:
+            scores, moods = self._year_grids[date.year]
+            row, col = year_cell([ordinal], date.year)
+            scores[row, col] = entry_score(entry)
+            moods[row, col] = MOOD_CODES.get(entry.get("mood"), UNKNOWN_MOOD)
+
+    def month_version(self, year, month):
+        """Changes only when an entry in that month is saved (or the stats are rebuilt)."""
+        return self.month_versions.get((year, month), self.version_at_build)
+
+    @property
+    def unique_moods(self):
+        return set(self.mood_counts)
+
+    def streak(self, today=None):
+        """Consecutive logged days ending today (or yesterday, if today is not logged yet)."""
+        today_ordinal = (today or datetime.date.today()).toordinal()
+        cached = self._streak_cache
+        if cached and cached[0] == self.version and cached[1] == today_ordinal:
+            return cached[2]
+        run_start = self._run_start(today_ordinal)
+        if run_start is not None:
+            streak = today_ordinal - run_start + 1
+        elif self._run_start(today_ordinal - 1) is not None:
+            streak = today_ordinal - self._run_start(today_ordinal - 1)
+        else:
+            streak = 0
+        self._streak_cache = (self.version, today_ordinal, streak)
+        return streak
+
+    def recent_days(self, days=7, today=None):
+        """(score, mood) for each logged day in [today - days, today)."""
+        today_ordinal = (today or datetime.date.today()).toordinal()
+        rows = self.columns.span(today_ordinal - days, today_ordinal)
+        return [
+            (int(score), mood_emoji(int(mood)))
+            for score, mood in zip(self.columns.scores[rows], self.columns.moods[rows])
+        ]
+
+    def year_grid(self, year):
+        """(scores, mood codes) as 7 x 54 weekday-by-week grids for one year.
+
+        Scores are 0 for days without an entry and nan for cells outside the year.
+        Built from the columns on first use, then updated in place by record_entry.
+        """
+        grids = self._year_grids.get(year)
+        if grids is None:
+            first = datetime.date(year, 1, 1).toordinal()
+            last = datetime.date(year, 12, 31).toordinal()
+            scores = np.full((7, 54), np.nan, dtype=np.float32)
+            moods = np.full((7, 54), UNKNOWN_MOOD, dtype=np.int8)
+            scores[year_cell(np.arange(first, last + 1), year)] = 0
+            rows = self.columns.span(first, last + 1)
+            cells = year_cell(self.columns.ordinals[rows], year)
+            scores[cells] = self.columns.scores[rows]
+            moods[cells] = self.columns.moods[rows]
+            grids = self._year_grids[year] = (scores, moods)
+        return grids
+
+    def logged_years(self):
+        """(first, last) year with an entry, or None for an empty diary."""
+        if not len(self.columns):
+            return None
+        first = datetime.date.fromordinal(int(self.columns.ordinals[0]))
+        last = datetime.date.fromordinal(int(self.columns.ordinals[-1]))
+        return first.year, last.year
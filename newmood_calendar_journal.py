@@ -4,14 +4,49 @@ import calendar
 import random
 import json
 import os
-import pandas as pd
-import time
+import copy
+import statistics
+import threading
+import tempfile
 # --- Mood Sprout Game Imports ---
-from PIL import Image
 import base64 
 import io
-# --- Plotly Import (Needed for Insights) ---
-import plotly.express as px
+# --- pandas / Plotly are imported inside the pages that use them (insights, sprout),
+# --- so the first run of a worker process does not pay for them on every page
+# --- Diary Storage Backends (JSON files / SQLite) ---
+from diary_snapshot import SnapshotError
+from diary_storage import DiaryFormatError, get_diary_store, safe_user_key, split_document, user_data_file
+# --- One Shared Parsed Diary per User, Copy-on-Write Views per Session ---
+from diary_cache import DiaryView, shared_diaries
+# --- Downscaled Image Variants (thumb / medium) ---
+from image_assets import load_image_bytes, warm_asset_cache
+# --- Incremental Streak / Mood Aggregates and Columnar Diary ---
+from mood_analytics import DiaryStats
+# --- Vectorized Activity Tag Analytics ---
+from tag_analytics import compute_tag_stats, tag_pair_table, tag_table
+# --- Cached Single-Block Month Calendar ---
+from calendar_view import get_month_view, month_grid_range, year_pixels_figure
+# --- Journal Search Index ---
+from search_index import SearchIndex, adopt_legacy_index, search_index_file
+# --- Keyword Automaton for Diary Replies ---
+from response_engine import response_engine
+# --- Seeded Per-(User, Date) Fortune Schedule ---
+from fortune_schedule import daily_fortune
+# --- Streaming NDJSON / CSV / Parquet Export and Import ---
+from diary_transfer import (
+    TRANSFER_FORMATS, TRANSFER_MIME_TYPES, DiaryImportError, detect_format, export_diary, import_diary,
+)
+# --- Opt-in Hot-Path Timing Ring Buffer (MOOD_JOURNAL_PROFILE=1) ---
+from instrumentation import PROFILE_DUMP_DIR, profiler
+# --- Debounced Background Saves of the User State (MOOD_JOURNAL_SAVE_DELAY) ---
+from save_queue import SessionSaves, newest_state, save_queue
+# --- Shared Journal Content (tags, moods, texts, companions, CSS), built once per process ---
+from journal_content import (
+    ACHIEVEMENTS, ACTIVITY_TAGS, ANIMAL_COMPANIONS, APP_CSS, CHEER_UP_JOKES, DAILY_PROMPTS,
+    EMOJI_TO_SPROUT_NAME, EMOTION_RESPONSES, FIXED_ACCENT_COLOR, GENERAL_RESPONSES,
+    MOOD_EMOJIS, MOOD_MAPPING, MOOD_SCORES, PET_IMAGE_PATHS, PET_MAPPING, PET_MOOD_CHOICES,
+    POTION_MAPPING, SURPRISE_FACTS,
+)
 
 # -------------------- 0. Mood Sprout Helper Functions (for Pet Game)
 # --------------------
@@ -26,13 +61,11 @@ def get_base64_image(image_path, cache_identifier=None):
     except FileNotFoundError:
         return None
  
-@st.cache_data
-def load_pet_image(image_path):
-    """Loads pet images using PIL (for robustness)."""
+@profiler.wrap()
+def load_pet_image(image_path, variant="medium"):
+    """Returns encoded bytes of the downscaled image ('thumb' for potions, 'medium' for plant/pet)."""
     try:
-        if not os.path.exists(image_path):
-            return None
-        return Image.open(image_path)
+        return load_image_bytes(image_path, variant)
     except Exception:
         return None
  
@@ -41,228 +74,28 @@ def load_pet_image(image_path):
  
 POINTS_PER_ENTRY = 10 
 MAX_DAILY_POTION_ENTRIES = 5 # Max potions granted per day
+# Months of entries loaded at login on backends with range reads (0 = all of history)
+LOGIN_WINDOW_MONTHS = int(os.environ.get("MOOD_JOURNAL_LOGIN_WINDOW_MONTHS", 2))
  
 st.set_page_config(page_title="🌸 Personalized Mood Journal Pro", layout="centered")
+ 
+# --- Global Lists (English), texts, companions and colors live in journal_content.py ---
 
-# --- 背景顏色設定 ---
-BACKGROUND_COLOR = "#FAF0E6" # Linen 米白色
- 
-# --- Global Lists (English) ---
-# ************ 修改 ACTIVITY_TAGS: 加入 Other ❓ ************
-ACTIVITY_TAGS = [
-    "Work 💻", "Exercise 🏋️", "Socializing 👥", "Food 🍕",
-    "Family ❤️", "Hobbies 🎨", "Rest 🛋️", "Study 📚", "Travel ✈️", "Nature 🏞️", "Money 💰",
-    "Other ❓"
-]
- 
-MOOD_MAPPING = {
-    "Happy": "😀", "Sad": "😢", "Angry": "😡", "Calm": "😌", 
-    "Excited": "🤩", "Tired": "😴", "Anxious": "😥",
-}
-MOOD_SCORES = {
-    "😀": 5, "🤩": 4, "😌": 3, "😴": 2, "😢": 1, "😡": 1, "😥": 1
-}
-
-# --- ACHIEVEMENT CONSTANTS (NEWLY ADDED) ---
-ACHIEVEMENTS = [
-    {"name": "Journaling Beginner", "desc": "Achieve 5 total entries.", "threshold": 5, "type": "total_entries"},
-    {"name": "Consistent Companion", "desc": "Achieve a 7-day streak.", "threshold": 7, "type": "streak"},
-    {"name": "Emotion Explorer", "desc": "Log all 7 mood types at least once.", "threshold": 7, "type": "unique_moods"},
-    {"name": "Insight Master", "desc": "Log 30 total entries.", "threshold": 30, "type": "total_entries"},
-]
-
-# --- Mood Sprout Game Mappings (Updated Text and File Names) ---
+# --- Mood Sprout Game Rules ---
 SPROUT_EVOLUTION_THRESHOLD = 30 # Sprout evolution threshold
 SPROUT_INITIAL_POTIONS = 5 # User request: 5 potions initially
-SPROUT_IMAGE_DIR = "image" # 藥水/植物圖片資料夾
- 
-# Potion name to file path mapping (lowercase)
-POTION_MAPPING = {
-    "happy": os.path.join(SPROUT_IMAGE_DIR, "potion_happy.png"),
-    "sad": os.path.join(SPROUT_IMAGE_DIR, "potion_sad.png"),
-    "angry": os.path.join(SPROUT_IMAGE_DIR, "potion_angry.png"),
-    "calm": os.path.join(SPROUT_IMAGE_DIR, "potion_calm.png"),
-    "excited": os.path.join(SPROUT_IMAGE_DIR, "potion_excited.png"),
-    "tired": os.path.join(SPROUT_IMAGE_DIR, "potion_tired.png"),
-    "anxious": os.path.join(SPROUT_IMAGE_DIR, "potion_anxious.png"),
-}
- 
-# Pet evolution image paths (Capitalized)
-PET_MAPPING = {
-    "Seed": os.path.join(SPROUT_IMAGE_DIR, "soil.png"), 
-    "Happy": os.path.join(SPROUT_IMAGE_DIR, "plant_happy.png"), 
-    "Sad": os.path.join(SPROUT_IMAGE_DIR, "plant_sad.png"), 
-    "Angry": os.path.join(SPROUT_IMAGE_DIR, "plant_angry.png"), 
-    "Calm": os.path.join(SPROUT_IMAGE_DIR, "plant_calm.png"), 
-    "Excited": os.path.join(SPROUT_IMAGE_DIR, "plant_excited.png"), 
-    "Tired": os.path.join(SPROUT_IMAGE_DIR, "plant_tired.png"), 
-    "Anxious": os.path.join(SPROUT_IMAGE_DIR, "plant_anxious.png"), 
-}
- 
-# Helper: Emoji to internal sprout name (lowercase)
-EMOJI_TO_SPROUT_NAME = { 
-    "😀": "happy", "😢": "sad", "😡": "angry", "😌": "calm", 
-    "🤩": "excited", "😴": "tired", "😥": "anxious",
-}
- 
-# --- Response Texts (Retained) ---
-EMOTION_RESPONSES = {
-    "tired": "You sound tired 😴. Rest is productive too — take time to recharge.",
-    "bored": "Boredom might mean your heart craves something new 🎨. Try doing something creative today!",
-    "calm": "That’s wonderful 🌿. Calmness is peace speaking softly to your soul.",
-    "guilty": "Guilt shows you care 🌱. Reflect gently and forgive yourself.", 
-    "anxious": "Anxiety can be heavy 😥. Breathe slowly — you’re safe and doing your best.",
-    "happy": "Yay! So happy for you! 😄🎈 Let your joy shine and share your smile today!",
-    "sad": f"It’s okay to feel sad 💧. Emotions flow and fade — here’s a little cheer-up joke for you:\n\n**{random.choice(['Why did the scarecrow win an award? Because he was outstanding in his field 🌾', 'I told my computer I felt sad — it gave me a byte of comfort 💻', 'Did you hear about the depressed coffee? It got mugged ☕'])}**",
-    "lonely": "Loneliness is heavy 🫶. You’re not alone — I’m here listening.",
-    "angry": "It’s alright to feel upset 😔. Let it out — expression is healing.",
-}
- 
-GENERAL_RESPONSES = [
-    "Thank up for sharing your entry ✍️. Remember, small steps lead to big changes.",
-    "Your feelings are valid. Take a moment to focus on your breath and find peace. 🌬️",
-    "It takes courage to write down your thoughts. We're here to listen to your journey! 🫂",
-    "Keep up the habit of reflection! Every day is a new story waiting to unfold. 🌿",
-    "Well done on making an entry today! You are prioritizing your well-being. 😊",
-]
- 
-DAILY_PROMPTS = [
-    "What is one thing that made you feel proud or accomplished today?",
-    "If you could give yesterday's self one piece of advice, what would it be?",
-    "Describe three sounds, smells, or sights you encountered today.",
-    "Did you express gratitude to anyone today, or did someone make you feel grateful?",
-    "What is one small thing you can do tomorrow to make it better?",
-    "What is a new thing you learned today, no matter how small?",
-]
- 
-SURPRISE_FACTS = [
-    "Did you know a group of flamingos is called a 'flamboyance'? Stay flamboyant! 💖",
-    "Fun Fact: Honey never spoils. Keep your good memories preserved like honey! 🍯",
-    "Quick Riddle: What has to be broken before you can use it? A seed! Break those barriers!🌱", 
-    "A moment of wonder: There are more trees on Earth than stars in the Milky Way. Keep growing! 🌳",
-    "Your lucky number today is 7! May your day be seven times brighter! ✨",
-]
- 
-FORTUNE_SLIPS = (
-    # Supreme Luck (大吉 - 5 slips)
-    [("Supreme Luck", "🌟", "A day of profound clarity and happiness awaits. Trust your highest vision; your energy is magnetic today.")] * 2 +
-    [("Supreme Luck", "🌟", "All relationships are blessed today. Reach out and share your good fortune; it will return tenfold.")] +
-    [("Supreme Luck", "🌟", "An obstacle you faced yesterday dissolves today. Unexpected success finds you when you stay open.")] +
-    [("Supreme Luck", "🌟", "Inner peace is your greatest asset. Use this calm to make powerful, confident decisions.")] +
-    [("Supreme Luck", "🌟", "The universe is aligning for you today. Expect a breakthrough in an area you thought was stuck.")] + 
-    
-    # Excellent Luck (吉 - 15 slips)
-    [("Excellent Luck", "✨", "Your mind is sharp and ideas flow. Write down new goals; you have the power to achieve them.")] * 3 +
-    [("Excellent Luck", "✨", "Take a risk today, especially in creative endeavors. Joy follows bold action.")] * 3 +
-    [("Excellent Luck", "✨", "Unexpected kindness comes from a stranger or colleague. Pay it forward and brighten someone else's day.")] * 3 +
-    [("Excellent Luck", "✨", "A lingering doubt is resolved easily. Feel lighter and move forward with purpose.")] * 3 +
-    [("Excellent Luck", "✨", "The path to self-improvement is wide open. Commit to a healthy habit today.")] * 3 +
-
-    # Good Prospect (中吉 - 15 slips)
-    [("Good Prospect", "🍀", "A feeling of balance settles in. Trust the rhythm of your day and avoid unnecessary rushing.")] * 3 +
-    [("Good Prospect", "🍀", "Someone needs your support. Offering a listening ear will deepen your connection.")] * 3 +
-    [("Good Prospect", "🍀", "Your emotional well-being requires gentle attention. Focus on rest and simple pleasures.")] * 3 +
-    [("Good Prospect", "🍀", "A small personal victory is on the horizon. Acknowledge and reward your efforts.")] * 3 +
-    [("Good Prospect", "🍀", "Change is coming, but it is manageable. Prepare your mind for gentle adjustments.")] * 3 +
-
-    # Moderate Fortune (小吉 - 10 slips)
-    [("Moderate Fortune", "🌤️", "It is a day for careful planning. Avoid spontaneity and stick to your schedule for best results.")] * 2 +
-    [("Moderate Fortune", "🌤️", "Energy levels are moderate. Conserve your efforts for what truly matters by saying 'no' when needed.")] * 2 +
-    [("Moderate Fortune", "🌤️", "A minor misunderstanding may occur. Approach conversations with patience and seek clarity.")] * 2 +
-    [("Moderate Fortune", "🌤️", "Don't dwell on perfection. Good enough is perfect for today; accept progress over flawless execution.")] * 2 +
-    [("Moderate Fortune", "🌤️", "Neutral energy surrounds you. Use this quiet day for thoughtful reflection in your journal.")] * 2 +
-
-    # Minor Challenge (凶 - 5 slips)
-    [("Minor Challenge", "⚠️", "Frustration is possible. Use this as a signal to step away and seek immediate stress relief.")] +
-    [("Minor Challenge", "⚠️", "A feeling of heaviness may arise. Be extra gentle with yourself and prioritize basic self-care.")] +
-    [("Minor Challenge", "⚠️", "Be mindful of unnecessary spending or overcommitment. Your boundaries need protection today.")] +
-    [("Minor Challenge", "⚠️", "Doubt may creep in. Remember your core strengths and seek external encouragement if needed.")] +
-    [("Minor Challenge", "⚠️", "Communication requires extra effort. Write down your thoughts before speaking to avoid conflict.")]
-)
-
-# -------------------- 1.5. GLOBAL CONSTANTS AND MAPPINGS (PET GAME ADDITION)
-# --------------------
-
-# **修正：寵物圖片（pet_*.png）位於根目錄**
-
-PET_IMAGE_PATHS = {
-    "happy_dog": "pet_happy.png",    
-    "sad_cat": "pet_sad.png",        
-    "tired_panda": "pet_tired.png",    
-    "angry_rabbit": "pet_anxious.png", 
-    "calm_owl": "pet_calm.png",        
-}
-
-ANIMAL_COMPANIONS = {
-    "happy_dog": {
-        "name": "Happy Dog 🐶",
-        "art": {"visual_path": PET_IMAGE_PATHS["happy_dog"],},
-        "initial_message": "Woof! You chose 'Super Happy'! That's great! Let's play together!",
-        "responses": {
-            "tap": ["Woof! You booped my nose!", "Bark! Full of energy!", "Huh? What is it?"],
-            "pet": ["🥰 Purrrrr... I love you!", "Feeling loved! 🐾", "Pet me more, my mood is flying high!"],
-            "feed": ["Delicious! This tastes like heaven! Thank you, human!", "I love tasty treats the most! Woof!", "Full of life now! 🦴"]
-        }
-    },
-    "sad_cat": {
-        "name": "Comfort Cat 🐱",
-        "art": {"visual_path": PET_IMAGE_PATHS["sad_cat"],},
-        "initial_message": "Meow... You chose 'A Bit Sad'? It's okay, I'll quietly stay here with you and offer a warm rub.",
-        "responses": {
-            "tap": ["Don't bother me. I'm napping.", "Shhh... Be quiet, listen to my purr.", "I'm here for you."],
-            "pet": ["💕 Hmph... It's comfortable, but don't think I'm clingy. Fine, just a little more...", "Grrrrrrr... (Reluctantly enjoying it)"],
-            "feed": ["Oh... Is this for me? (Eats slowly) Thanks...", "Mmm, you know my taste. 🐟"]
-        }
-    },
-    "tired_panda": {
-        "name": "Chill Panda 🐼", 
-        "art": {"visual_path": PET_IMAGE_PATHS["tired_panda"],},
-        "initial_message": "Hoo... Hoo... Chose 'Super Tired'? Come... let's slowly... eat bamboo... together...",
-        "responses": {
-            "tap": ["...Mmm... A little... ticklish...", "...Slow... down...", "...What is it..."],
-            "pet": ["...Wow... So... comfy... Pet... me... a little more...", "...This warm... feeling... is nice...", "...I... like... it..."],
-            "feed": ["...Ah... Bamboo... is... delicious...", "...Eating... slowly... enjoying... 🌿"]
-        }
-    },
-    "angry_rabbit": {
-        "name": "Fuffy Rabbit 🐰",
-        "art": {"visual_path": PET_IMAGE_PATHS["angry_rabbit"],},
-        "initial_message": "You chose 'Very Angry'? I understand that puffed-up feeling! Take a deep breath, puff up like me, and slowly relax.",
-        "responses": {
-            "tap": ["Don't touch me! I'm still angry!", "Touch me again and I'll run away!", "💢"],
-            "pet": ["(Huffs)... Fine... Just a little stroke... The anger is subsiding a bit...", "Mmm... Head rubs... That feels slightly better..."],
-            "feed": ["Mine! (Guards the food) ...It's quite tasty though.", "Are you bribing me? Hmph! 🥕"]
-        }
-    },
-    "calm_owl": {
-        "name": "Peaceful Owl 🦉", 
-        "art": {"visual_path": PET_IMAGE_PATHS["calm_owl"],},
-        "initial_message": "Good evening~ You chose 'Calm and Relaxed'? Wonderful! Let me gaze at you peacefully, helping you unwind.",
-        "responses": {
-            "tap": ["Hush... I'm meditating.", "No rush, take your time.", "I'm guarding you here."],
-            "pet": ["Hoo... So soft, feel my feathers.", "It's peaceful, isn't it?", "We support each other."],
-            "feed": ["Thank you! A night's banquet.", "Food is good.", "Chew slowly, absorb the wisdom."]
-        }
-    },
-}
-
-PET_MOOD_CHOICES = {
-    "Super Happy! 🥳": "happy_dog",
-    "A Bit Sad 😢": "sad_cat",
-    "Super Tired, Need Rest 😴": "tired_panda", 
-    "Very Angry! 💢": "angry_rabbit",
-    "Calm and Relaxed 😌": "calm_owl",      
-}
  
 # -------------------- 2. HELPER FUNCTIONS (Data & Streak) (JOURNAL APP)
 # --------------------
  
 def get_user_data_file(user_name):
     """Generates a unique file name based on user name."""
-    if not user_name:
-        return None
-    safe_name = user_name.strip().lower().replace(" ", "_")
-    return f"diary_{safe_name}.json"
+    return user_data_file(user_name)
+
+@st.cache_resource
+def get_store():
+    """Shared storage backend (MOOD_JOURNAL_STORAGE=json, log or sqlite)."""
+    return get_diary_store()
  
 def create_initial_sprout_state(): 
     """Initializes the Mood Sprout state for a new user or on first run.""" 
@@ -281,94 +114,202 @@ def create_initial_sprout_state():
         'last_potion_date': today_str
     }
  
-def load_diary(user_name):
-    """Loads diary data for the specified user."""
-    data_file = get_user_data_file(user_name)
-    if not data_file: return
+def login_window_start(today=None):
+    """First day of the oldest month loaded at login (the current month is the first)."""
+    today = today or datetime.date.today()
+    month_index = today.year * 12 + today.month - LOGIN_WINDOW_MONTHS
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+ 
+@profiler.wrap()
+def load_diary(user_name, windowed=False):
+    """Loads diary data for the specified user.
+
+    With `windowed` (login), a backend with range reads loads only the last
+    LOGIN_WINDOW_MONTHS months plus counters for the rest; see load_older_entries.
+    """
+    if not get_user_data_file(user_name): return
+    
+    store = get_store()
+    key = save_queue_key(user_name)
+    save_queue.flush(key) # this session's queued saves must be in what we read
+    save_queue.take_written(key)
+    st.session_state.diary_history = None
+    try:
+        if windowed and LOGIN_WINDOW_MONTHS > 0 and store.range_reads:
+            loaded = store.load_window(user_name, login_window_start().isoformat())
+            data, history = loaded or (None, None)
+            if history and history["entries"]:
+                st.session_state.diary_history = history
+        else:
+            data = shared_diaries.load(store, user_name)
+    except (json.JSONDecodeError, DiaryFormatError, SnapshotError): # a damaged or foreign file
+        st.session_state.diary = {}
+        st.session_state.elf_state = create_initial_sprout_state() 
+        return
     
-    if os.path.exists(data_file):
-        try:
-            with open(data_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                st.session_state.diary = data.get("diary", {})
-                st.session_state.total_points = data.get("total_points", 0)
-                
-                loaded_date = data.get("fortune_date")
-                today_str = datetime.date.today().strftime("%Y-%m-%d")
-                
-                if loaded_date == today_str:
-                    st.session_state.fortune_drawn = True
-                    st.session_state.fortune_result = data.get("fortune_result", None)
-                else:
-                    st.session_state.fortune_drawn = False
-                    st.session_state.fortune_result = None
-            
-                # --- Mood Sprout Game State Loading (using original key 'elf_state') ---
-                st.session_state.elf_state = data.get("elf_state", None)
-                if not st.session_state.elf_state:
-                    st.session_state.elf_state = create_initial_sprout_state() 
-                
-                # --- Check and reset daily potion limit ---
-                last_potion_date = st.session_state.elf_state.get('last_potion_date', '1900-01-01')
-                if last_potion_date != datetime.date.today().strftime("%Y-%m-%d"):
-                    st.session_state.elf_state['daily_potion_count'] = 0
-                    st.session_state.elf_state['last_potion_date'] = datetime.date.today().strftime("%Y-%m-%d")
-                    
-        except json.JSONDecodeError:
-            st.session_state.diary = {}
+    if data is not None:
+        # Base for merging this session's next save with saves from other sessions/tabs
+        st.session_state.saved_state = copy.deepcopy(split_document(data)[1])
+        st.session_state.diary = data.get("diary", {})
+        st.session_state.total_points = data.get("total_points", 0)
+        
+        # The slip itself is recomputed from the fortune schedule; only the draw date is saved
+        st.session_state.fortune_drawn_on = data.get("fortune_drawn_on")
+        if st.session_state.fortune_drawn_on is None and data.get("fortune_result") and not store.migrated:
+            # Files saved before the schedule: fortune_date + fortune_result of the last draw
+            st.session_state.fortune_drawn_on = data.get("fortune_date")
+    
+        # --- Mood Sprout Game State Loading (using original key 'elf_state') ---
+        st.session_state.elf_state = data.get("elf_state", None)
+        if not st.session_state.elf_state:
             st.session_state.elf_state = create_initial_sprout_state() 
+        
+        # --- Check and reset daily potion limit ---
+        last_potion_date = st.session_state.elf_state.get('last_potion_date', '1900-01-01')
+        if last_potion_date != datetime.date.today().strftime("%Y-%m-%d"):
+            st.session_state.elf_state['daily_potion_count'] = 0
+            st.session_state.elf_state['last_potion_date'] = datetime.date.today().strftime("%Y-%m-%d")
     else:
         st.session_state.diary = {}
         st.session_state.elf_state = create_initial_sprout_state() 
  
-def save_diary():
-    """Saves diary and state data for the current user."""
-    user_name = st.session_state.get("user_name")
-    data_file = get_user_data_file(user_name)
-    if not data_file: return
- 
-    data_to_save = {
-        "diary": st.session_state.diary,
+def get_diary_state():
+    """Collects everything saved for the user except the diary entries themselves."""
+    return {
         "total_points": st.session_state.total_points,
-        "user_name": user_name,
-        "fortune_drawn": st.session_state.get("fortune_drawn", False),
-        "fortune_result": st.session_state.get("fortune_result", None),
-        "fortune_date": datetime.date.today().strftime("%Y-%m-%d"),
+        "user_name": st.session_state.get("user_name"),
+        "fortune_drawn_on": st.session_state.get("fortune_drawn_on"),
         # --- Mood Elf Game State Saving (using original key 'elf_state') ---
         "elf_state": st.session_state.elf_state
     }
-    with open(data_file, "w", encoding="utf-8") as f:
-        json.dump(data_to_save, f, ensure_ascii=False, indent=4)
  
+def remember_saved_state(state):
+    """Adopts the state actually written, which may include merged saves from other sessions."""
+    if state is None: return
+    st.session_state.saved_state = copy.deepcopy(state)
+    st.session_state.total_points = state.get("total_points", 0)
+    st.session_state.elf_state = copy.deepcopy(state.get("elf_state")) or st.session_state.elf_state
+    if state.get("fortune_drawn_on"):
+        st.session_state.fortune_drawn_on = state.get("fortune_drawn_on")
+ 
+def save_queue_key(user_name):
+    """This session's key for the user in the background save queue."""
+    if "session_saves" not in st.session_state:
+        st.session_state.session_saves = SessionSaves(save_queue) # flushes them when the session ends
+    return st.session_state.session_saves.key(safe_user_key(user_name))
+ 
+def adopt_background_saves():
+    """Takes over the state the background writer saved for this session, once nothing is queued."""
+    user_name = st.session_state.get("user_name")
+    if not get_user_data_file(user_name): return
+    remember_saved_state(save_queue.take_written(save_queue_key(user_name)))
+ 
+@profiler.wrap()
+def save_diary(durable=False):
+    """Saves points, fortune and sprout state for the current user.
+
+    The save is queued and written shortly after by a background thread, replacing any
+    save of this session still waiting. With `durable` (or MOOD_JOURNAL_SAVE_DELAY=0)
+    the state is written before returning.
+    """
+    user_name = st.session_state.get("user_name")
+    if not get_user_data_file(user_name): return
+    key = save_queue_key(user_name)
+    if durable or save_queue.synchronous:
+        base = newest_state(st.session_state.get("saved_state"), save_queue.cancel(key))
+        remember_saved_state(get_store().save_state(user_name, get_diary_state(), base=base))
+    else:
+        save_queue.submit(key, get_store(), user_name, get_diary_state(), base=st.session_state.get("saved_state"))
+ 
+@profiler.wrap()
+def save_diary_entry(date_key, entry):
+    """Puts one entry into the diary and saves it (a single-row upsert on SQLite) with the user state."""
+    stats = get_diary_stats() # before the diary changes, while the stats still match it
+    st.session_state.diary[date_key] = entry
+    stats.record_entry(date_key, entry)
+    user_name = st.session_state.get("user_name")
+    if not get_user_data_file(user_name): return
+    index = st.session_state.get("search_index")
+    if index is not None and index.source is st.session_state.diary:
+        index.update(date_key, entry)
+        index.schedule_save(search_index_file(user_name))
+    # Carries the full state, so a save still queued for this session is dropped
+    base = newest_state(st.session_state.get("saved_state"), save_queue.cancel(save_queue_key(user_name)))
+    saved = get_store().upsert_entry(user_name, date_key, entry, state=get_diary_state(), base=base)
+    remember_saved_state(saved)
+ 
+def get_todays_fortune():
+    """Today's (level, emoji, description) if the user has drawn it, else None."""
+    today = datetime.date.today()
+    if st.session_state.get("fortune_drawn_on") != today.strftime("%Y-%m-%d"):
+        return None
+    return daily_fortune(st.session_state.user_name, today)
+ 
+def load_diary_range(start_date, end_date):
+    """Reads only the entries between two dates (inclusive) from the storage backend."""
+    user_name = st.session_state.get("user_name")
+    if not get_user_data_file(user_name): return {}
+    return get_store().load_entries(user_name, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+ 
+def load_older_entries(start_date=None):
+    """Extends a diary loaded with `windowed` back to the month of `start_date` (None: all of it)."""
+    history = st.session_state.get("diary_history")
+    if history is None or (start_date is not None and start_date.strftime("%Y-%m-%d") >= history["before"]):
+        return
+    user_name = st.session_state.user_name
+    if start_date is None:
+        data = shared_diaries.load(get_store(), user_name)
+        st.session_state.diary = data["diary"] if data else {}
+        st.session_state.diary_history = None
+        return
+    start = start_date.replace(day=1)
+    window_start = datetime.date.fromisoformat(history["before"])
+    diary = load_diary_range(start, window_start - datetime.timedelta(days=1))
+    diary.update(st.session_state.diary) # a new dict, so stats and search index rebuild for it
+    st.session_state.diary = diary
+    history = get_store().history_summary(user_name, start.strftime("%Y-%m-%d"))
+    st.session_state.diary_history = history if history["entries"] else None
+ 
+def get_diary_stats(diary=None):
+    """Running streak/mood/score aggregates, kept in session and updated per saved entry."""
+    diary = st.session_state.diary if diary is None else diary
+    stats = st.session_state.get("diary_stats")
+    reused = stats is not None and stats.source is diary and stats.total_entries - stats.history_entries == len(diary)
+    profiler.note(cache_hit=reused)
+    if not reused:
+        if isinstance(diary, DiaryView):
+            stats = diary.stats() # shares the cached diary's stats until this session edits it
+        else:
+            # Entries before a login window are counted from the stored summary
+            stats = DiaryStats(diary, st.session_state.get("diary_history") if diary is st.session_state.diary else None)
+        if diary is st.session_state.diary:
+            st.session_state.diary_stats = stats
+    return stats
+ 
+def get_search_index():
+    """Search index for the current diary: read from disk and re-synced once per login."""
+    index = st.session_state.get("search_index")
+    if index is None or index.source is not st.session_state.diary:
+        adopt_legacy_index(st.session_state.get("user_name"))
+        index_file = search_index_file(st.session_state.get("user_name"))
+        index = SearchIndex.load(index_file) if index_file else SearchIndex()
+        if index.sync(st.session_state.diary) and index_file:
+            index.schedule_save(index_file)
+        st.session_state.search_index = index
+    return index
+ 
+@profiler.wrap()
 def calculate_streak(diary):
     """Calculates the current consecutive logging streak."""
     if not diary: return 0
-    logged_dates = set(
-        datetime.datetime.strptime(d, "%Y-%m-%d").date() 
-        for d in diary.keys()
-    )
-    today = datetime.date.today()
-    streak = 0
-    day_to_check = today
-    if day_to_check in logged_dates:
-        streak = 1
-        day_to_check -= datetime.timedelta(days=1)
-    elif (day_to_check - datetime.timedelta(days=1)) in logged_dates:
-        streak = 1
-        day_to_check -= datetime.timedelta(days=2) 
-    else:
-        return 0
-    while day_to_check in logged_dates:
-        streak += 1
-        day_to_check -= datetime.timedelta(days=1)
-    return streak
+    return get_diary_stats(diary).streak()
  
 # --- ACHIEVEMENT CALCULATION LOGIC ---
 def calculate_achievements(diary, streak):
     """Checks the user's diary against predefined achievement thresholds."""
-    total_entries = len(diary)
-    logged_moods = set(entry['mood'] for entry in diary.values())
-    unique_moods_count = len(logged_moods)
+    stats = get_diary_stats(diary)
+    total_entries = stats.total_entries
+    unique_moods_count = len(stats.unique_moods)
     
     unlocked_achievements = []
     
@@ -390,32 +331,25 @@ def calculate_achievements(diary, streak):
     return unlocked_achievements
 
 def get_diary_response(text):
-    """Generates response based on keywords or random general."""
-    text_lower = text.lower()
-    for keyword, reply in EMOTION_RESPONSES.items(): 
-        if keyword in text_lower:
-            return reply
+    """Generates response based on the strongest emotion in the text, or random general."""
+    emotion = response_engine.top_emotion(text)
+    if emotion in EMOTION_RESPONSES:
+        return EMOTION_RESPONSES[emotion].format(joke=random.choice(CHEER_UP_JOKES))
     return random.choice(GENERAL_RESPONSES)
  
 def analyze_recent_mood_for_advice(diary):
     if not diary:
         return "👋 Time to start your first entry and unlock personalized advice!"
-    today = datetime.date.today()
-    one_week_ago = today - datetime.timedelta(days=7)
-    recent_scores = []
-    for date_str, entry in diary.items():
-        entry_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        if one_week_ago <= entry_date < today:
-            recent_scores.append(entry.get('score', 3))
-    if not recent_scores:
+    # (score, mood) for the 7 days before today, read straight from the running aggregates
+    recent_days = get_diary_stats(diary).recent_days(7)
+    if not recent_days:
         return "🤔 Need a week of data for personalized advice. Keep logging!"
-    df = pd.Series(recent_scores)
-    avg_score = df.mean()
+    avg_score = sum(score for score, _ in recent_days) / len(recent_days)
     if avg_score <= 2.5:
-        low_moods = [entry['mood'] for date_str, entry in diary.items() 
-                     if one_week_ago <= datetime.datetime.strptime(date_str, "%Y-%m-%d").date() < today and entry.get('score', 3) <= 2]
+        low_moods = [mood for score, mood in recent_days if score <= 2]
         if low_moods:
-            most_common_low_mood = pd.Series(low_moods).mode()[0]
+            # Same tie-break as pandas' mode(): the smallest of the most common values
+            most_common_low_mood = min(statistics.multimode(low_moods))
             if most_common_low_mood in ["😢", "😥"]:
                 return f"😥 Recent Mood Alert: You've often felt sad/anxious. **Challenge:** Try a 10-minute mindfulness exercise today."
             elif most_common_low_mood in ["😴"]:
@@ -516,13 +450,13 @@ def reset_mood_sprout():
     })
     
     st.toast("Mood Sprout has been reset to Seed! Potions remain the same.", icon="🌱") 
-    save_diary()
+    save_diary(durable=True)
 
 # -------------------- 3.5. PET GAME LOGIC (ADDED)
 # --------------------
 
 def handle_pet_interaction(action_type, prefix=""):
-    """Handles click events for pet interaction buttons in the dedicated page."""
+    """on_click callback of the pet interaction buttons (runs before the fragment reruns)."""
     
     # 使用專用的 session state key
     animal_id = st.session_state[prefix + 'pet_animal_id']
@@ -532,12 +466,24 @@ def handle_pet_interaction(action_type, prefix=""):
     message = random.choice(animal["responses"][action_type])
     
     st.session_state[prefix + 'pet_animal_message'] = message
-    
-    # Rerun to update the display
-    st.rerun()
+    if action_type == "feed":
+        st.toast(f"{animal['name']} is eating happily!", icon="🍎")
+ 
+def change_pet_mood(prefix=""):
+    """on_change callback of the mood radio: summons the matching companion."""
+    selected_mood = st.session_state[prefix + 'pet_mood_radio']
+    st.session_state[prefix + 'pet_mood_choice'] = selected_mood
+    st.session_state[prefix + 'pet_animal_id'] = PET_MOOD_CHOICES[selected_mood]
+    new_animal = ANIMAL_COMPANIONS[st.session_state[prefix + 'pet_animal_id']]
+    st.session_state[prefix + 'pet_animal_message'] = new_animal["initial_message"]
+    st.toast(f"You summoned the {new_animal['name']}!", icon="🎉")
 
+@st.fragment
 def render_pet_app_content(prefix=""):
-    """Renders the core pet interaction application components."""
+    """Renders the core pet interaction application components.
+
+    A fragment: choosing a mood or tapping/petting/feeding reruns only this region.
+    """
 
     # --- Pet Game State Initialization ---
     
@@ -553,23 +499,16 @@ def render_pet_app_content(prefix=""):
     # --- 1. Choose Today's Mood ---
     st.markdown("### ✅ Choose Your Current Mood:")
     
-    selected_mood = st.radio(
+    st.radio(
         "Select a mood to summon your companion:",
         options=list(PET_MOOD_CHOICES.keys()),
         index=list(PET_MOOD_CHOICES.keys()).index(st.session_state[prefix + 'pet_mood_choice']),
         key=prefix + 'pet_mood_radio',
-        horizontal=True
+        horizontal=True,
+        on_change=change_pet_mood,
+        args=(prefix,)
     )
 
-    # Check if selection changed, if so, update animal and message
-    if selected_mood != st.session_state[prefix + 'pet_mood_choice']:
-        st.session_state[prefix + 'pet_mood_choice'] = selected_mood
-        st.session_state[prefix + 'pet_animal_id'] = PET_MOOD_CHOICES[selected_mood]
-        new_animal = ANIMAL_COMPANIONS[st.session_state[prefix + 'pet_animal_id']]
-        st.session_state[prefix + 'pet_animal_message'] = new_animal["initial_message"]
-        st.toast(f"You summoned the {new_animal['name']}!", icon="🎉")
-        st.rerun()
-
     st.markdown("---")
     
     # --- 2. Display Animal and Response ---
@@ -584,10 +523,10 @@ def render_pet_app_content(prefix=""):
     col_art, col_response = st.columns([1, 2])
     
     with col_art:
-        # Load image using PIL
-        pet_image_pil = load_pet_image(animal_image_filename)
-        if pet_image_pil:
-            st.image(pet_image_pil, caption=f"Cute {current_animal['name']}", width=200)
+        # Load the medium-size variant of the image (cached bytes)
+        pet_image = load_pet_image(animal_image_filename)
+        if pet_image:
+            st.image(pet_image, caption=f"Cute {current_animal['name']}", width=200)
         else:
             # Fallback if image still fails to load
             st.error(f"⚠️ Could not load image '{animal_image_filename}'. Please ensure the file is in the root folder.")
@@ -612,18 +551,13 @@ solid #ffcc00; background-color: #fffacd;">
     
     col_tap, col_pet, col_feed = st.columns(3)
     
-    with col_tap:
-        if st.button("👆 Tap It", key=prefix + "pet_tap_btn", use_container_width=True):
-            handle_pet_interaction("tap", prefix)
-            
-    with col_pet:
-        if st.button("🥰 Pet It", key=prefix + "pet_pet_btn", use_container_width=True):
-            handle_pet_interaction("pet", prefix)
-            
-    with col_feed:
-        if st.button("🍎 Feed It", key=prefix + "pet_feed_btn", use_container_width=True):
-            handle_pet_interaction("feed", prefix)
-            st.toast(f"{current_animal['name']} is eating happily!", icon="🍎")
+    # Callbacks update the message before the fragment reruns, so no extra st.rerun()
+    col_tap.button("👆 Tap It", key=prefix + "pet_tap_btn", use_container_width=True,
+                   on_click=handle_pet_interaction, args=("tap", prefix))
+    col_pet.button("🥰 Pet It", key=prefix + "pet_pet_btn", use_container_width=True,
+                   on_click=handle_pet_interaction, args=("pet", prefix))
+    col_feed.button("🍎 Feed It", key=prefix + "pet_feed_btn", use_container_width=True,
+                    on_click=handle_pet_interaction, args=("feed", prefix))
 
 # -------------------- 4. INITIALIZATION --------------------
  
@@ -643,9 +577,8 @@ def initialize_session_state():
     if "total_points" not in st.session_state:
         st.session_state.total_points = 0
         
-    if "fortune_drawn" not in st.session_state:
-        st.session_state.fortune_drawn = False
-        st.session_state.fortune_result = None
+    if "fortune_drawn_on" not in st.session_state:
+        st.session_state.fortune_drawn_on = None
         
     # --- Mood Sprout Game State Initialization (using original key 'elf_state') ---
     if "elf_state" not in st.session_state:
@@ -664,112 +597,26 @@ def initialize_session_state():
         st.session_state.elf_state['last_potion_date'] = today_str
  
 initialize_session_state() 
+adopt_background_saves()
+ 
+@st.cache_resource
+def start_asset_warmup():
+    """Generates the downscaled image variants once per process, in the background."""
+    paths_by_variant = {
+        "thumb": list(POTION_MAPPING.values()),
+        "medium": list(PET_MAPPING.values()) + list(PET_IMAGE_PATHS.values()),
+    }
+    worker = threading.Thread(target=warm_asset_cache, args=(paths_by_variant,), daemon=True)
+    worker.start()
+    return worker
+ 
+start_asset_warmup()
  
 # -------------------- 5. STYLES 
 # --------------------
  
-FIXED_THEME_COLOR = "#c9b9a8" 
-FIXED_ACCENT_COLOR = "#4b3f37" 
- 
-st.markdown(f"""
-    <style>
-        /* Journal Pro Styles */
-        /* **修正：將背景設定為米白色，並移除所有圖片背景相關的 CSS** */
-        .stApp {{
-            background-color: {BACKGROUND_COLOR}; /* Linen 米白色 */
-        }}
-        
-        .title {{
-            text-align: center;
-            font-size: 36px;
-            font-weight: bold;
-            color: {FIXED_ACCENT_COLOR}; 
-            margin-bottom: 10px;
-        }}
-        .subtitle {{
-            text-align: center;
-            font-size: 18px;
-            color: #6d5f56;
-            margin-bottom: 25px;
-        }}
-        .fortune-result-box {{
-            padding: 20px;
-            border-radius: 15px;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.2);
-            text-align: center;
-            background-color: #fff8e1; /* Light yellow background */
-            margin-top: 20px;
-        }}
-        .fortune-level {{
-            font-size: 40px;
-            font-weight: bold;
-            color: {FIXED_ACCENT_COLOR};
-        }}
-        .fortune-emoji {{
-            font-size: 60px;
-            margin: 10px 0;
-        }}
-        .fortune-description {{
-            font-size: 18px;
-            font-style: italic;
-            color: #6d5f56;
-        }}
-        .shaking-container {{
-            text-align: center;
-            margin: 40px auto;
-            max-width: 300px;
-        }}
-        .shaking-icon {{
-            font-size: 100px;
-            display: inline-block;
-        }}
-        /* --- Mood Sprout Game Styles (Visual UI) --- */ 
-        @keyframes bounce {{
-            0%, 100% {{ transform: translateY(0); }}
-            50% {{ transform: translateY(-15px); }}
-        }}
- 
-        .plant-image-animated {{ 
-            animation: bounce 2s infinite ease-in-out;
-        }}
-        /* Potion and Pet Display Styles */
-        .potion-item {{ 
-            display: flex; 
-            align-items: center; 
-            margin-bottom: 10px;
-            gap: 10px; 
-        }}
-        .potion-img {{
-            width: 30px; 
-            height: 30px;
-            object-fit: contain;
-        }}
-        .potion-item > div:last-child {{
-            flex-grow: 1; 
-        }}
-        /* NEW: Achievement styles */
-        .achievement-icon-gold {{
-            font-size: 2em;
-            color: gold; 
-            margin-right: 10px;
-        }}
-        .achievement-icon-grey {{
-            font-size: 2em;
-            color: #9e9e9e; 
-            margin-right: 10px;
-        }}
-        /* Custom styles for the new Pet Partner Button in action_page */
-        .stButton button[key*="pet_partner_btn_action"] {{
-            /* 修正 NameError: 確保所有 CSS 語法正確 */
-            border: 2px solid #ff69b4; /* Pink border */
-            color: #ff69b4;
-            font-weight: bold;
-        }}
-        .stButton button[key*="pet_partner_btn_action"]:hover {{
-            background-color: #ffe4e1; /* Light pink hover */
-        }}
-    </style>
-""", unsafe_allow_html=True)
+# APP_CSS is formatted once per process in journal_content.py
+st.markdown(APP_CSS, unsafe_allow_html=True)
  
  
 # -------------------- 6. PAGE FUNCTIONS 
@@ -785,68 +632,64 @@ def render_onboarding_page():
         if st.button("Start Journaling 🚀", use_container_width=True):
             if name:
                 st.session_state.user_name = name.strip()
-                load_diary(st.session_state.user_name)
+                load_diary(st.session_state.user_name, windowed=True)
                 st.session_state.page = "fortune_draw"
                 st.rerun() 
             else:
                 st.warning("Please enter your name to proceed.")
  
  
+def draw_fortune():
+    """on_click callback of the draw button: a schedule lookup, nothing to wait for."""
+    st.session_state.fortune_drawn_on = datetime.date.today().strftime("%Y-%m-%d")
+    st.session_state.fortune_just_drawn = True
+    save_diary()
+ 
 def render_fortune_draw_page():
     user = st.session_state.user_name
     st.markdown(f"<div class='title'>⛩️ Daily Fortune Draw</div>", unsafe_allow_html=True)
     st.markdown(f"<div class='subtitle'>Welcome back, {user}! Draw your fortune to guide your day.</div>", unsafe_allow_html=True)
     
-    draw_container = st.empty()
+    fortune = get_todays_fortune()
     
-    if not st.session_state.fortune_drawn:
-        draw_container.markdown(
+    if fortune is None:
+        # The shaking is a CSS animation in the browser; the server only sends this once
+        st.markdown(
             f"<div class='shaking-container'><div class='shaking-icon'>🎋</div></div>",
             unsafe_allow_html=True
         )
+        st.button("🥠 Draw Your Destiny! (Daily Draw)", use_container_width=True, on_click=draw_fortune)
         
-        if st.button("🥠 Draw Your Destiny! (Daily Draw)", use_container_width=True):
-            for i in range(5):
-                icon = "🎍" if i % 2 == 0 else "🎋"
-                draw_container.markdown(
-                    f"<div class='shaking-container'><div class='shaking-icon'>{icon}</div></div>", 
-                    unsafe_allow_html=True
-                )
-                time.sleep(0.05) 
- 
-            fortune = random.choice(FORTUNE_SLIPS)
-            st.session_state.fortune_result = fortune
-            st.session_state.fortune_drawn = True
-            save_diary()
-            st.balloons()
-            st.rerun() 
-        
-    
-    if st.session_state.fortune_drawn and st.session_state.fortune_result:
-        level, emoji, description = st.session_state.fortune_result
+    else:
+        level, emoji, description = fortune
         
-        draw_container.empty()
+        # Right after the draw: the stick shakes out and the slip is revealed, all client-side
+        reveal = ""
+        if st.session_state.pop("fortune_just_drawn", False):
+            reveal = " fortune-reveal"
+            st.markdown(
+                f"<div class='shaking-container fortune-drawn'><div class='shaking-icon'>🎍</div></div>",
+                unsafe_allow_html=True
+            )
+            st.balloons()
         
         st.markdown("---")
         st.markdown(f"### ✨ Your Daily Guidance for {datetime.date.today().strftime('%Y-%m-%d')}")
         
-        st.markdown("<div class='fortune-result-box'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='fortune-level'>{level}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='fortune-emoji'>{emoji}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='fortune-description'>{description}</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown(
+            f"<div class='fortune-result-box{reveal}'>"
+            f"<div class='fortune-level'>{level}</div>"
+            f"<div class='fortune-emoji'>{emoji}</div>"
+            f"<div class='fortune-description'>{description}</div>"
+            f"</div>",
+            unsafe_allow_html=True
+        )
         
         st.markdown("---")
         if st.button("Start Journaling for Today 📝", use_container_width=True):
             st.session_state.page = "date"
             st.rerun()
  
-    elif st.session_state.fortune_drawn:
-        st.info("You have already drawn your fortune for today. Please start journaling!")
-        if st.button("Go to Journal 📝", use_container_width=True):
-            st.session_state.page = "date"
-            st.rerun()
- 
  
 def render_date_page():
     user = st.session_state.user_name
@@ -856,8 +699,9 @@ def render_date_page():
     st.markdown(f"<div class='title'>🌸 Hi, {user}!</div>", unsafe_allow_html=True)
     st.markdown(f"<div class='subtitle'>🔥 **Streak:** {current_streak} days | ⭐ **Mood Points:** {points} | Select a date to begin your entry.</div>", unsafe_allow_html=True)
     
-    if st.session_state.fortune_result:
-        level, emoji, _ = st.session_state.fortune_result
+    fortune = get_todays_fortune()
+    if fortune:
+        level, emoji, _ = fortune
         st.success(f"🔮 Today's Fortune: **{level} {emoji}** - Use this guidance for your entry!")
  
     advice = analyze_recent_mood_for_advice(st.session_state.diary)
@@ -866,6 +710,7 @@ def render_date_page():
     st.markdown("---")
     selected_date = st.date_input("📅 Choose a date:", value=st.session_state.selected_date, key="date_picker")
     st.session_state.selected_date = selected_date
+    load_older_entries(selected_date) # an older date's entry is shown and edited from here on
     st.markdown("---")
     
     # ************ 根據需求 1 調整：只保留 Next/Edit Mood 按鈕 ************
@@ -945,14 +790,13 @@ def render_journal_page():
             reward_points = POINTS_PER_ENTRY
             st.session_state.total_points += reward_points
             
-        st.session_state.diary[date_key] = {
+        save_diary_entry(date_key, {
             "mood": mood_icon, 
             "text": diary_text, 
             "response": response,
             "score": MOOD_SCORES.get(mood_icon, 3),
             "tags": selected_tags
-        }
-        save_diary()
+        })
         
         st.session_state.page = "action_page"
         st.session_state.last_response = response
@@ -1014,6 +858,12 @@ def render_action_page():
         st.rerun()
         
     st.markdown("---")
+    if st.button("🔍 Search My Journal", key="search_btn_action", use_container_width=True):
+        st.session_state.page = "search"
+        st.rerun()
+    if st.button("📦 Export / Import Entries", key="transfer_btn_action", use_container_width=True):
+        st.session_state.page = "data_transfer"
+        st.rerun()
     # **保留一個開始新日誌的按鈕，導向 date 頁面 (用於開始新一天的日誌)**
     if st.button("📝 Start New Entry (Select Another Date)", key="new_entry_btn_bottom", use_container_width=True):
         st.session_state.selected_date = datetime.date.today()
@@ -1022,6 +872,12 @@ def render_action_page():
         st.rerun()
  
  
+def shift_calendar_month(step):
+    """on_click callback of the month navigation buttons."""
+    month_index = st.session_state.cal_year * 12 + st.session_state.cal_month - 1 + step
+    st.session_state.cal_year, month_zero_based = divmod(month_index, 12)
+    st.session_state.cal_month = month_zero_based + 1
+ 
 def render_calendar_page():
     st.markdown("<div class='title'>📆 Monthly Mood Calendar</div>", unsafe_allow_html=True)
     
@@ -1031,62 +887,166 @@ def render_calendar_page():
     if 'cal_month' not in st.session_state:
         st.session_state.cal_month = today.month
         
+    render_month_calendar()
+ 
+    st.markdown("---")
+    if st.button("🟩 View Year in Pixels", use_container_width=True):
+        st.session_state.page = "year_pixels"
+        st.rerun()
+    if st.button("🔍 Search Entries", key="search_btn_calendar", use_container_width=True):
+        st.session_state.page = "search"
+        st.rerun()
+    # ************ 根據需求 2 調整：返回到 action_page ************
+    if st.button("⬅ Back to Action Page"):
+        st.session_state.page = "action_page"
+        st.rerun()
+ 
+ 
+@st.fragment
+def render_month_calendar():
+    """Month navigation and grid; paging months reruns only this fragment."""
+    today = datetime.date.today()
+    
     # Month/Year Navigation
     col_prev, col_current, col_next = st.columns([1, 2, 1])
-    if col_prev.button("⬅ Previous Month", use_container_width=True):
-        st.session_state.cal_month -= 1
-        if st.session_state.cal_month < 1:
-            st.session_state.cal_month = 12
-            st.session_state.cal_year -= 1
+    col_prev.button("⬅ Previous Month", use_container_width=True, on_click=shift_calendar_month, args=(-1,))
+    col_next.button("Next Month ➡", use_container_width=True, on_click=shift_calendar_month, args=(1,))
+    col_current.markdown(f"<h3 style='text-align: center;'>{calendar.month_name[st.session_state.cal_month]} {st.session_state.cal_year}</h3>", unsafe_allow_html=True)
+ 
+    load_older_entries(month_grid_range(st.session_state.cal_year, st.session_state.cal_month)[0])
+    # Whole month grid as one prebuilt HTML block, cached until an entry in this month changes
+    calendar_html = get_month_view(
+        st.session_state.user_name, st.session_state.cal_year, st.session_state.cal_month,
+        get_diary_stats(), today, FIXED_ACCENT_COLOR
+    )
+    st.markdown(calendar_html, unsafe_allow_html=True)
+ 
+ 
+def render_year_pixels_page():
+    st.markdown("<div class='title'>🟩 Year in Pixels</div>", unsafe_allow_html=True)
+    st.markdown("<div class='subtitle'>Every day of the year, colored by your mood score.</div>", unsafe_allow_html=True)
+    
+    load_older_entries()
+    stats = get_diary_stats()
+    logged_years = stats.logged_years()
+    this_year = datetime.date.today().year
+    
+    if logged_years is None:
+        st.info("Start journaling to fill in your first pixels!")
+    else:
+        first_year = min(logged_years[0], this_year)
+        last_year = max(logged_years[1], this_year)
+        if first_year < last_year:
+            start_year, end_year = st.slider(
+                "Years to show:", min_value=first_year, max_value=last_year,
+                value=(max(first_year, last_year - 1), last_year), key="pixel_years"
+            )
+        else:
+            start_year, end_year = first_year, last_year
+        
+        # One heatmap drawn from the per-year aggregate grids (updated in place on each save)
+        with profiler.span("year_pixels_figure", kind="plotly"):
+            fig = year_pixels_figure(stats, list(range(start_year, end_year + 1)))
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption("Grey = no entry · red → green = mood score 1 → 5")
+    
+    st.markdown("---")
+    if st.button("📆 Back to Monthly Calendar", use_container_width=True):
+        st.session_state.page = "calendar"
         st.rerun()
-    if col_next.button("Next Month ➡", use_container_width=True):
-        st.session_state.cal_month += 1
-        if st.session_state.cal_month > 12:
-            st.session_state.cal_month = 1
-            st.session_state.cal_year += 1
+    if st.button("⬅ Back to Action Page", key="back_from_pixels"):
+        st.session_state.page = "action_page"
         st.rerun()
-    col_current.markdown(f"<h3 style='text-align: center;'>{calendar.month_name[st.session_state.cal_month]} {st.session_state.cal_year}</h3>", unsafe_allow_html=True)
  
-    # Days of the week header
-    day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    cols_header = st.columns(7)
-    for i, day in enumerate(day_names):
-        cols_header[i].markdown(f"**<div style='text-align: center; color: {FIXED_ACCENT_COLOR};'>{day}</div>**", unsafe_allow_html=True)
- 
-    # Date cells
-    cal = calendar.Calendar()
-    month_data = cal.monthdatescalendar(st.session_state.cal_year, st.session_state.cal_month)
-    
-    for week in month_data:
-        cols_week = st.columns(7)
-        for i, date in enumerate(week):
-            date_key = date.strftime("%Y-%m-%d")
-            entry = st.session_state.diary.get(date_key)
-            
-            mood_emoji = entry.get("mood", "📝") if entry else ""
-            mood_tip = f"Entry: {date_key}\nMood: {mood_emoji}\nTags: {', '.join(entry.get('tags', []))}" if entry else f"No entry for {date_key}"
-            
-            # Formatting for dates outside the current month
-            is_current_month = date.month == st.session_state.cal_month
-            date_color = FIXED_ACCENT_COLOR if is_current_month else "#aaa"
-            
-            date_display = date.day
-            
-            # Highlight today's date
-            if date == today:
-                date_display = f"**{date.day}**"
-                date_color = "green"
-            
-            content = f"<div style='text-align: center; color: {date_color}; padding: 5px; border-radius: 5px; border: 1px solid {'#ddd' if is_current_month else 'transparent'};'>"
-            content += f"<span title='{mood_tip}'>{date_display}</span><br/>"
-            content += f"<span style='font-size: 20px;'>{mood_emoji}</span>"
-            content += "</div>"
  
-            cols_week[i].markdown(content, unsafe_allow_html=True)
+def render_search_page():
+    st.markdown("<div class='title'>🔍 Search Your Journal</div>", unsafe_allow_html=True)
+    st.markdown("<div class='subtitle'>Find old entries by words, mood, activity or date.</div>", unsafe_allow_html=True)
+    load_older_entries()
+    
+    query = st.text_input("Search words (partial words work too):", key="search_query")
+    col1, col2 = st.columns(2)
+    moods = col1.multiselect("Mood:", options=MOOD_EMOJIS, key="search_moods")
+    tags = col2.multiselect("Activities (all of):", options=ACTIVITY_TAGS, key="search_tags")
+    date_range = st.date_input("Date range (optional):", value=(), key="search_date_range")
+    range_start, range_end = (list(date_range) + [None, None])[:2]
+    
+    total, date_keys = get_search_index().search(
+        query, moods=moods, tags=tags, start_date=range_start, end_date=range_end or range_start
+    )
+    if not (query.strip() or moods or tags or range_start):
+        st.caption(f"{len(st.session_state.diary)} entries in your journal. Showing the latest ones.")
+    elif total == 0:
+        st.info("No entries match your search.")
+    else:
+        st.success(f"Found **{total}** matching entries" + (f" (showing the latest {len(date_keys)})" if total > len(date_keys) else "") + ".")
+    
+    for date_key in date_keys:
+        entry = st.session_state.diary.get(date_key, {})
+        text = entry.get("text", "")
+        snippet = text if len(text) <= 200 else text[:200] + "…"
+        tags_str = ", ".join(entry.get("tags", []))
+        col_text, col_open = st.columns([5, 1])
+        col_text.markdown(f"**{date_key}** {entry.get('mood', '')}" + (f" · *{tags_str}*" if tags_str else "") + f"  \n{snippet}")
+        if col_open.button("✏️ Open", key=f"search_open_{date_key}"):
+            st.session_state.selected_date = datetime.date.fromisoformat(date_key)
+            st.session_state.selected_mood_emoji = entry.get("mood")
+            st.session_state.page = "journal"
+            st.rerun()
+    
+    st.markdown("---")
+    if st.button("⬅ Back to Action Page", key="back_from_search"):
+        st.session_state.page = "action_page"
+        st.rerun()
  
+ 
+def render_data_transfer_page():
+    user = st.session_state.user_name
+    st.markdown("<div class='title'>📦 Export / Import Entries</div>", unsafe_allow_html=True)
+    st.markdown("<div class='subtitle'>Back up your journal or bring in entries from another diary.</div>", unsafe_allow_html=True)
+    
+    # --- Export: streamed from the store into a temp file in chunks ---
+    # (the browser download is still sent in one piece; the CLI streams straight to disk)
+    st.markdown("### ⬇️ Export")
+    export_format = st.radio("Format:", options=TRANSFER_FORMATS, horizontal=True, key="export_format")
+    if st.button("📦 Prepare Export", use_container_width=True):
+        with tempfile.TemporaryFile() as export_file:
+            try:
+                count = export_diary(get_store(), user, export_file, export_format)
+            except ImportError as e: # Parquet without pyarrow
+                st.error(str(e))
+                count = None
+            if count is not None:
+                export_file.seek(0)
+                st.download_button(
+                    f"💾 Download {count} entries ({export_format})", data=export_file.read(),
+                    file_name=f"mood_journal_{user.strip().lower().replace(' ', '_')}.{export_format}",
+                    mime=TRANSFER_MIME_TYPES[export_format], on_click="ignore", use_container_width=True
+                )
+    
     st.markdown("---")
-    # ************ 根據需求 2 調整：返回到 action_page ************
-    if st.button("⬅ Back to Action Page"):
+    
+    # --- Import: rows are validated and upserted in batches, then the diary is reloaded ---
+    st.markdown("### ⬆️ Import")
+    uploaded = st.file_uploader("NDJSON, CSV or Parquet file:", type=["ndjson", "jsonl", "csv", "parquet"], key="import_file")
+    strict = st.checkbox("Stop at the first invalid row", key="import_strict")
+    st.caption("Rows need a date, a mood and optionally tags, text and a score (which must be the mood's own score). An imported entry replaces the one on the same date.")
+    if uploaded is not None and st.button("⬆️ Import Entries", use_container_width=True):
+        try:
+            report = import_diary(get_store(), user, uploaded, detect_format(uploaded.name), strict=strict)
+        except DiaryImportError as e:
+            st.error(f"Import stopped: {e}")
+        except ImportError as e:
+            st.error(str(e))
+        else:
+            st.success(f"Imported **{report.imported}** entries." + (f" Skipped {report.skipped} invalid rows." if report.skipped else ""))
+            if report.errors:
+                with st.expander("Rows that were skipped"):
+                    st.markdown("\n".join(f"- {message}" for message in report.errors))
+        load_diary(user) # pick up the imported entries (and whatever was written before a strict stop)
+    
+    st.markdown("---")
+    if st.button("⬅ Back to Action Page", key="back_from_transfer"):
         st.session_state.page = "action_page"
         st.rerun()
  
@@ -1097,6 +1057,7 @@ def render_insight_page():
     st.markdown(f"<div class='title'>🔮 {user}'s Fun Mood Insights</div>", unsafe_allow_html=True)
     st.markdown("<div class='subtitle'>Analyze your mood trends and patterns.</div>", unsafe_allow_html=True)
     
+    load_older_entries()
     if not st.session_state.diary:
         st.warning("Please make at least one journal entry to view insights!")
         if st.button("⬅ Back to Action Page"): # **修改返回按鈕**
@@ -1104,18 +1065,17 @@ def render_insight_page():
             st.rerun()
         return
 
-    # Prepare DataFrame
-    diary_df = pd.DataFrame.from_dict(st.session_state.diary, orient='index')
-    diary_df.index.name = 'Date'
-    diary_df = diary_df.reset_index()
-    diary_df['Date'] = pd.to_datetime(diary_df['Date'])
-    diary_df = diary_df.sort_values(by='Date')
+    import pandas as pd
+    import plotly.express as px
+
+    # Columnar view of the diary (maintained alongside it, no per-rerun DataFrame)
+    columns = get_diary_stats().columns
 
     st.markdown("---")
     
     ## 1. Overall Metrics
     col_e, col_s, col_p = st.columns(3)
-    col_e.metric("Total Entries", len(diary_df))
+    col_e.metric("Total Entries", len(columns))
     col_s.metric("Current Streak", calculate_streak(st.session_state.diary))
     col_p.metric("Total Mood Points", st.session_state.total_points)
 
@@ -1123,59 +1083,66 @@ def render_insight_page():
     
     ## 2. Mood Trend Over Time
     st.markdown("### 📈 Mood Score Trend (Last 30 Days)")
-    if 'score' in diary_df.columns and 'Date' in diary_df.columns:
-        today = datetime.date.today()
-        thirty_days_ago = today - datetime.timedelta(days=30)
-        recent_df = diary_df[diary_df['Date'].dt.date >= thirty_days_ago].copy()
-        
-        if not recent_df.empty:
-            recent_df.rename(columns={'score': 'Mood Score'}, inplace=True)
-            
+    trend_dates, trend_scores = columns.score_trend(30)
+    
+    if len(trend_scores):
+        with profiler.span("mood_trend_figure", kind="plotly"):
             fig = px.line(
-                recent_df, 
-                x='Date', 
-                y='Mood Score',
+                x=trend_dates, 
+                y=trend_scores,
                 title='Mood Score Trend Over Past 30 Days',
-                labels={'Date': 'Date', 'Mood Score': 'Score'},
+                labels={'x': 'Date', 'y': 'Score'},
                 line_shape='spline',
             )
             fig.update_yaxes(range=[1, 5]) 
-            st.plotly_chart(fig, use_container_width=True)
-            
-            avg_score = recent_df['Mood Score'].mean()
-            st.info(f"💡 **Average Score (Past 30 Days):** {avg_score:.2f} / 5.0")
-        else:
-            st.info("Not enough data in the last 30 days to plot a trend.")
+        st.plotly_chart(fig, use_container_width=True)
+        
+        avg_score = trend_scores.mean()
+        st.info(f"💡 **Average Score (Past 30 Days):** {avg_score:.2f} / 5.0")
+    else:
+        st.info("Not enough data in the last 30 days to plot a trend.")
 
     st.markdown("---")
     
     ## 3. Top Activity Correlation
     st.markdown("### 💖 Activity Correlation & Frequency")
     
-    all_tags = []
-    tag_scores = {}
+    first_date = datetime.date.fromordinal(int(columns.ordinals[0]))
+    last_date = max(datetime.date.fromordinal(int(columns.ordinals[-1])), datetime.date.today())
+    date_range = st.date_input("📅 Analyze entries between:", value=(first_date, last_date), key="tag_date_range")
+    range_start, range_end = (list(date_range) + [None, None])[:2] # A range still being picked has one date
     
-    for _, row in diary_df.iterrows():
-        score = row.get('score', 3)
-        for tag in row.get('tags', []):
-            all_tags.append(tag)
-            tag_scores[tag] = tag_scores.get(tag, []) + [score]
+    # Counts, mean scores, lift and tag pairs from one vectorized pass over the tag bitmask column
+    tag_stats = compute_tag_stats(columns, range_start, range_end)
+    tag_rows = tag_table(tag_stats)
             
-    if all_tags:
-        # Calculate Average Score per Tag
-        avg_scores = {tag: sum(scores) / len(scores) for tag, scores in tag_scores.items()}
-        avg_df = pd.Series(avg_scores).sort_values(ascending=False).to_frame(name='Avg Mood Score')
+    if tag_rows:
+        combined_df = pd.DataFrame(
+            tag_rows, columns=["Activity Tag", "Frequency", "Avg Mood Score", "Lift vs Your Average"]
+        ).set_index("Activity Tag")
         
-        # Calculate Tag Frequency
-        tag_counts = pd.Series(all_tags).value_counts()
-        tag_freq_df = tag_counts.to_frame(name='Frequency')
-
-        # Combine for display
-        combined_df = avg_df.join(tag_freq_df, how='outer')
-        combined_df.index.name = "Activity Tag"
-        
-        st.info("Higher average scores suggest these activities are associated with better moods.")
+        st.info(f"Higher average scores suggest these activities are associated with better moods. Your average in this range is **{tag_stats['baseline']:.2f}**; a lift above 1.0 means better than usual.")
         st.dataframe(combined_df, use_container_width=True)
+        
+        pair_rows = tag_pair_table(tag_stats)
+        if pair_rows:
+            st.markdown("#### 🤝 Activity Combinations")
+            pair_df = pd.DataFrame(
+                pair_rows, columns=["Activity Pair", "Times Together", "Avg Mood Score", "Lift vs Your Average"]
+            ).set_index("Activity Pair")
+            st.dataframe(pair_df, use_container_width=True)
+        
+        with st.expander("Which activities happen together?"):
+            used = tag_stats["counts"] > 0
+            used_names = [tag for tag, is_used in zip(ACTIVITY_TAGS, used) if is_used]
+            with profiler.span("tag_cooccurrence_figure", kind="plotly"):
+                fig = px.imshow(
+                    tag_stats["cooccurrence"][used][:, used],
+                    x=used_names, y=used_names,
+                    labels={'color': 'Entries'},
+                    color_continuous_scale='Peach',
+                )
+            st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Start using **Activity Tags** in your entries to unlock correlation analysis!")
 
@@ -1232,6 +1199,17 @@ def render_mood_sprout_page():
     # --- Mood Sprout Game UI (Visual/Graphic) ---
     st.markdown("<div class='title'>🌱 Mood Sprout Game</div>", unsafe_allow_html=True) 
     
+    render_sprout_garden()
+        
+    st.markdown("---")
+    # ************ 根據需求 2 調整：返回到 action_page ************
+    if st.button("⬅ Back to Action Page", key="back_from_sprout"):
+        st.session_state.page = "action_page"
+        st.rerun()
+ 
+@st.fragment
+def render_sprout_garden():
+    """Sprout status, potion inventory and feeding buttons; feeding reruns only this fragment."""
     plant_state = st.session_state.elf_state
     
     # Get current sprout status and image
@@ -1239,7 +1217,7 @@ def render_mood_sprout_page():
     image_path = PET_MAPPING.get(evolution_type, PET_MAPPING["Seed"]) 
     
     # Load image for display
-    plant_image_pil = load_pet_image(image_path)
+    plant_image = load_pet_image(image_path)
     
     # Progress Display 
     if SPROUT_EVOLUTION_THRESHOLD > 0:
@@ -1264,21 +1242,19 @@ def render_mood_sprout_page():
             st.markdown(f"**Status: Evolved {evolution_type}**")
             caption_text = f"Max Feed Type: {evolution_type}"
             
-        if plant_image_pil:
+        if plant_image:
             if evolution_type == "Seed": 
-                st.image(plant_image_pil, use_container_width=True, caption=caption_text)
+                st.image(plant_image, use_container_width=True, caption=caption_text)
             else:
                 st.markdown(f'<div class="plant-image-animated">', unsafe_allow_html=True)
-                st.image(plant_image_pil, use_container_width=True, caption=caption_text)
+                st.image(plant_image, use_container_width=True, caption=caption_text)
                 st.markdown(f'</div>', unsafe_allow_html=True)
         else:
             st.warning(f"Image not found at: {image_path}")
             
         # Reset Button
         st.markdown("---")
-        if st.button("♻ Reset Sprout to Seed", key="reset_sprout", use_container_width=True): 
-            reset_mood_sprout() 
-            st.rerun()
+        st.button("♻ Reset Sprout to Seed", key="reset_sprout", use_container_width=True, on_click=reset_mood_sprout)
     
     # --- Right Potion Inventory ---
     with col_status:
@@ -1290,6 +1266,7 @@ def render_mood_sprout_page():
             "Stock": [plant_state['available_potions'][e] for e in POTION_MAPPING.keys()],
             "Times Fed": [plant_state['emotion_counts'][e] for e in POTION_MAPPING.keys()],
         }
+        import pandas as pd
         potion_df = pd.DataFrame(potion_data)
         # Remove index column
         st.table(potion_df.set_index('Potion Type'))
@@ -1314,20 +1291,19 @@ def render_mood_sprout_page():
                 col_img_btn, col_txt_btn = st.columns([1, 4]) 
                 
                 with col_img_btn:
-                    potion_image_pil = load_pet_image(potion_path) 
-                    if potion_image_pil:
-                        st.image(potion_image_pil, use_container_width=True) 
+                    potion_image = load_pet_image(potion_path, variant="thumb") 
+                    if potion_image:
+                        st.image(potion_image, use_container_width=True) 
                         
                 with col_txt_btn:
                     # **Keep button text complete (Feed... in stock)**
                     button_label = f"Feed {display_name} Potion ({count} in stock)"
                     
-                    if st.button(button_label, 
-                                 key=f"feed_btn_{emotion_name}", 
-                                 use_container_width=True, 
-                                 disabled=plant_state['evolved'] or count == 0):
-                        feed_mood_sprout(emotion_name)
-                        st.rerun()
+                    st.button(button_label, 
+                              key=f"feed_btn_{emotion_name}", 
+                              use_container_width=True, 
+                              disabled=plant_state['evolved'] or count == 0,
+                              on_click=feed_mood_sprout, args=(emotion_name,))
                         
     st.markdown("---")
     
@@ -1338,12 +1314,6 @@ def render_mood_sprout_page():
         st.info(f"Keep feeding! You need **{SPROUT_EVOLUTION_THRESHOLD - plant_state['total_feeds']}** more feeds to see your sprout grow.")
     else:
         st.info("Start logging your mood to earn potions, then feed your Mood Sprout to make it grow!")
-        
-    st.markdown("---")
-    # ************ 根據需求 2 調整：返回到 action_page ************
-    if st.button("⬅ Back to Action Page", key="back_from_sprout"):
-        st.session_state.page = "action_page"
-        st.rerun()
 
 # --- NEW PET GAME PAGE FUNCTION ---
 def render_healing_pet_partner_page():
@@ -1360,28 +1330,74 @@ def render_healing_pet_partner_page():
         st.session_state.page = "action_page"
         st.rerun()
  
+def render_profiler_sidebar():
+    """Debug sidebar (MOOD_JOURNAL_PROFILE=1): per-function totals, recent calls and dumps."""
+    with st.sidebar:
+        st.markdown("### ⏱️ Hot-Path Timings")
+        st.caption("Wall time, calls, bytes written and cache hits for this server process.")
+        totals = profiler.summary()
+        if totals:
+            st.dataframe(
+                totals, use_container_width=True, hide_index=True,
+                column_order=("kind", "name", "calls", "mean_ms", "max_ms", "total_ms", "bytes_written", "cache_hits", "cache_misses"),
+            )
+            with st.expander("Recent calls"):
+                st.dataframe(profiler.events()[::-1][:50], use_container_width=True, hide_index=True)
+        else:
+            st.info("No timed calls yet.")
+
+        saves = save_queue.stats()
+        st.markdown("#### 💾 Background Saves")
+        col_queued, col_written, col_coalesced = st.columns(3)
+        col_queued.metric("Queued", saves["submitted"])
+        col_written.metric("Written", saves["writes"])
+        col_coalesced.metric("Coalesced", saves["coalesced"])
+        st.caption(f"{saves['pending']} pending, {saves['failures']} failed writes.")
+        if saves["last_error"]:
+            st.warning(f"Last save error: {saves['last_error']}")
+
+        dump_format = st.radio("Dump format:", ("json", "csv"), horizontal=True, key="profile_dump_format")
+        col_dump, col_clear = st.columns(2)
+        if col_dump.button("💾 Dump to File", use_container_width=True):
+            path = os.path.join(PROFILE_DUMP_DIR, f"profile_{datetime.datetime.now():%Y%m%d_%H%M%S}.{dump_format}")
+            st.success(f"Saved {profiler.dump_to_file(path, dump_format)}")
+        if col_clear.button("🧹 Clear", use_container_width=True):
+            profiler.clear()
+            st.rerun()
+ 
 # -------------------- 7. PAGE NAVIGATION --------------------
  
-if st.session_state.page == "onboarding":
-    render_onboarding_page()
-elif st.session_state.page == "fortune_draw":
-    render_fortune_draw_page()
-elif st.session_state.page == "date":
-    render_date_page()
-elif st.session_state.page == "mood":
-    render_mood_page()
-elif st.session_state.page == "journal":
-    render_journal_page()
-elif st.session_state.page == "action_page":
-    render_action_page()
-elif st.session_state.page == "calendar":
-    render_calendar_page()
-elif st.session_state.page == "insight":
-    render_insight_page() 
-elif st.session_state.page == "mood_sprout": 
-    render_mood_sprout_page()
-elif st.session_state.page == "rewards":
-    render_rewards_page()
-# ************ 新增的頁面導航 ************
-elif st.session_state.page == "healing_pet_partner":
-    render_healing_pet_partner_page()
\ No newline at end of file
+# Each page run is one "page" event when MOOD_JOURNAL_PROFILE=1
+with profiler.span(st.session_state.page, kind="page"):
+    if st.session_state.page == "onboarding":
+        render_onboarding_page()
+    elif st.session_state.page == "fortune_draw":
+        render_fortune_draw_page()
+    elif st.session_state.page == "date":
+        render_date_page()
+    elif st.session_state.page == "mood":
+        render_mood_page()
+    elif st.session_state.page == "journal":
+        render_journal_page()
+    elif st.session_state.page == "action_page":
+        render_action_page()
+    elif st.session_state.page == "calendar":
+        render_calendar_page()
+    elif st.session_state.page == "year_pixels":
+        render_year_pixels_page()
+    elif st.session_state.page == "search":
+        render_search_page()
+    elif st.session_state.page == "data_transfer":
+        render_data_transfer_page()
+    elif st.session_state.page == "insight":
+        render_insight_page() 
+    elif st.session_state.page == "mood_sprout": 
+        render_mood_sprout_page()
+    elif st.session_state.page == "rewards":
+        render_rewards_page()
+    # ************ 新增的頁面導航 ************
+    elif st.session_state.page == "healing_pet_partner":
+        render_healing_pet_partner_page()
+
+if profiler.enabled:
+    render_profiler_sidebar()
\ No newline at end of file
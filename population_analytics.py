@@ -0,0 +1,314 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from diary_storage import get_diary_store
+from journal_content import ACTIVITY_TAGS, MOOD_EMOJIS, POTION_MAPPING
+from mood_analytics import ColumnarDiary
+from tag_analytics import TAG_COUNT, tag_matrix
+
+# -------------------- Cross-User Analytics Job
+# --------------------
+#
+# Scans every stored user with a process pool and writes population-level summary
+# tables. Workers get chunks of user keys, load each user through their own store,
+# fold it into a PopulationTotals of fixed-size arrays and drop it. The parent only
+# merges one small PopulationTotals per chunk. Work is independent per user, so
+# throughput grows with the number of worker processes until the disk is the limit.
+#
+#   python -m population_analytics --data-dir . --workers 8 --output-dir analytics
+
+POTION_EMOTIONS = list(POTION_MAPPING)
+# Streak histogram bins: [0], [1], [2], [3, 5), ... [365, inf)
+STREAK_BIN_EDGES = np.array([0, 1, 2, 3, 5, 7, 14, 30, 60, 100, 365])
+DEFAULT_CHUNK_SIZE = 256
+
+
+def streak_bin_labels():
+    labels = []
+    for low, high in zip(STREAK_BIN_EDGES, list(STREAK_BIN_EDGES[1:]) + [None]):
+        if high is None:
+            labels.append(f"{low}+")
+        elif high == low + 1:
+            labels.append(str(low))
+        else:
+            labels.append(f"{low}-{high - 1}")
+    return labels
+
+
+def run_lengths(ordinals):
+    """Lengths of the runs of consecutive days in sorted, unique date ordinals."""
+    if len(ordinals) == 0:
+        return np.zeros(0, dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(ordinals) != 1) + 1
+    bounds = np.concatenate(([0], breaks, [len(ordinals)]))
+    return np.diff(bounds)
+
+
+class PopulationTotals:
+    """Mergeable population aggregates; fixed size however many users are added."""
+
+    def __init__(self):
+        self.users = 0
+        self.users_with_entries = 0
+        self.entries = 0
+        self.score_sum = 0.0
+        self.mood_counts = np.zeros(len(MOOD_EMOJIS) + 1, dtype=np.int64) # last slot = unknown mood
+        self.mood_users = np.zeros(len(MOOD_EMOJIS) + 1, dtype=np.int64)
+        self.tag_counts = np.zeros(TAG_COUNT, dtype=np.int64)
+        self.tag_users = np.zeros(TAG_COUNT, dtype=np.int64)
+        self.tag_score_sums = np.zeros(TAG_COUNT)
+        # Score minus the user's own mean score, summed over entries with the tag
+        self.tag_delta_sums = np.zeros(TAG_COUNT)
+        self.current_streaks = np.zeros(len(STREAK_BIN_EDGES), dtype=np.int64)
+        self.longest_streaks = np.zeros(len(STREAK_BIN_EDGES), dtype=np.int64)
+        self.potions_available = np.zeros(len(POTION_EMOTIONS), dtype=np.int64)
+        self.potions_out_of_stock = np.zeros(len(POTION_EMOTIONS), dtype=np.int64)
+        self.potions_fed = np.zeros(len(POTION_EMOTIONS), dtype=np.int64)
+        self.daily_potion_counts = np.zeros(1, dtype=np.int64) # index = potions granted on the as-of day
+        self.sprout_users = 0
+        self.sprouts_evolved = 0
+        self.total_points = 0
+        self.failed_users = 0
+
+    def add_user(self, data, as_of):
+        """Folds one user's document into the totals."""
+        self.users += 1
+        self.total_points += int(data.get("total_points") or 0)
+        columns = ColumnarDiary(data.get("diary") or {})
+        if len(columns):
+            self._add_entries(columns, as_of)
+        else:
+            self.current_streaks[0] += 1
+            self.longest_streaks[0] += 1
+        self._add_sprout(data.get("elf_state"), as_of)
+
+    def _add_entries(self, columns, as_of):
+        self.users_with_entries += 1
+        self.entries += len(columns)
+        scores = columns.scores.astype(np.float64)
+        self.score_sum += scores.sum()
+
+        # np.int8 mood -1 (unknown) lands in the last slot
+        moods = np.bincount(columns.moods.astype(np.int64) % len(self.mood_counts), minlength=len(self.mood_counts))
+        self.mood_counts += moods
+        self.mood_users += moods > 0
+
+        bits = tag_matrix(columns.tags)
+        tag_counts = bits.sum(axis=0)
+        self.tag_counts += tag_counts
+        self.tag_users += tag_counts > 0
+        self.tag_score_sums += bits.T @ scores
+        self.tag_delta_sums += bits.T @ (scores - scores.mean())
+
+        ordinals = columns.ordinals
+        runs = run_lengths(ordinals)
+        self.longest_streaks[np.searchsorted(STREAK_BIN_EDGES, runs.max(), side="right") - 1] += 1
+        # Current streak as the app counts it: the run through the as-of day, or through
+        # the day before if the as-of day is not logged yet
+        today = as_of.toordinal()
+        last = int(np.searchsorted(ordinals, today, side="right")) - 1 # row of the last day <= as-of
+        current = 0
+        if last >= 0 and ordinals[last] >= today - 1:
+            ends = np.cumsum(runs)
+            run = int(np.searchsorted(ends, last, side="right"))
+            current = last - int(ends[run] - runs[run]) + 1
+        self.current_streaks[np.searchsorted(STREAK_BIN_EDGES, current, side="right") - 1] += 1
+
+    def _add_sprout(self, elf_state, as_of):
+        if not isinstance(elf_state, dict):
+            return
+        self.sprout_users += 1
+        self.sprouts_evolved += bool(elf_state.get("evolved"))
+        available = elf_state.get("available_potions") or {}
+        fed = elf_state.get("emotion_counts") or {}
+        for i, emotion in enumerate(POTION_EMOTIONS):
+            count = int(available.get(emotion) or 0)
+            self.potions_available[i] += count
+            self.potions_out_of_stock[i] += count == 0
+            self.potions_fed[i] += int(fed.get(emotion) or 0)
+        # The stored daily count only applies on the day it was recorded
+        daily = int(elf_state.get("daily_potion_count") or 0) if elf_state.get("last_potion_date") == as_of.isoformat() else 0
+        if daily >= len(self.daily_potion_counts):
+            self.daily_potion_counts = np.pad(self.daily_potion_counts, (0, daily + 1 - len(self.daily_potion_counts)))
+        self.daily_potion_counts[daily] += 1
+
+    def merge(self, other):
+        """Adds another PopulationTotals (e.g. one worker chunk's) into this one."""
+        size = max(len(self.daily_potion_counts), len(other.daily_potion_counts))
+        daily = np.pad(self.daily_potion_counts, (0, size - len(self.daily_potion_counts)))
+        daily += np.pad(other.daily_potion_counts, (0, size - len(other.daily_potion_counts)))
+        for name, value in vars(other).items():
+            if name != "daily_potion_counts":
+                setattr(self, name, getattr(self, name) + value)
+        self.daily_potion_counts = daily
+        return self
+
+    # --- Summary tables: (header, rows) ---
+
+    def mood_distribution(self):
+        labels = MOOD_EMOJIS + ["(unknown)"]
+        total = max(self.entries, 1)
+        rows = [
+            (label, int(count), round(count / total, 4), int(users))
+            for label, count, users in zip(labels, self.mood_counts, self.mood_users)
+            if count or label != "(unknown)"
+        ]
+        return ("mood", "entries", "share", "users"), rows
+
+    def tag_effectiveness(self):
+        baseline = self.score_sum / self.entries if self.entries else float("nan")
+        rows = []
+        for i, tag in enumerate(ACTIVITY_TAGS):
+            count = int(self.tag_counts[i])
+            mean = self.tag_score_sums[i] / count if count else float("nan")
+            rows.append((
+                tag, count, int(self.tag_users[i]), round(mean, 3), round(mean / baseline, 3),
+                # within-user effect: how much better than their own average users feel with the tag
+                round(self.tag_delta_sums[i] / count, 3) if count else float("nan"),
+            ))
+        rows.sort(key=lambda row: -row[1])
+        return ("tag", "entries", "users", "mean_score", "lift", "within_user_delta"), rows
+
+    def streak_histogram(self):
+        rows = [
+            (label, int(current), int(longest))
+            for label, current, longest in zip(streak_bin_labels(), self.current_streaks, self.longest_streaks)
+        ]
+        return ("streak_days", "users_current", "users_longest"), rows
+
+    def potion_economy(self):
+        users = max(self.sprout_users, 1)
+        rows = [
+            (emotion, int(self.potions_available[i]), round(self.potions_available[i] / users, 2),
+             int(self.potions_out_of_stock[i]), int(self.potions_fed[i]))
+            for i, emotion in enumerate(POTION_EMOTIONS)
+        ]
+        return ("potion", "available", "available_per_user", "users_out_of_stock", "fed"), rows
+
+    def daily_potion_table(self):
+        return ("potions_granted_today", "users"), [(i, int(n)) for i, n in enumerate(self.daily_potion_counts)]
+
+    def summary(self):
+        return {
+            "users": self.users, "users_with_entries": self.users_with_entries, "entries": self.entries,
+            "mean_entries_per_user": round(self.entries / self.users, 2) if self.users else 0,
+            "mean_score": round(self.score_sum / self.entries, 3) if self.entries else None,
+            "sprout_users": self.sprout_users, "sprouts_evolved": self.sprouts_evolved,
+            "total_points": self.total_points, "failed_users": self.failed_users,
+        }
+
+
+# --- Worker side ---
+
+_worker_store = None
+
+
+def _init_worker(kind, data_dir):
+    global _worker_store
+    _worker_store = get_diary_store(kind, data_dir)
+
+
+def scan_users(user_keys, as_of, store=None):
+    """PopulationTotals for a chunk of users (runs inside a worker process)."""
+    store = store or _worker_store
+    totals = PopulationTotals()
+    for user_key in user_keys:
+        try:
+            data = store.load(user_key)
+        except (OSError, ValueError): # unreadable, or not a diary document (DiaryFormatError)
+            totals.failed_users += 1
+            continue
+        finally:
+            store.evict(user_key)
+        if data is None:
+            continue
+        if not isinstance(data, dict) or not isinstance(data.get("diary") or {}, dict):
+            totals.failed_users += 1
+            continue
+        # Folded on its own first, so a bad value halfway through leaves `totals` untouched
+        user_totals = PopulationTotals()
+        try:
+            user_totals.add_user(data, as_of)
+        except (TypeError, ValueError): # e.g. a date key that is not YYYY-MM-DD, a non-numeric score
+            totals.failed_users += 1
+            continue
+        totals.merge(user_totals)
+    return totals
+
+
+def run_job(kind=None, data_dir=".", workers=None, chunk_size=DEFAULT_CHUNK_SIZE, as_of=None):
+    """Scans every stored user; returns the merged PopulationTotals."""
+    as_of = as_of or datetime.date.today()
+    users = get_diary_store(kind, data_dir).list_users()
+    chunks = [users[i:i + chunk_size] for i in range(0, len(users), chunk_size)]
+    totals = PopulationTotals()
+    if workers == 1:
+        _init_worker(kind, data_dir)
+        for chunk in chunks:
+            totals.merge(scan_users(chunk, as_of))
+        return totals
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(kind, data_dir)) as pool:
+        for chunk_totals in pool.map(scan_users, chunks, [as_of] * len(chunks)):
+            totals.merge(chunk_totals)
+    return totals
+
+
+def write_tables(totals, output_dir):
+    """Writes the summary tables as small CSV files plus summary.json; returns their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    tables = {
+        "mood_distribution": totals.mood_distribution(),
+        "tag_effectiveness": totals.tag_effectiveness(),
+        "streak_histogram": totals.streak_histogram(),
+        "potion_economy": totals.potion_economy(),
+        "daily_potions": totals.daily_potion_table(),
+    }
+    paths = []
+    for name, (header, rows) in tables.items():
+        path = os.path.join(output_dir, f"{name}.csv")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        paths.append(path)
+    path = os.path.join(output_dir, "summary.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(totals.summary(), f, indent=2)
+    paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Population-level mood, tag, streak and potion statistics over all users.")
+    parser.add_argument("--storage", choices=("json", "log", "sqlite", "snapshot", "mapped"), help="backend (default: $MOOD_JOURNAL_STORAGE or json)")
+    parser.add_argument("--data-dir", default=".", help="directory holding the diary files (or the SQLite database)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (1 = scan in this process)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="users per worker task")
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, help="date for current streaks and daily potions (default: today)")
+    parser.add_argument("--output-dir", default="analytics")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    totals = run_job(args.storage, args.data_dir, args.workers, args.chunk_size, args.as_of)
+    elapsed = time.perf_counter() - start
+    paths = write_tables(totals, args.output_dir)
+    print(
+        f"Scanned {totals.users} users ({totals.entries} entries) in {elapsed:.1f} s "
+        f"with {args.workers} workers: {totals.users / max(elapsed, 1e-9):.0f} users/s",
+        file=sys.stderr,
+    )
+    for path in paths:
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
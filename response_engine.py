@@ -0,0 +1,176 @@
+import re
+from collections import deque
+
+# -------------------- Diary Response Engine
+# --------------------
+#
+# Keyword and phrase lexicon -> one Aho-Corasick automaton over *words*. A single left-to-
+# right pass over the entry finds every lexicon phrase, so matching costs O(words in the
+# entry + matches) however large the lexicon is, and whole-word matching keeps "unhappy"
+# from counting as "happy". Each match adds its weight to an emotion's score:
+#   - a negation shortly before the phrase ("not happy") moves a share of the weight to
+#     the opposite emotion, or drops it if there is none;
+#   - an intensifier right before it ("so tired") scales it up.
+
+# Emotion order breaks ties between equal scores (same order as EMOTION_RESPONSES)
+EMOTION_LEXICON = {
+    "tired": {
+        "tired": 1.0, "exhausted": 1.5, "sleepy": 0.8, "drained": 1.2, "worn out": 1.2, "burnt out": 1.5,
+        "burned out": 1.5, "fatigued": 1.2, "no energy": 1.2, "need sleep": 1.0, "need a nap": 0.8,
+        "so much work": 0.6, "overworked": 1.0, "couldn't sleep": 1.0, "didn't sleep": 1.0, "insomnia": 1.0,
+    },
+    "bored": {
+        "bored": 1.0, "boring": 0.8, "boredom": 1.0, "nothing to do": 1.2, "dull": 0.6, "monotonous": 0.8,
+        "same old": 0.6, "uninspired": 0.8,
+    },
+    "calm": {
+        "calm": 1.0, "peaceful": 1.2, "relaxed": 1.0, "relaxing": 0.8, "serene": 1.2, "at peace": 1.2,
+        "chill": 0.6, "content": 0.6, "meditated": 0.8, "meditation": 0.6, "quiet day": 0.8,
+    },
+    "guilty": {
+        "guilty": 1.0, "guilt": 1.0, "ashamed": 1.2, "regret": 1.0, "regretted": 1.0, "my fault": 1.2,
+        "shouldn't have": 0.8, "feel bad about": 1.0, "apologize": 0.6, "apologized": 0.6, "sorry": 0.5,
+    },
+    "anxious": {
+        "anxious": 1.0, "anxiety": 1.0, "worried": 1.0, "worry": 0.8, "worrying": 0.8, "nervous": 1.0,
+        "stressed": 1.0, "stress": 0.8, "stressful": 0.8, "panic": 1.5, "panicked": 1.5, "overwhelmed": 1.2,
+        "on edge": 1.0, "scared": 0.8, "afraid": 0.8, "uneasy": 0.8, "restless": 0.6,
+    },
+    "happy": {
+        "happy": 1.0, "happiness": 1.0, "joy": 1.0, "joyful": 1.2, "glad": 0.8, "great day": 1.2,
+        "good day": 0.8, "wonderful": 0.8, "amazing": 0.8, "excited": 0.8, "grateful": 0.8,
+        "thankful": 0.8, "delighted": 1.2, "cheerful": 1.0, "proud": 0.6, "awesome": 0.6, "fun": 0.5,
+        "smiled": 0.6, "laughed": 0.6, "love": 0.5,
+    },
+    "sad": {
+        "sad": 1.0, "sadness": 1.0, "unhappy": 1.2, "depressed": 1.5, "down": 0.5, "feeling down": 1.2,
+        "cried": 1.2, "crying": 1.2, "tears": 0.8, "heartbroken": 1.5, "miserable": 1.5, "upset": 0.8,
+        "bad day": 1.0, "hopeless": 1.5, "gloomy": 1.0, "blue": 0.4, "disappointed": 1.0, "lost": 0.4,
+    },
+    "lonely": {
+        "lonely": 1.0, "loneliness": 1.0, "alone": 0.8, "by myself": 0.6, "isolated": 1.2,
+        "no friends": 1.2, "left out": 1.2, "nobody": 0.6, "miss them": 0.8, "miss you": 0.8, "homesick": 1.0,
+    },
+    "angry": {
+        "angry": 1.0, "anger": 1.0, "mad": 0.8, "furious": 1.5, "annoyed": 0.8, "annoying": 0.6,
+        "irritated": 0.8, "frustrated": 1.0, "frustrating": 0.8, "hate": 0.8, "pissed": 1.2, "rage": 1.5,
+        "fed up": 1.0, "resent": 1.0,
+    },
+}
+
+NEGATIONS = frozenset([
+    "not", "no", "never", "hardly", "barely", "without", "isn't", "wasn't", "aren't", "weren't",
+    "don't", "doesn't", "didn't", "can't", "couldn't", "won't", "wouldn't", "ain't", "nor", "neither",
+])
+NEGATION_WINDOW = 3 # a negation this many words before a phrase negates it
+NEGATED_WEIGHT = 0.5 # share of a negated phrase's weight that goes to the opposite emotion
+OPPOSITE_EMOTION = {"happy": "sad", "calm": "anxious", "sad": "happy"}
+
+INTENSIFIERS = {"very": 1.5, "so": 1.5, "really": 1.5, "extremely": 2.0, "super": 1.5, "incredibly": 2.0, "totally": 1.5}
+
+# Words (letters, digits, apostrophes) and clause breaks; a clause break ends a negation's scope
+WORD_RE = re.compile(r"[^\W_]+(?:'[^\W_]+)*|[.!?;,\n]")
+CLAUSE_BREAK = "."
+
+
+def words(text):
+    """Lowercased words of a text, with every clause break reduced to "."."""
+    tokens = WORD_RE.findall((text or "").lower().replace("’", "'"))
+    return [CLAUSE_BREAK if len(t) == 1 and t in ".!?;,\n" else t for t in tokens]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton whose alphabet is words, built from {phrase: payload}."""
+
+    def __init__(self, phrases):
+        self._goto = [{}]   # state -> {word: next state}
+        self._fail = [0]
+        self._output = [()] # state -> ((phrase length, payload), ...), longest first
+        for phrase, payload in phrases.items():
+            phrase_words = words(phrase)
+            if not phrase_words:
+                continue
+            state = 0
+            for word in phrase_words:
+                next_state = self._goto[state].get(word)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][word] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = ((len(phrase_words), payload),)
+        self._link()
+
+    def _link(self):
+        """Breadth-first failure links; each state also inherits its suffix states' outputs."""
+        queue = deque(self._goto[0].values()) # depth-1 states fail back to the root
+        while queue:
+            state = queue.popleft()
+            for word, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(word, 0) if state else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def matches(self, tokens):
+        """Yields (start, end, payload) for every phrase occurrence in a word list."""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for end, word in enumerate(tokens, 1):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for length, payload in output[state]:
+                yield end - length, end, payload
+
+
+class ResponseEngine:
+    """Scores every emotion in one pass over an entry."""
+
+    def __init__(self, lexicon=EMOTION_LEXICON):
+        self.emotions = list(lexicon)
+        phrases = {}
+        for emotion, terms in lexicon.items():
+            for phrase, weight in terms.items():
+                phrases.setdefault(phrase, (emotion, weight))
+        self.automaton = KeywordAutomaton(phrases)
+
+    def scores(self, text):
+        """{emotion: score} for the emotions the text mentions."""
+        tokens = words(text)
+        scores = {}
+        covered_until = 0
+        # Longest match first at each end position; shorter phrases inside it are skipped
+        for start, end, (emotion, weight) in self.automaton.matches(tokens):
+            if start < covered_until:
+                continue
+            covered_until = end
+            before = tokens[max(0, start - NEGATION_WINDOW):start]
+            if CLAUSE_BREAK in before:
+                before = before[len(before) - before[::-1].index(CLAUSE_BREAK):]
+            if any(word in NEGATIONS for word in before):
+                emotion = OPPOSITE_EMOTION.get(emotion)
+                if emotion is None:
+                    continue
+                weight *= NEGATED_WEIGHT
+            elif before:
+                weight *= INTENSIFIERS.get(before[-1], 1.0)
+            scores[emotion] = scores.get(emotion, 0.0) + weight
+        return scores
+
+    def top_emotion(self, text):
+        """The highest-scoring emotion (earlier emotions win ties), or None."""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        return max(self.emotions, key=lambda emotion: (scores.get(emotion, 0.0), -self.emotions.index(emotion)))
+
+
+response_engine = ResponseEngine()
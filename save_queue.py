@@ -0,0 +1,226 @@
+import atexit
+import collections
+import copy
+import logging
+import os
+import threading
+import time
+import uuid
+import weakref
+
+from instrumentation import profiler
+
+# -------------------- Background State Saves
+# --------------------
+#
+# save_diary() used to write the user's state synchronously inside button handlers, so
+# ten potions fed in a row meant ten full rewrites on the UI thread. Now it queues the
+# state here and returns. A writer thread saves it once the session has been quiet for
+# SAVE_DELAY_SECONDS (and at most SAVE_MAX_DELAY_SECONDS after the first change), and a
+# newer state queued before then replaces the pending one: the writes are coalesced.
+#
+# Each pending save keeps the `base` it started from (the state last written for that
+# session), so the store's merge with other sessions' saves still works. Writes for one
+# key never overlap and happen in order.
+#
+# Critical writes go through flush() (write now, in the caller's thread) or cancel()
+# (the caller is about to write the full state itself). A session's pending saves are
+# written straight away when the session is garbage collected, and everything pending is
+# flushed at interpreter exit.
+#
+# The garbage collector can run a session's finalizer in any thread, including one that
+# holds the queue's lock, so the finalizer only appends the session's token to a deque
+# (thread-safe without a lock); whoever takes the lock next handles the ended sessions.
+
+SAVE_DELAY_SECONDS = float(os.environ.get("MOOD_JOURNAL_SAVE_DELAY", 0.5)) # 0 = save synchronously
+SAVE_MAX_DELAY_SECONDS = float(os.environ.get("MOOD_JOURNAL_SAVE_MAX_DELAY", 2.0))
+MAX_SAVE_ATTEMPTS = 5
+
+logger = logging.getLogger(__name__)
+
+
+def newest_state(*states):
+    """The state with the highest save version (None if all are None)."""
+    states = [state for state in states if state is not None]
+    return max(states, key=lambda state: state.get("version", 0)) if states else None
+
+
+class _PendingSave:
+    __slots__ = ("store", "user_name", "state", "base", "first_at", "last_at", "attempts")
+
+    def __init__(self, store, user_name, state, base, now):
+        self.store = store
+        self.user_name = user_name
+        self.state = state
+        self.base = base
+        self.first_at = now
+        self.last_at = now
+        self.attempts = 0
+
+    def due_at(self, delay, max_delay):
+        return min(self.last_at + delay, self.first_at + max_delay)
+
+
+class SaveQueue:
+    """Per-key debounced state saves written by one background thread."""
+
+    def __init__(self, delay=SAVE_DELAY_SECONDS, max_delay=SAVE_MAX_DELAY_SECONDS):
+        self.delay = delay
+        self.max_delay = max_delay
+        self._pending = {}  # key -> _PendingSave
+        self._writing = set()
+        self._written = {}  # key -> state last written, until the session takes it
+        self._ended = collections.deque() # tokens of sessions collected since the lock was last taken
+        self._cond = threading.Condition(threading.Lock())
+        self._thread = None
+        self.submitted = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.last_error = None
+
+    @property
+    def synchronous(self):
+        return self.delay <= 0
+
+    def submit(self, key, store, user_name, state, base=None):
+        """Queues a state save for `key`, replacing one that is still pending."""
+        state = copy.deepcopy(state) # the session keeps mutating its own copy
+        now = time.monotonic()
+        with self._cond:
+            self._end_sessions()
+            self.submitted += 1
+            pending = self._pending.get(key)
+            if pending is None:
+                base = newest_state(base, self._written.get(key))
+                self._pending[key] = _PendingSave(store, user_name, state, base, now)
+            else:
+                pending.state = state
+                pending.last_at = now
+                self.coalesced += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="state-save-queue", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _write(self, key):
+        """Writes the pending save for `key`; called and returns with the lock held."""
+        pending = self._pending.pop(key)
+        self._writing.add(key)
+        self._cond.release()
+        written, error = None, None
+        try:
+            with profiler.span("save_state", kind="background"):
+                written = pending.store.save_state(pending.user_name, pending.state, base=pending.base)
+        except Exception as e:
+            error = e
+        finally:
+            self._cond.acquire()
+            self._writing.discard(key)
+        if error is None:
+            self.writes += 1
+            self._written[key] = written
+            newer = self._pending.get(key)
+            if newer is not None: # queued while this one was being written
+                newer.base = newest_state(newer.base, written)
+        else:
+            self.failures += 1
+            self.last_error = repr(error)
+            pending.attempts += 1
+            if key not in self._pending and pending.attempts < MAX_SAVE_ATTEMPTS:
+                pending.first_at = pending.last_at = time.monotonic() # retry after another delay
+                self._pending[key] = pending
+                logger.warning("Saving state for %r failed (attempt %d), will retry: %r", pending.user_name, pending.attempts, error)
+            elif key not in self._pending:
+                logger.error("Giving up saving state for %r: %r", pending.user_name, error)
+        self._cond.notify_all()
+
+    def _run(self):
+        with self._cond:
+            while True:
+                self._end_sessions()
+                now = time.monotonic()
+                waiting = [(pending.due_at(self.delay, self.max_delay), key)
+                           for key, pending in self._pending.items() if key not in self._writing]
+                due = [key for due_at, key in waiting if due_at <= now]
+                for key in due:
+                    if key in self._pending and key not in self._writing:
+                        self._write(key)
+                if not due:
+                    self._cond.wait(min(due_at for due_at, _ in waiting) - now if waiting else None)
+
+    def _wait_idle(self, key):
+        while key in self._writing:
+            self._cond.wait()
+
+    def flush(self, key=None):
+        """Writes the pending save for `key` (or all of them) now, in this thread.
+
+        Returns True when nothing is left pending for those keys.
+        """
+        with self._cond:
+            self._end_sessions()
+            keys = [key] if key is not None else list(self._pending) + list(self._writing)
+            for k in keys:
+                self._wait_idle(k)
+                if k in self._pending:
+                    self._write(k)
+            return not any(k in self._pending for k in keys)
+
+    def cancel(self, key):
+        """Drops the pending save for `key` because the caller writes the full state itself.
+
+        Waits for a write in progress; returns the state last written for `key` (or None),
+        which the caller should use as its merge base if it is newer than its own.
+        """
+        with self._cond:
+            self._wait_idle(key)
+            self._pending.pop(key, None)
+            return self._written.pop(key, None)
+
+    def take_written(self, key):
+        """The state written for `key` since the last call, once nothing more is queued for it."""
+        with self._cond:
+            if key in self._pending or key in self._writing:
+                return None
+            return self._written.pop(key, None)
+
+    def session_ended(self, token):
+        """Marks a session's pending saves due now; safe to call from a finalizer in any thread."""
+        self._ended.append(token) # no lock: the thread may already hold it
+
+    def _end_sessions(self):
+        """Makes ended sessions' pending saves due and drops their written states; call holding the lock."""
+        while self._ended:
+            token = self._ended.popleft()
+            for key, pending in self._pending.items():
+                if key[0] == token:
+                    pending.first_at = pending.last_at = -float("inf")
+            for key in [key for key in self._written if key[0] == token]:
+                del self._written[key]
+
+    def stats(self):
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "writes": self.writes,
+                "coalesced": self.coalesced,
+                "failures": self.failures,
+                "pending": len(self._pending),
+                "last_error": self.last_error,
+            }
+
+
+class SessionSaves:
+    """Kept in a session's state; names its save-queue keys and flushes them when the session ends."""
+
+    def __init__(self, queue):
+        self.token = uuid.uuid4().hex
+        weakref.finalize(self, queue.session_ended, self.token)
+
+    def key(self, user_key):
+        return (self.token, user_key)
+
+
+save_queue = SaveQueue()
+atexit.register(save_queue.flush)
@@ -0,0 +1,263 @@
+import bisect
+import datetime
+import json
+import os
+import re
+import threading
+import zlib
+
+from diary_storage import LEGACY_SEARCH_INDEX_SUFFIX, atomic_write_bytes, safe_user_key
+from journal_content import MOOD_MAPPING
+
+# -------------------- Journal Search Index
+# --------------------
+#
+# An inverted index (term -> set of date ordinals) over each entry's text, tags and mood,
+# plus a sorted vocabulary for prefix matching. Entries are indexed one at a time as they
+# are saved. The index is stored next to the diary together with a fingerprint of every
+# entry, so reopening it only re-tokenizes entries that changed since it was written.
+
+SEARCH_INDEX_FORMAT = 1
+
+# CJK text has no spaces, so each character is its own term; other scripts split on words
+_CJK = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+TOKEN_RE = re.compile(rf"[{_CJK}]|[^\W_{_CJK}]+")
+
+MOOD_NAMES = {emoji: name for name, emoji in MOOD_MAPPING.items()}
+
+
+def tokenize(text):
+    """Lowercased search terms of a piece of text."""
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def entry_terms(entry):
+    """Searchable terms of one entry: its text, tag names and mood name."""
+    words = [entry.get("text", ""), MOOD_NAMES.get(entry.get("mood"), "")]
+    words.extend(entry.get("tags") or ())
+    return set(tokenize(" ".join(words)))
+
+
+def entry_fingerprint(entry):
+    """Cheap checksum of the indexed fields, to spot entries changed outside this index."""
+    key = "\x1f".join([entry.get("mood") or "", "\x1e".join(entry.get("tags") or ()), entry.get("text", "")])
+    return zlib.crc32(key.encode("utf-8"))
+
+
+def search_index_file(user_name, data_dir="."):
+    """search_<name>.json: outside the diary_* names the storage backends list users by."""
+    safe_name = safe_user_key(user_name)
+    if not safe_name:
+        return None
+    return os.path.join(data_dir, f"search_{safe_name}.json")
+
+
+def adopt_legacy_index(user_name, data_dir="."):
+    """Moves an index saved under the old diary_<name>.search.json name to search_index_file()."""
+    safe_name = safe_user_key(user_name)
+    if not safe_name:
+        return
+    legacy_path = os.path.join(data_dir, f"diary_{safe_name}{LEGACY_SEARCH_INDEX_SUFFIX}")
+    try:
+        if os.path.exists(search_index_file(user_name, data_dir)):
+            os.remove(legacy_path)
+        else:
+            os.replace(legacy_path, search_index_file(user_name, data_dir))
+    except FileNotFoundError:
+        pass
+
+
+class SearchIndex:
+    """Incrementally maintained inverted index over one user's diary."""
+
+    def __init__(self):
+        self.source = None # the diary dict this index was last synced with
+        self._docs = {}     # ordinal -> (fingerprint, mood, tags, space-joined terms)
+        self._postings = {} # term -> set of ordinals
+        self._moods = {}    # mood emoji -> set of ordinals
+        self._tags = {}     # tag -> set of ordinals
+        self._vocabulary = [] # sorted terms for prefix lookups (None = rebuild on next query)
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._saving = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    # --- Updates ---
+
+    @staticmethod
+    def _add_to(postings, key, ordinal):
+        bucket = postings.get(key)
+        if bucket is None:
+            bucket = postings[key] = set()
+        bucket.add(ordinal)
+        return len(bucket) == 1
+
+    @staticmethod
+    def _remove_from(postings, key, ordinal):
+        bucket = postings.get(key)
+        if bucket is not None:
+            bucket.discard(ordinal)
+            if not bucket:
+                del postings[key]
+                return True
+        return False
+
+    def _index(self, ordinal, fingerprint, mood, tags, terms):
+        self._unindex(ordinal)
+        self._docs[ordinal] = (fingerprint, mood, tuple(tags), " ".join(terms))
+        postings, vocabulary = self._postings, self._vocabulary
+        for term in terms:
+            bucket = postings.get(term)
+            if bucket is None:
+                bucket = postings[term] = set()
+                if vocabulary is not None:
+                    bisect.insort(vocabulary, term)
+            bucket.add(ordinal)
+        if mood:
+            self._add_to(self._moods, mood, ordinal)
+        for tag in tags:
+            self._add_to(self._tags, tag, ordinal)
+
+    def _unindex(self, ordinal):
+        doc = self._docs.pop(ordinal, None)
+        if doc is None:
+            return
+        _, mood, tags, terms = doc
+        for term in terms.split():
+            if self._remove_from(self._postings, term, ordinal) and self._vocabulary is not None:
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+        if mood:
+            self._remove_from(self._moods, mood, ordinal)
+        for tag in tags:
+            self._remove_from(self._tags, tag, ordinal)
+
+    def update(self, date_key, entry):
+        """(Re)indexes the entry saved for one date."""
+        with self._lock:
+            self._index(
+                datetime.date.fromisoformat(date_key).toordinal(), entry_fingerprint(entry),
+                entry.get("mood"), entry.get("tags") or (), entry_terms(entry)
+            )
+            self._dirty = True
+
+    def remove(self, date_key):
+        with self._lock:
+            self._unindex(datetime.date.fromisoformat(date_key).toordinal())
+            self._dirty = True
+
+    def sync(self, diary):
+        """Brings the index in line with a diary, re-tokenizing only changed entries.
+
+        Returns the number of entries added, changed or removed.
+        """
+        changed = 0
+        with self._lock:
+            if len(diary) > 2 * len(self._docs) + 100:
+                self._vocabulary = None # Bulk (re)build: sort the vocabulary once at the end
+            seen = set()
+            for date_key, entry in diary.items():
+                ordinal = datetime.date.fromisoformat(date_key).toordinal()
+                seen.add(ordinal)
+                doc = self._docs.get(ordinal)
+                if doc is None or doc[0] != entry_fingerprint(entry):
+                    self.update(date_key, entry)
+                    changed += 1
+            for ordinal in set(self._docs) - seen:
+                self._unindex(ordinal)
+                changed += 1
+            if self._vocabulary is None:
+                self._vocabulary = sorted(self._postings)
+            self.source = diary
+            self._dirty = self._dirty or bool(changed)
+        return changed
+
+    # --- Queries ---
+
+    def _matching(self, prefix):
+        """Union of the postings of every term starting with `prefix`."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\U0010ffff")
+        terms = self._vocabulary[start:end]
+        if len(terms) == 1:
+            return self._postings[terms[0]]
+        return set().union(*(self._postings[term] for term in terms))
+
+    def search(self, query="", moods=None, tags=None, start_date=None, end_date=None, limit=50):
+        """Entries matching every query word (as a prefix), any of `moods`, all of `tags`,
+        and the date range (inclusive). Returns (total matches, newest-first date keys)."""
+        with self._lock:
+            candidates = [self._matching(term) for term in dict.fromkeys(tokenize(query))]
+            if moods:
+                candidates.append(set().union(*(self._moods.get(mood, ()) for mood in moods)))
+            candidates.extend(self._tags.get(tag, set()) for tag in tags or ())
+            if candidates:
+                candidates.sort(key=len)
+                hits = candidates[0].intersection(*candidates[1:])
+            else:
+                hits = self._docs.keys()
+            if start_date or end_date:
+                low = start_date.toordinal() if start_date else 0
+                high = end_date.toordinal() if end_date else 10 ** 7
+                hits = [ordinal for ordinal in hits if low <= ordinal <= high]
+            ordered = sorted(hits, reverse=True)
+        return len(ordered), [datetime.date.fromordinal(o).strftime("%Y-%m-%d") for o in ordered[:limit]]
+
+    # --- Persistence ---
+
+    def to_bytes(self):
+        with self._lock:
+            docs = {
+                datetime.date.fromordinal(ordinal).strftime("%Y-%m-%d"): [fingerprint, mood, list(tags), terms]
+                for ordinal, (fingerprint, mood, tags, terms) in self._docs.items()
+            }
+            postings = {term: sorted(ordinals) for term, ordinals in self._postings.items()}
+            self._dirty = False
+        return json.dumps({"format": SEARCH_INDEX_FORMAT, "docs": docs, "postings": postings}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def load(cls, path):
+        """Reads a saved index; an empty index if the file is missing, unreadable or outdated."""
+        index = cls()
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(f.read())
+        except (OSError, ValueError):
+            return index
+        if not isinstance(data, dict) or data.get("format") != SEARCH_INDEX_FORMAT:
+            return index
+        for date_key, (fingerprint, mood, tags, terms) in data.get("docs", {}).items():
+            ordinal = datetime.date.fromisoformat(date_key).toordinal()
+            index._docs[ordinal] = (fingerprint, mood, tuple(tags), terms)
+            if mood:
+                index._moods.setdefault(mood, set()).add(ordinal)
+            for tag in tags:
+                index._tags.setdefault(tag, set()).add(ordinal)
+        index._postings = {term: set(ordinals) for term, ordinals in data.get("postings", {}).items()}
+        index._vocabulary = sorted(index._postings)
+        return index
+
+    def save(self, path):
+        atomic_write_bytes(path, self.to_bytes())
+
+    def schedule_save(self, path):
+        """Writes the index in a background thread; saves requested meanwhile are coalesced."""
+        with self._lock:
+            if not self._dirty or self._saving:
+                return
+            self._saving = True
+        threading.Thread(target=self._save_while_dirty, args=(path,), daemon=True).start()
+
+    def _save_while_dirty(self, path):
+        while True:
+            try:
+                self.save(path)
+            except OSError:
+                pass # The index is only a cache; the next sync rebuilds whatever is stale
+            with self._lock:
+                if not self._dirty:
+                    self._saving = False
+                    return
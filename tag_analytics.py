@@ -0,0 +1,85 @@
+import numpy as np
+
+from journal_content import ACTIVITY_TAGS
+
+# -------------------- Activity Tag Analytics
+# --------------------
+#
+# Works on the tag bitmask column of the ColumnarDiary: the masks are expanded once into
+# an (entries x tags) 0/1 matrix, and counts, mean scores, co-occurrence and pair scores
+# all fall out of a few matrix products. Cost is O(entries x tags) with no Python loop
+# over entries, so it stays interactive for thousands of entries.
+
+TAG_COUNT = len(ACTIVITY_TAGS)
+TAG_NAMES = np.array(ACTIVITY_TAGS, dtype=object)
+
+
+def tag_matrix(masks):
+    """Expands uint32 tag bitmasks into an (entries x tags) 0/1 matrix."""
+    return ((masks[:, None] >> np.arange(TAG_COUNT, dtype=np.uint32)) & 1).astype(np.int32)
+
+
+def compute_tag_stats(columns, start_date=None, end_date=None):
+    """Per-tag and per-pair statistics for entries in [start_date, end_date] (inclusive).
+
+    Returns a dict:
+      entries           number of entries in the range
+      baseline          mean mood score over those entries
+      counts            (tags,) entries carrying each tag
+      mean_scores       (tags,) mean score of entries with each tag (nan if unused)
+      lift              (tags,) mean_scores / baseline (>1 = better than usual)
+      cooccurrence      (tags, tags) entries carrying both tags (diagonal = counts)
+      pair_mean_scores  (tags, tags) mean score of entries carrying both tags
+    """
+    start = start_date.toordinal() if start_date else -(2 ** 31)
+    end = end_date.toordinal() + 1 if end_date else 2 ** 31 - 1
+    rows = columns.span(start, end)
+    scores = columns.scores[rows].astype(np.float64)
+    bits = tag_matrix(columns.tags[rows])
+
+    counts = bits.sum(axis=0)
+    cooccurrence = bits.T @ bits
+    pair_score_sums = (bits * scores[:, None]).T @ bits
+    baseline = scores.mean() if len(scores) else np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pair_mean_scores = pair_score_sums / cooccurrence
+        mean_scores = np.diagonal(pair_mean_scores).copy()
+        lift = mean_scores / baseline
+    return {
+        "entries": len(scores),
+        "baseline": baseline,
+        "counts": counts,
+        "mean_scores": mean_scores,
+        "lift": lift,
+        "cooccurrence": cooccurrence,
+        "pair_mean_scores": pair_mean_scores,
+    }
+
+
+def tag_table(stats):
+    """Rows (tag, frequency, avg score, lift) for used tags, best average mood first."""
+    used = np.flatnonzero(stats["counts"])
+    order = used[np.argsort(-stats["mean_scores"][used], kind="stable")]
+    return [
+        (TAG_NAMES[i], int(stats["counts"][i]), float(stats["mean_scores"][i]), float(stats["lift"][i]))
+        for i in order
+    ]
+
+
+def tag_pair_table(stats, min_count=2, limit=15):
+    """Rows ("A + B", times together, avg score, lift) for tag pairs seen at least `min_count` times."""
+    first, second = np.triu_indices(TAG_COUNT, k=1)
+    together = stats["cooccurrence"][first, second]
+    keep = together >= min_count
+    first, second, together = first[keep], second[keep], together[keep]
+    pair_scores = stats["pair_mean_scores"][first, second]
+    order = np.lexsort((-together, -pair_scores))[:limit]
+    return [
+        (
+            f"{TAG_NAMES[first[i]]} + {TAG_NAMES[second[i]]}",
+            int(together[i]),
+            float(pair_scores[i]),
+            float(pair_scores[i] / stats["baseline"]),
+        )
+        for i in order
+    ]